@@ -1,10 +1,10 @@
 from flask import Flask, render_template, request, redirect, url_for, current_app
 from flask_pymongo import PyMongo
-from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended import JWTManager
 from flask_login import LoginManager, current_user
-import redis
+import threading
 import traceback
-from functools import wraps
+from functools import wraps, partial
 from config import Config
 from bson import ObjectId
 
@@ -14,12 +14,15 @@ API_PREFIX = '/api/'
 AUTH_PREFIX = '/auth/'
 STATIC_ENDPOINT = 'static'
 FAVICON_PATH = '/favicon.ico'
+METRICS_PATH = '/metrics'
 
 mongo = PyMongo()
 jwt = JWTManager()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 redis_client = None
+_redis_factory = None
+_redis_lock = threading.Lock()
 
 def setup_jwt(app):
     """Configure JWT settings and error handlers."""
@@ -41,6 +44,8 @@ def register_blueprints(app):
     from app.routes.accounts import accounts_bp
     from app.routes.budgets import budgets_bp
     from app.routes.charts import charts_bp
+    from app.routes.sync import sync_bp
+    from app.routes.batch import batch_bp
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix=AUTH_PREFIX)
@@ -51,6 +56,13 @@ def register_blueprints(app):
     app.register_blueprint(accounts_bp, url_prefix=f'{API_PREFIX}accounts')
     app.register_blueprint(budgets_bp, url_prefix=f'{API_PREFIX}budgets')
     app.register_blueprint(charts_bp, url_prefix=f'{API_PREFIX}charts')
+    app.register_blueprint(sync_bp, url_prefix=f'{API_PREFIX}sync')
+    app.register_blueprint(batch_bp, url_prefix=f'{API_PREFIX}batch')
+    
+    # Optional subsystems are only imported when they are switched on
+    if diagnostics_enabled(app):
+        from app.routes.diagnostics import diagnostics_bp
+        app.register_blueprint(diagnostics_bp, url_prefix=f'{API_PREFIX}diagnostics')
     
     return app
 
@@ -107,7 +119,8 @@ def is_public_route(app):
     public_paths = {
         '/',
         f'{API_PREFIX}docs',
-        FAVICON_PATH
+        FAVICON_PATH,
+        METRICS_PATH
     }
     
     # Check static and auth routes
@@ -134,16 +147,111 @@ def handle_unauthorized():
 
 def setup_request_handlers(app):
     """Set up request handlers including authentication and error handling."""
+    from app.auth.utils import BATCH_IDENTITY_KEY, current_user_id
+    
     @app.before_request
     def check_authentication():
-        if not is_public_route(app):
-            try:
-                verify_jwt_in_request(optional=True)
-                if not get_jwt_identity():
-                    return handle_unauthorized()
-            except Exception:
-                return handle_unauthorized()
+        # Batch sub-requests were already authenticated by the batch endpoint
+        if request.environ.get(BATCH_IDENTITY_KEY):
+            return None
+        if not is_public_route(app) and not current_user_id():
+            return handle_unauthorized()
+    
+    # Drop documents cached by the model layer during the request
+    from app.models.loader import clear_identity_map
+    app.teardown_request(clear_identity_map)
+    
+    # Opt-in per-request profiling; registers nothing unless configured
+    if app.config.get('PROFILING_SECRET') or app.config.get('PROFILING_USER_IDS'):
+        from app.utils.profiling import init_profiling
+        init_profiling(app)
+    if app.config.get('MEMORY_PROFILING_ENABLED'):
+        from app.utils.memory import init_memory_profiling
+        init_memory_profiling(app)
+    
+    return app
+
+MONGO_CLIENT_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': 'maxPoolSize',
+    'MONGO_MIN_POOL_SIZE': 'minPoolSize',
+    'MONGO_MAX_IDLE_TIME_MS': 'maxIdleTimeMS',
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': 'waitQueueTimeoutMS',
+    'MONGO_CONNECT_TIMEOUT_MS': 'connectTimeoutMS',
+    'MONGO_SOCKET_TIMEOUT_MS': 'socketTimeoutMS',
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 'serverSelectionTimeoutMS',
+}
+REDIS_CLIENT_OPTIONS = {
+    'REDIS_MAX_CONNECTIONS': 'max_connections',
+    'REDIS_SOCKET_TIMEOUT': 'socket_timeout',
+    'REDIS_SOCKET_CONNECT_TIMEOUT': 'socket_connect_timeout',
+    'REDIS_HEALTH_CHECK_INTERVAL': 'health_check_interval',
+}
+
+def _client_options(config, options):
+    return {option: config[key] for key, option in options.items() if config.get(key) is not None}
+
+def monitoring_required(app):
+    """Whether metrics, the X-Query-Stats header or tests need per-request query stats."""
+    return bool(
+        app.config.get('METRICS_ENABLED') or app.config.get('QUERY_STATS_HEADER')
+        or app.debug or app.testing
+    )
+
+def diagnostics_enabled(app):
+    return bool(
+        app.config.get('PROFILING_SECRET') or app.config.get('PROFILING_USER_IDS')
+        or app.config.get('MEMORY_PROFILING_ENABLED')
+    )
+
+def init_clients(app):
+    """Create the Mongo and Redis clients using the configured pool settings.
     
+    Neither client opens a connection here, so this is safe in a pre-fork
+    master. Calling it again (e.g. from gunicorn's ``post_fork``) replaces
+    both clients with fresh ones owned by the current process.
+    """
+    global redis_client, _redis_factory
+    
+    mongo.init_app(app, connect=False, **_client_options(app.config, MONGO_CLIENT_OPTIONS))
+    with _redis_lock:
+        redis_client = None
+        _redis_factory = partial(
+            _create_redis, app.config['REDIS_URL'], monitoring_required(app),
+            **_client_options(app.config, REDIS_CLIENT_OPTIONS)
+        )
+    return app
+
+def _create_redis(url, instrumented, **options):
+    if instrumented:
+        from app.utils.monitoring import instrumented_redis_class
+        redis_class = instrumented_redis_class()
+    else:
+        from redis import Redis as redis_class
+    return redis_class.from_url(url, **options)
+
+def get_redis_client():
+    """Return the process's Redis client, creating it on first use."""
+    global redis_client
+    if redis_client is None and _redis_factory is not None:
+        with _redis_lock:
+            if redis_client is None:
+                redis_client = _redis_factory()
+    return redis_client
+
+def warm_up(app, connections=None):
+    """Open connections before the first request instead of during it."""
+    connections = connections or app.config.get('WARMUP_CONNECTIONS', 1)
+    try:
+        mongo.cx.admin.command('ping')
+    except Exception as e:
+        app.logger.warning(f"MongoDB warm-up failed: {e}")
+    try:
+        pool = get_redis_client().connection_pool
+        opened = [pool.get_connection('PING') for _ in range(connections)]
+        for connection in opened:
+            pool.release(connection)
+    except Exception as e:
+        app.logger.warning(f"Redis warm-up failed: {e}")
     return app
 
 def create_app(config_class=Config):
@@ -151,8 +259,16 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Query monitoring and metrics must be installed before the Mongo client is created
+    if monitoring_required(app):
+        from app.utils import monitoring
+        monitoring.init_app(app)
+    if app.config.get('METRICS_ENABLED'):
+        from app.utils.metrics import init_metrics
+        init_metrics(app)
+    
     # Initialize extensions
-    mongo.init_app(app)
+    init_clients(app)
     jwt.init_app(app)
     login_manager.init_app(app)
     
@@ -172,12 +288,13 @@ def create_app(config_class=Config):
             return None
         return None
     
-    global redis_client
-    redis_client = redis.Redis.from_url(app.config['REDIS_URL'])
-    
     # Configure JWT
     setup_jwt(app)
     
+    # Load shedding and rate limits run ahead of the other request handlers
+    from app.utils.ratelimit import init_rate_limiting
+    init_rate_limiting(app)
+    
     # Register blueprints
     register_blueprints(app)
     
@@ -187,4 +304,8 @@ def create_app(config_class=Config):
     # Setup request handlers
     setup_request_handlers(app)
     
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+    
     return app
\ No newline at end of file
@@ -2,7 +2,7 @@ from flask import Blueprint, request, jsonify, render_template, flash, redirect,
 from flask_jwt_extended import jwt_required, create_access_token, create_refresh_token, get_jwt_identity, set_access_cookies, set_refresh_cookies, unset_jwt_cookies
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models.user import User
-from app import redis_client, login_manager
+from app import login_manager
 
 auth_bp = Blueprint('auth', __name__)
 
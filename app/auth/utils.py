@@ -0,0 +1,73 @@
+from functools import wraps
+from flask import g, request, jsonify, current_app
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended import jwt_required as _jwt_required
+
+# Environ key marking a batch sub-request, whose token the batch endpoint
+# already verified. It cannot be set by clients, since request headers only
+# become HTTP_* keys.
+BATCH_IDENTITY_KEY = 'expense_tracker.batch_identity'
+# Environ key holding the JWT state already verified for the request
+VERIFIED_JWT_KEY = 'expense_tracker.verified_jwt'
+# Where flask_jwt_extended keeps the verified token on ``g``
+JWT_STATE = ('_jwt_extended_jwt', '_jwt_extended_jwt_header', '_jwt_extended_jwt_user', '_jwt_extended_jwt_location')
+
+def verified_jwt_state():
+    """The current request's verified JWT state, to hand to batch sub-requests."""
+    return {name: g.get(name) for name in JWT_STATE}
+
+def bind_verified_jwt():
+    """Restore a token verified earlier in the request (or by its batch) onto ``g``.
+
+    Returns False when nothing was verified yet, so the caller decodes it.
+    """
+    state = request.environ.get(VERIFIED_JWT_KEY)
+    if not state:
+        return False
+    for name, value in state.items():
+        setattr(g, name, value)
+    return True
+
+def current_user_id():
+    """The request's user id, or None when it has no valid token.
+
+    The token is decoded at most once per request: hooks and views that
+    ask again reuse the verified state.
+    """
+    if bind_verified_jwt():
+        return get_jwt_identity()
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return None
+    identity = get_jwt_identity()
+    if identity:
+        request.environ[VERIFIED_JWT_KEY] = verified_jwt_state()
+    return identity
+
+def jwt_required(*args, **kwargs):
+    """``flask_jwt_extended.jwt_required`` that reuses a token already verified.
+
+    Batch sub-requests carry no token of their own and use the one the batch
+    endpoint verified; other requests reuse the one a hook such as the rate
+    limiter decoded. Options like ``fresh`` always verify the token again.
+    """
+    def decorator(fn):
+        verified = _jwt_required(*args, **kwargs)(fn)
+        trusted = not args and not kwargs
+        @wraps(fn)
+        def wrapper(*fn_args, **fn_kwargs):
+            if trusted and bind_verified_jwt():
+                return current_app.ensure_sync(fn)(*fn_args, **fn_kwargs)
+            return verified(*fn_args, **fn_kwargs)
+        return wrapper
+    return decorator
+
+def admin_required(fn):
+    """Restrict a view to users listed in ADMIN_USER_IDS. Apply below ``jwt_required``."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if get_jwt_identity() not in current_app.config.get('ADMIN_USER_IDS', []):
+            return jsonify({'message': 'Forbidden'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
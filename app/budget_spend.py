@@ -0,0 +1,164 @@
+"""Budget spend recalculation.
+
+Recomputes ``spent``, ``remaining`` and the embedded ``transactions`` of
+budgets from the transactions collection. Each user's budgets are rebuilt
+with one aggregation: every expense is matched against the user's budget
+windows inside the pipeline and grouped by budget. Users run in parallel in
+a process pool.
+
+An expense counts towards exactly one budget, both here and in the budget
+job: the budget of its category covering its date, otherwise a general
+budget covering it. When several qualify, the one that started last (then
+the newest) wins, so ``SPEND_ORDER`` is the sort both paths use.
+"""
+import multiprocessing
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+from app.reconciliation import user_batches
+
+SPEND_ORDER = [('start_date', -1), ('_id', -1)]
+
+def _utc(dt):
+    # Stored dates come back naive UTC; request dates are aware
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def _overlaps(budget, start, end):
+    return (
+        (end is None or _utc(budget['start_date']) <= _utc(end))
+        and (budget.get('end_date') is None or start is None or _utc(budget['end_date']) >= _utc(start))
+    )
+
+def overlapping_ids(budgets, windows):
+    """Ids of ``budgets`` whose dates overlap any ``(start, end)`` in ``windows``."""
+    return {b['_id'] for b in budgets if any(_overlaps(b, start, end) for start, end in windows)}
+
+def _in_window():
+    return {'$and': [
+        {'$lte': ['$$b.start', '$date']},
+        {'$or': [{'$eq': ['$$b.end', None]}, {'$gte': ['$$b.end', '$date']}]}
+    ]}
+
+def spend_pipeline(user_id, budgets, budget_ids):
+    """Spend and entries per budget in ``budget_ids``, given all of the user's ``budgets``."""
+    def windows(budgets):
+        # In SPEND_ORDER, so the first window matching an expense is its budget.
+        # Literal so categories are never read as field paths.
+        budgets = sorted(budgets, key=lambda b: (_utc(b['start_date']), b['_id']), reverse=True)
+        return {'$literal': [
+            {'id': b['_id'], 'category': b.get('category'), 'start': b['start_date'], 'end': b.get('end_date')}
+            for b in budgets
+        ]}
+
+    category_windows = windows([b for b in budgets if b.get('category')])
+    general_windows = windows([b for b in budgets if not b.get('category')])
+    selected = [b for b in budgets if b['_id'] in budget_ids]
+    date_range = {'$gte': min(b['start_date'] for b in selected)}
+    if all(b.get('end_date') for b in selected):
+        date_range['$lte'] = max(b['end_date'] for b in selected)
+
+    return [
+        {'$match': {'user_id': user_id, 'type': 'expense', 'date': date_range}},
+        {'$project': {'amount': 1, 'date': 1, 'note': 1, 'budget': {'$arrayElemAt': [{'$let': {
+            'vars': {'matched': {'$filter': {
+                'input': category_windows, 'as': 'b',
+                'cond': {'$and': [{'$eq': ['$$b.category', '$category']}, _in_window()]}
+            }}},
+            'in': {'$cond': [
+                {'$gt': [{'$size': '$$matched'}, 0]},
+                '$$matched',
+                {'$filter': {'input': general_windows, 'as': 'b', 'cond': _in_window()}}
+            ]}
+        }}, 0]}}},
+        {'$match': {'budget.id': {'$in': list(budget_ids)}}},
+        {'$group': {
+            '_id': '$budget.id',
+            'spent': {'$sum': '$amount'},
+            'transactions': {'$push': {
+                'id': '$_id', 'amount': '$amount', 'date': '$date', 'note': {'$ifNull': ['$note', '']}
+            }}
+        }}
+    ]
+
+def recalculate_user(db, user_id, budget_ids=None, windows=()):
+    """Rebuild the spend of a user's budgets (all of them, or ``budget_ids``).
+
+    Budgets overlapping any ``(start, end)`` in ``windows`` are rebuilt too,
+    which is needed after a budget is created or moved since expenses can
+    change hands between overlapping budgets.
+    Returns the number of budgets checked, how many had a different
+    ``spent`` and the number of budget entries written.
+    """
+    user_id = ObjectId(user_id)
+    budgets = list(db.budgets.find(
+        {'user_id': user_id},
+        {'category': 1, 'amount': 1, 'spent': 1, 'start_date': 1, 'end_date': 1}
+    ))
+    selected = {b['_id'] for b in budgets}
+    if budget_ids is not None:
+        selected &= {ObjectId(b) for b in budget_ids} | overlapping_ids(budgets, windows)
+    if not selected:
+        return {'budgets': 0, 'changed': 0, 'transactions': 0}
+
+    rows = {
+        row['_id']: row
+        for row in db.transactions.aggregate(
+            spend_pipeline(user_id, budgets, selected), allowDiskUse=True
+        )
+    }
+    now = datetime.now(timezone.utc)
+    requests, changed, entries = [], 0, 0
+    for budget in budgets:
+        if budget['_id'] not in selected:
+            continue
+        row = rows.get(budget['_id'], {'spent': 0.0, 'transactions': []})
+        spent = round(float(row['spent']), 2)
+        if abs(float(budget.get('spent') or 0) - spent) > 0.005:
+            changed += 1
+        entries += len(row['transactions'])
+        requests.append(UpdateOne({'_id': budget['_id']}, {'$set': {
+            'spent': spent,
+            'remaining': float(budget.get('amount') or 0) - spent,
+            'transactions': row['transactions'],
+            'updated_at': now
+        }}))
+    db.budgets.bulk_write(requests, ordered=False)
+    return {'budgets': len(requests), 'changed': changed, 'transactions': entries}
+
+_db = None
+
+def _init_worker(mongo_uri):
+    global _db
+    _db = MongoClient(mongo_uri).get_default_database()
+
+def _recalculate_batch(user_ids):
+    totals = {'users': len(user_ids), 'user_ids': [str(u) for u in user_ids], 'budgets': 0, 'changed': 0, 'transactions': 0}
+    for user_id in user_ids:
+        for key, value in recalculate_user(_db, user_id).items():
+            totals[key] += value
+    return totals
+
+def recalculate(mongo_uri, workers=None, batch_size=100, user_ids=None, progress=None):
+    """Rebuild the spend of every budget of every user (or only ``user_ids``).
+
+    The totals include the ``user_ids`` that were rebuilt, so the caller can
+    invalidate their cached budgets.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    totals = {'users': 0, 'user_ids': [], 'budgets': 0, 'changed': 0, 'transactions': 0}
+
+    client = MongoClient(mongo_uri)
+    try:
+        batches = user_batches(client.get_default_database(), batch_size, user_ids)
+        # Spawned workers avoid inheriting the parent's MongoClient and thread pools
+        with multiprocessing.get_context('spawn').Pool(workers, _init_worker, (mongo_uri,)) as pool:
+            for result in pool.imap_unordered(_recalculate_batch, batches):
+                for key, value in result.items():
+                    totals[key] += value
+                if progress:
+                    progress(totals)
+    finally:
+        client.close()
+    return totals
@@ -0,0 +1,201 @@
+import click
+
+def register_commands(app):
+    """Register custom ``flask`` CLI commands."""
+    @app.cli.command('create-indexes')
+    def create_indexes():
+        """Create the MongoDB indexes the query builders rely on."""
+        from app.models.transaction import Transaction
+        from app.models.account import Account
+        from app.models.budget import Budget
+        from app.models.category import Category
+        from app.models.tombstone import Tombstone
+        from app.models.balance_snapshot import BalanceSnapshot
+        
+        for model in (Transaction, Account, Budget, Category, Tombstone, BalanceSnapshot):
+            names = model.create_indexes()
+            click.echo(f"{model.__name__}: {', '.join(names)}")
+    
+    @app.cli.command('seed')
+    @click.option('--users', default=10, show_default=True, help='Number of users to create.')
+    @click.option('--transactions-per-user', default=10000, show_default=True)
+    @click.option('--years', default=2.0, show_default=True, help='History length per user.')
+    @click.option('--accounts', default=3, show_default=True, help='Accounts per user (max 5).')
+    @click.option('--workers', default=None, type=int, help='Worker processes (defaults to CPU count).')
+    @click.option('--batch-size', default=10000, show_default=True, help='Documents per insert_many.')
+    @click.option('--prefix', default='seed-', show_default=True, help='Username prefix.')
+    @click.option('--seed', 'random_seed', default=42, show_default=True, help='Random seed.')
+    def seed(users, transactions_per_user, years, accounts, workers, batch_size, prefix, random_seed):
+        """Generate synthetic users with realistic transaction histories."""
+        import re
+        import time
+        from app import mongo
+        from app.seeding import seed as seed_users
+        
+        # Continue numbering after users seeded by earlier runs
+        first_index = mongo.db.users.count_documents({'username': {'$regex': f'^{re.escape(prefix)}'}})
+        started = time.perf_counter()
+        
+        def progress(totals):
+            click.echo(f"  {totals['users']}/{users} users, {totals['transactions']} transactions")
+        
+        totals = seed_users(
+            app.config['MONGO_URI'], users, transactions_per_user, years=years,
+            accounts=accounts, workers=workers, batch_size=batch_size, prefix=prefix,
+            random_seed=random_seed, first_index=first_index, progress=progress
+        )
+        elapsed = time.perf_counter() - started
+        click.echo(
+            f"Seeded {totals['users']} users, {totals['accounts']} accounts, "
+            f"{totals['transactions']} transactions and {totals['budgets']} budgets "
+            f"in {elapsed:.1f}s ({totals['transactions'] / elapsed:.0f} transactions/s)"
+        )
+    
+    @app.cli.command('reconcile-balances')
+    @click.option('--workers', default=None, type=int, help='Worker processes (defaults to CPU count).')
+    @click.option('--batch-size', default=500, show_default=True, help='Users per aggregation.')
+    @click.option('--user', 'user_ids', multiple=True, help='Only reconcile these user ids.')
+    @click.option('--repair', is_flag=True, help='Correct drifted balances.')
+    @click.option('--baseline', is_flag=True,
+                  help='With --repair, take the stored balance of unverified accounts as their opening balance.')
+    @click.option('--show', default=20, show_default=True, help='Drifted and unverified accounts to list.')
+    def reconcile_balances(workers, batch_size, user_ids, repair, baseline, show):
+        """Recompute account balances from transactions and report drift."""
+        import time
+        from app.reconciliation import reconcile
+        from app.utils.cache import bump_versions
+        
+        started = time.perf_counter()
+        
+        def progress(totals):
+            click.echo(f"  {totals['users']} users, {totals['transactions']} transactions")
+        
+        totals = reconcile(
+            app.config['MONGO_URI'], workers=workers, batch_size=batch_size, repair=repair,
+            baseline=baseline, user_ids=list(user_ids) or None, max_reported=show, progress=progress
+        )
+        elapsed = time.perf_counter() - started
+        for drift in totals['drift']:
+            click.echo(
+                f"  {drift['account_id']} ({drift['name']}, user {drift['user_id']}): "
+                f"balance {drift['balance']:.2f}, ledger {drift['expected']:.2f}, drift {drift['drift']:+.2f}"
+            )
+        for account in totals['unverified_accounts']:
+            click.echo(
+                f"  {account['account_id']} ({account['name']}, user {account['user_id']}): unverified, "
+                f"balance {account['balance']:.2f}, {account['expected_from_creation']:.2f} "
+                f"if no transaction was applied"
+            )
+        # ETag clients would otherwise keep revalidating against the old balances
+        for user_id in totals['repaired_users']:
+            bump_versions(user_id, 'accounts')
+        click.echo(
+            f"Checked {totals['accounts']} accounts of {totals['users']} users over "
+            f"{totals['transactions']} transactions in {elapsed:.1f}s: {totals['drifted']} drifted, "
+            f"{totals['unverified']} unverified, {totals['repaired']} repaired, {totals['baselined']} baselined"
+        )
+        if (totals['drifted'] and not repair) or (totals['unverified'] and not (repair and baseline)):
+            raise SystemExit(1)
+    
+    @app.cli.command('build-balance-snapshots')
+    @click.option('--user', 'user_ids', multiple=True, help='Only build snapshots for these user ids.')
+    def build_balance_snapshots(user_ids):
+        """Create missing month-end balance snapshots for every account."""
+        from bson import ObjectId
+        from app import mongo
+        from app.models.balance_snapshot import BalanceSnapshot
+        
+        query = {'user_id': {'$in': [ObjectId(u) for u in user_ids]}} if user_ids else {}
+        accounts = written = 0
+        for account in mongo.db.accounts.find(query, {'user_id': 1, 'balance': 1, 'opening_balance': 1}):
+            written += BalanceSnapshot.build(account)
+            accounts += 1
+        click.echo(f'Wrote {written} snapshots for {accounts} accounts')
+    
+    @app.cli.command('recalculate-budgets')
+    @click.option('--workers', default=None, type=int, help='Worker processes (defaults to CPU count).')
+    @click.option('--batch-size', default=100, show_default=True, help='Users per worker task.')
+    @click.option('--user', 'user_ids', multiple=True, help='Only recalculate these user ids.')
+    @click.option('--budget', 'budget_id', default=None, help='Only recalculate this budget.')
+    def recalculate_budgets(workers, batch_size, user_ids, budget_id):
+        """Rebuild budget spend from transactions."""
+        import time
+        from bson import ObjectId
+        from app import mongo
+        from app.budget_spend import recalculate, recalculate_user
+        from app.utils import write_behind
+        from app.utils.cache import bump_versions
+        
+        # Buffered changes would be counted again on top of the rebuilt spend
+        if write_behind.enabled():
+            write_behind.flush(force=True)
+        
+        started = time.perf_counter()
+        if budget_id:
+            budget = mongo.db.budgets.find_one({'_id': ObjectId(budget_id)}, {'user_id': 1})
+            if not budget:
+                raise click.ClickException(f'Budget {budget_id} not found')
+            totals = dict(
+                recalculate_user(mongo.db, budget['user_id'], [budget_id]),
+                users=1, user_ids=[str(budget['user_id'])]
+            )
+        else:
+            def progress(totals):
+                click.echo(f"  {totals['users']} users, {totals['budgets']} budgets")
+            
+            totals = recalculate(
+                app.config['MONGO_URI'], workers=workers, batch_size=batch_size,
+                user_ids=list(user_ids) or None, progress=progress
+            )
+        for user_id in totals['user_ids']:
+            bump_versions(user_id, 'budgets')
+        elapsed = time.perf_counter() - started
+        click.echo(
+            f"Recalculated {totals['budgets']} budgets of {totals['users']} users "
+            f"({totals['transactions']} transactions) in {elapsed:.1f}s; {totals['changed']} had a different spend"
+        )
+    
+    @app.cli.command('worker')
+    @click.option('--queue', default=None, help='Queue to consume (defaults to JOBS_QUEUE).')
+    @click.option('--concurrency', default=None, type=int, help='Worker threads (defaults to JOBS_WORKER_CONCURRENCY).')
+    def worker(queue, concurrency):
+        """Run background jobs from the Redis queue until stopped."""
+        import app.tasks  # noqa: F401 - registers the jobs
+        from app.utils.jobs import Worker
+        
+        queue = queue or app.config['JOBS_QUEUE']
+        concurrency = concurrency or app.config['JOBS_WORKER_CONCURRENCY']
+        runner = Worker(app, queue, concurrency)
+        click.echo(f'Worker {runner.id} consuming {queue!r} with {concurrency} threads')
+        runner.run()
+    
+    @app.cli.command('requeue-dead-jobs')
+    @click.option('--queue', default=None, help='Queue whose dead letters to retry (defaults to JOBS_QUEUE).')
+    @click.option('--limit', default=None, type=int, help='Maximum number of jobs to requeue.')
+    def requeue_dead_jobs(queue, limit):
+        """Move dead-lettered jobs back onto their queue."""
+        from app.utils.cache import get_redis
+        from app.utils.jobs import requeue_dead
+        
+        moved = requeue_dead(get_redis(), queue or app.config['JOBS_QUEUE'], limit)
+        click.echo(f'Requeued {moved} jobs')
+    
+    @app.cli.command('flush-budget-buffer')
+    def flush_budget_buffer():
+        """Apply all buffered budget changes now."""
+        from app.utils import write_behind
+        
+        flushed = write_behind.flush(force=True)
+        click.echo(f'Flushed {flushed} budgets')
+    
+    @app.cli.command('profile-token')
+    @click.option('--ttl', default=3600, show_default=True, help='Seconds the token stays valid.')
+    def profile_token(ttl):
+        """Print a signed X-Profile-Token header value."""
+        from app.utils.profiling import make_profile_token
+        secret = app.config.get('PROFILING_SECRET')
+        if not secret:
+            raise click.ClickException('PROFILING_SECRET is not configured')
+        click.echo(make_profile_token(secret, ttl))
+    
+    return app
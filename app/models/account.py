@@ -1,8 +1,21 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from app import mongo
+from app.models import loader
+from app.models.balance_snapshot import BalanceSnapshot
+from app.models.tombstone import Tombstone
 from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
 
 class Account:
+    INDEXES = [
+        IndexModel([('user_id', ASCENDING)], name='user'),
+        IndexModel([('user_id', ASCENDING), ('updated_at', ASCENDING), ('_id', ASCENDING)], name='user_updated_at'),
+    ]
+    
+    @staticmethod
+    def create_indexes():
+        return mongo.db.accounts.create_indexes(Account.INDEXES)
+    
     @staticmethod
     def create_account(user_id, name, type, balance=0, bank_name=None, last_four=None, details=None):
         account = {
@@ -10,37 +23,54 @@ class Account:
             'name': name,
             'type': type,
             'balance': float(balance),
+            'opening_balance': float(balance),
             'bank_name': bank_name,
             'last_four': last_four,
             'details': details,
-            'created_at': datetime.now(),
-            'updated_at': datetime.now()
+            'created_at': datetime.now(timezone.utc),
+            'updated_at': datetime.now(timezone.utc)
         }
-        return mongo.db.accounts.insert_one(account)
+        result = mongo.db.accounts.insert_one(account)
+        loader.prime('accounts', account)
+        return result
     
     @staticmethod
-    def get_user_accounts(user_id):
-        return list(mongo.db.accounts.find({'user_id': ObjectId(user_id)}))
+    def get_user_accounts(user_id, projection=None):
+        return list(mongo.db.accounts.find({'user_id': ObjectId(user_id)}, projection))
     
     @staticmethod
     def get_account_by_id(account_id):
-        return mongo.db.accounts.find_one({'_id': ObjectId(account_id)})
+        return loader.find_by_id('accounts', account_id)
+    
+    @staticmethod
+    def get_accounts_by_ids(account_ids):
+        return loader.find_by_ids('accounts', account_ids)
     
     @staticmethod
     def update_account_balance(account_id, amount):
+        loader.invalidate('accounts', account_id)
         return mongo.db.accounts.update_one(
             {'_id': ObjectId(account_id)},
-            {'$inc': {'balance': float(amount)}, '$set': {'updated_at': datetime.now()}}
+            {'$inc': {'balance': float(amount)}, '$set': {'updated_at': datetime.now(timezone.utc)}}
         )
     
     @staticmethod
     def update_account(account_id, update_data):
-        update_data['updated_at'] = datetime.now()
-        return mongo.db.accounts.update_one(
+        update_data['updated_at'] = datetime.now(timezone.utc)
+        result = mongo.db.accounts.update_one(
             {'_id': ObjectId(account_id)},
             {'$set': update_data}
         )
+        loader.write_through('accounts', account_id, update_data)
+        return result
     
     @staticmethod
     def delete_account(account_id):
-        return mongo.db.accounts.delete_one({'_id': ObjectId(account_id)})
\ No newline at end of file
+        loader.invalidate('accounts', account_id)
+        deleted = mongo.db.accounts.find_one_and_delete(
+            {'_id': ObjectId(account_id)}, projection={'user_id': 1}
+        )
+        if deleted:
+            BalanceSnapshot.delete_for_account(deleted['_id'])
+            Tombstone.record(deleted['user_id'], 'accounts', deleted['_id'])
+        return deleted
\ No newline at end of file
@@ -0,0 +1,357 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytz
+from app import mongo
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
+
+IST = pytz.timezone('Asia/Kolkata')
+
+class BalanceSnapshot:
+    """Month-end account balances used as anchors for point-in-time queries.
+
+    ``balance`` is the account's balance at ``period_end``, the first instant
+    of the next month in IST: its opening balance plus every transaction
+    dated before that. A balance at any other time is the nearest earlier
+    snapshot plus the transactions since, so no query replays the whole
+    history. Back-dated writes shift the later snapshots with ``$inc``.
+
+    A build and a concurrent write could otherwise miss or double count the
+    write: the aggregate may run before the transaction is stored while
+    the ``$inc`` runs before the snapshot exists, or the other way round.
+    Writers therefore bracket their work with ``writing``, which keeps a
+    ``ledger_writes`` counter on each account, and a build only keeps its
+    snapshots if no write was in flight or started while it ran.
+    """
+    INDEXES = [
+        IndexModel([('account_id', ASCENDING), ('period_end', DESCENDING)], name='account_period_end', unique=True),
+    ]
+    # A write in flight for longer than this is assumed to have died
+    # (a killed worker) and no longer holds off builds
+    STALE_WRITE = timedelta(minutes=10)
+
+    @staticmethod
+    def create_indexes():
+        return mongo.db.balance_snapshots.create_indexes(BalanceSnapshot.INDEXES)
+
+    @staticmethod
+    def aware(dt):
+        # Stored datetimes come back naive in UTC
+        return dt if dt.tzinfo else pytz.utc.localize(dt)
+
+    @staticmethod
+    def month_start(dt):
+        """First instant of ``dt``'s month in IST."""
+        dt = BalanceSnapshot.aware(dt).astimezone(IST)
+        return IST.localize(datetime(dt.year, dt.month, 1))
+
+    @staticmethod
+    def next_month(dt):
+        return BalanceSnapshot.month_start(BalanceSnapshot.month_start(dt) + timedelta(days=32))
+
+    @staticmethod
+    def legs(transaction):
+        """``(account_id, signed amount)`` pairs, the rules the balance updates use."""
+        amount = float(transaction.get('amount') or 0)
+        account_from = transaction.get('account_from')
+        account_to = transaction.get('account_to')
+        type = transaction.get('type')
+        legs = []
+        if amount <= 0:
+            return legs
+        if account_from and (type == 'expense' or (type == 'transfer' and account_to)):
+            legs.append((ObjectId(account_from), -amount))
+        if account_to and (type == 'income' or (type == 'transfer' and account_from)):
+            legs.append((ObjectId(account_to), amount))
+        return legs
+
+    @staticmethod
+    def match(account, start=None, end=None):
+        """Transactions touching ``account`` dated in ``[start, end)``.
+
+        Each ``$or`` branch keeps ``user_id`` so it runs on the
+        ``user_account_from_date_id`` and ``user_account_to_date_id`` indexes.
+        """
+        dates = {}
+        if start:
+            dates['$gte'] = start
+        if end:
+            dates['$lt'] = end
+        branches = [{'account_from': account['_id']}, {'account_to': account['_id']}]
+        for branch in branches:
+            branch['user_id'] = account['user_id']
+            if dates:
+                branch['date'] = dict(dates)
+        return {'$or': branches, 'amount': {'$gt': 0}}
+
+    @staticmethod
+    def signed_amount(account_id):
+        """Aggregation expression for a transaction's effect on ``account_id``."""
+        transfer = {'$and': [{'$eq': ['$type', 'transfer']}, {'$gt': ['$account_from', None]}, {'$gt': ['$account_to', None]}]}
+        return {'$add': [
+            {'$cond': [
+                {'$and': [{'$eq': ['$account_from', account_id]}, {'$or': [{'$eq': ['$type', 'expense']}, transfer]}]},
+                {'$multiply': ['$amount', -1]}, 0
+            ]},
+            {'$cond': [
+                {'$and': [{'$eq': ['$account_to', account_id]}, {'$or': [{'$eq': ['$type', 'income']}, transfer]}]},
+                '$amount', 0
+            ]}
+        ]}
+
+    @staticmethod
+    def net_change(account, start=None, end=None):
+        result = list(mongo.db.transactions.aggregate([
+            {'$match': BalanceSnapshot.match(account, start, end)},
+            {'$group': {'_id': None, 'net': {'$sum': BalanceSnapshot.signed_amount(account['_id'])}}}
+        ]))
+        return result[0]['net'] if result else 0.0
+
+    @staticmethod
+    def opening_balance(account):
+        if account.get('opening_balance') is not None:
+            return float(account['opening_balance'])
+        # Unverified accounts from before opening balances were stored (see
+        # app.reconciliation) are anchored on the stored balance for display
+        # only; ``build`` stores no snapshots for them.
+        return float(account.get('balance') or 0) - BalanceSnapshot.net_change(account)
+
+    @staticmethod
+    def latest(account_id, before=None):
+        query = {'account_id': ObjectId(account_id)}
+        if before:
+            query['period_end'] = {'$lte': before}
+        return mongo.db.balance_snapshots.find_one(query, sort=[('period_end', DESCENDING)])
+
+    @staticmethod
+    @contextmanager
+    def writing(*transactions):
+        """Mark a transaction write and its balance updates as in flight.
+
+        Wrap the write of the transaction together with its
+        ``apply_transaction`` calls; pass every version of the transaction
+        involved (before and after an edit).
+        """
+        account_ids = list({account_id for t in transactions if t for account_id, _ in BalanceSnapshot.legs(t)})
+        if not account_ids:
+            yield
+            return
+        mongo.db.accounts.update_many(
+            {'_id': {'$in': account_ids}},
+            {'$inc': {'ledger_writes.in_flight': 1}, '$set': {'ledger_writes.started_at': datetime.now(pytz.UTC)}}
+        )
+        try:
+            yield
+        finally:
+            mongo.db.accounts.update_many(
+                {'_id': {'$in': account_ids}},
+                {'$inc': {'ledger_writes.in_flight': -1, 'ledger_writes.count': 1}}
+            )
+
+    @staticmethod
+    def _ledger_writes(account_id):
+        account = mongo.db.accounts.find_one({'_id': account_id}, {'ledger_writes': 1}) or {}
+        return account.get('ledger_writes') or {}
+
+    @staticmethod
+    def build(account, now=None):
+        """Create the missing month-end snapshots up to the current month.
+
+        Continues from the latest snapshot, so only months after it are
+        aggregated. Returns the number of snapshots written. Nothing is
+        built while a write to the account is in flight, and the snapshots
+        are deleted again when one started during the build (see the class
+        docstring); readers fall back to the earlier snapshot meanwhile.
+        Concurrent builds write the same snapshots, so losing the race for
+        one is not an error. Accounts without an opening balance get none
+        until reconciliation baselines them.
+        """
+        if account.get('opening_balance') is None:
+            return 0
+        current = BalanceSnapshot.month_start(now or datetime.now(IST))
+        writes = BalanceSnapshot._ledger_writes(account['_id'])
+        if writes.get('in_flight') and BalanceSnapshot.aware(writes['started_at']) > datetime.now(pytz.UTC) - BalanceSnapshot.STALE_WRITE:
+            return 0
+        latest = BalanceSnapshot.latest(account['_id'])
+        if latest:
+            since = BalanceSnapshot.aware(latest['period_end'])
+            if since >= current:
+                return 0
+            balance = latest['balance']
+        else:
+            since = None
+            balance = BalanceSnapshot.opening_balance(account)
+
+        month = {'date': '$date', 'timezone': IST.zone}
+        nets = {
+            (row['_id']['year'], row['_id']['month']): row['net']
+            for row in mongo.db.transactions.aggregate([
+                {'$match': BalanceSnapshot.match(account, since, current)},
+                {'$group': {
+                    '_id': {'year': {'$year': month}, 'month': {'$month': month}},
+                    'net': {'$sum': BalanceSnapshot.signed_amount(account['_id'])}
+                }}
+            ])
+        }
+        if since is None:
+            if not nets:
+                return 0
+            year, month_number = min(nets)
+            since = IST.localize(datetime(year, month_number, 1))
+
+        now_utc = datetime.now(pytz.UTC)
+        requests = []
+        period_start = BalanceSnapshot.month_start(since)
+        while period_start < current:
+            period_end = BalanceSnapshot.next_month(period_start)
+            balance = round(balance + nets.get((period_start.year, period_start.month), 0.0), 2)
+            requests.append(UpdateOne(
+                {'account_id': account['_id'], 'period_end': period_end},
+                {
+                    '$set': {'balance': balance, 'updated_at': now_utc},
+                    '$setOnInsert': {'user_id': account['user_id'], 'created_at': now_utc}
+                },
+                upsert=True
+            ))
+            period_start = period_end
+        if not requests:
+            return 0
+        written = len(requests)
+        try:
+            mongo.db.balance_snapshots.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            # Another build upserted the same month first
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != 11000 for error in errors):
+                raise
+            written -= len(errors)
+        if BalanceSnapshot._ledger_writes(account['_id']) != writes:
+            # A write overlapped the build, so these may miss or double count it
+            mongo.db.balance_snapshots.delete_many({
+                'account_id': account['_id'], 'period_end': {'$gt': BalanceSnapshot.month_start(since)}
+            })
+            return 0
+        return written
+
+    @staticmethod
+    def balance_at(account, at):
+        """The account's balance just before ``at``."""
+        BalanceSnapshot.build(account)
+        snapshot = BalanceSnapshot.latest(account['_id'], before=at)
+        if snapshot:
+            return round(snapshot['balance'] + BalanceSnapshot.net_change(account, snapshot['period_end'], at), 2)
+        return round(BalanceSnapshot.opening_balance(account) + BalanceSnapshot.net_change(account, None, at), 2)
+
+    @staticmethod
+    def balance_before(account, date=None, _id=None, inclusive=False):
+        """Balance after every transaction ordered before ``(date, _id)``.
+
+        Transactions sharing ``date`` are ordered by ``_id``; ``inclusive``
+        also counts ``_id`` itself. Without a ``date`` this is the balance
+        after the whole ledger.
+        """
+        if date is None:
+            BalanceSnapshot.build(account)
+            snapshot = BalanceSnapshot.latest(account['_id'])
+            if snapshot:
+                return round(snapshot['balance'] + BalanceSnapshot.net_change(account, snapshot['period_end']), 2)
+            return round(BalanceSnapshot.opening_balance(account) + BalanceSnapshot.net_change(account), 2)
+
+        balance = BalanceSnapshot.balance_at(account, date)
+        if _id is not None:
+            # Stored dates have millisecond precision
+            query = BalanceSnapshot.match(account, date, date + timedelta(milliseconds=1))
+            query['_id'] = {'$lte' if inclusive else '$lt': _id}
+            ties = list(mongo.db.transactions.aggregate([
+                {'$match': query},
+                {'$group': {'_id': None, 'net': {'$sum': BalanceSnapshot.signed_amount(account['_id'])}}}
+            ]))
+            if ties:
+                balance = round(balance + ties[0]['net'], 2)
+        return balance
+
+    @staticmethod
+    def effect(transaction, account_id):
+        """A transaction's signed effect on one account."""
+        return sum(amount for leg_account, amount in BalanceSnapshot.legs(transaction) if leg_account == ObjectId(account_id))
+
+    @staticmethod
+    def between(account_id, start=None, end=None):
+        """Snapshots with ``start < period_end <= end``, oldest first."""
+        query = {'account_id': ObjectId(account_id)}
+        if start or end:
+            query['period_end'] = {}
+            if start:
+                query['period_end']['$gt'] = start
+            if end:
+                query['period_end']['$lte'] = end
+        return list(mongo.db.balance_snapshots.find(query, {'period_end': 1, 'balance': 1}).sort('period_end', ASCENDING))
+
+    @staticmethod
+    def day_start(day):
+        return IST.localize(datetime(day.year, day.month, day.day))
+
+    @staticmethod
+    def daily_nets(account, start, end):
+        """Net change per IST calendar day for transactions in ``[start, end)``."""
+        day = {'date': '$date', 'timezone': IST.zone}
+        return {
+            (row['_id']['year'], row['_id']['month'], row['_id']['day']): row['net']
+            for row in mongo.db.transactions.aggregate([
+                {'$match': BalanceSnapshot.match(account, start, end)},
+                {'$group': {
+                    '_id': {'year': {'$year': day}, 'month': {'$month': day}, 'day': {'$dayOfMonth': day}},
+                    'net': {'$sum': BalanceSnapshot.signed_amount(account['_id'])}
+                }}
+            ])
+        }
+
+    @staticmethod
+    def series(account, start_date, end_date, interval='month'):
+        """End-of-day balances from ``start_date`` to ``end_date`` (dates, inclusive).
+
+        Monthly points come straight from the snapshots. Daily and weekly
+        points start from the balance at ``start_date`` and add one grouped
+        scan of the days in range. The last point is always ``end_date``.
+        """
+        start = BalanceSnapshot.day_start(start_date)
+        end = BalanceSnapshot.day_start(end_date + timedelta(days=1))
+
+        if interval == 'month':
+            BalanceSnapshot.build(account)
+            points = [
+                ((BalanceSnapshot.aware(s['period_end']) - timedelta(days=1)).astimezone(IST).date(), s['balance'])
+                for s in BalanceSnapshot.between(account['_id'], start, end)
+            ]
+            if not points or points[-1][0] != end_date:
+                points.append((end_date, BalanceSnapshot.balance_at(account, end)))
+            return points
+
+        balance = BalanceSnapshot.balance_at(account, start)
+        nets = BalanceSnapshot.daily_nets(account, start, end)
+        step = 7 if interval == 'week' else 1
+        points = []
+        day = start_date
+        while day <= end_date:
+            balance = round(balance + nets.get((day.year, day.month, day.day), 0.0), 2)
+            if (end_date - day).days % step == 0:
+                points.append((day, balance))
+            day += timedelta(days=1)
+        return points
+
+    @staticmethod
+    def apply_transaction(transaction, reverse=False):
+        """Shift the snapshots taken after a transaction's date by its effect."""
+        date = transaction.get('date')
+        if not date:
+            return
+        for account_id, amount in BalanceSnapshot.legs(transaction):
+            mongo.db.balance_snapshots.update_many(
+                {'account_id': account_id, 'period_end': {'$gt': date}},
+                {'$inc': {'balance': -amount if reverse else amount}}
+            )
+
+    @staticmethod
+    def delete_for_account(account_id):
+        return mongo.db.balance_snapshots.delete_many({'account_id': ObjectId(account_id)})
@@ -1,7 +1,13 @@
 from datetime import datetime, timedelta
 import pytz
+from flask import current_app
 from app import mongo
+from app.models import loader
+from app.models.tombstone import Tombstone
+from app.budget_spend import SPEND_ORDER, overlapping_ids, recalculate_user
+from app.utils import write_behind
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from typing import Dict, List, Optional, Union, Any
 
 # Set Indian timezone
@@ -10,6 +16,24 @@ IST = pytz.timezone('Asia/Kolkata')
 class Budget:
     PERIODS = ['daily', 'weekly', 'monthly', 'yearly']
     
+    # List reads never load the embedded transactions array, only its size
+    LIST_PROJECTION = {
+        'user_id': 1, 'category': 1, 'amount': 1, 'period': 1,
+        'start_date': 1, 'end_date': 1, 'note': 1, 'spent': 1, 'remaining': 1,
+        'notifications': 1, 'is_active': 1, 'created_at': 1, 'updated_at': 1,
+        'transactions_count': {'$size': {'$ifNull': ['$transactions', []]}}
+    }
+    
+    INDEXES = [
+        IndexModel([('user_id', ASCENDING), ('category', ASCENDING), ('start_date', DESCENDING)], name='user_category_start_date'),
+        IndexModel([('user_id', ASCENDING), ('start_date', DESCENDING)], name='user_start_date'),
+        IndexModel([('user_id', ASCENDING), ('updated_at', ASCENDING), ('_id', ASCENDING)], name='user_updated_at'),
+    ]
+    
+    @staticmethod
+    def create_indexes():
+        return mongo.db.budgets.create_indexes(Budget.INDEXES)
+    
     @classmethod
     def create_budget(cls, user_id, category, amount, period, start_date, end_date=None, note=None):
         now = datetime.now(IST)
@@ -54,54 +78,29 @@ class Budget:
             'transactions': []
         }
         
-        # Add existing transactions to the budget
-        cls._add_existing_transactions(budget, user_id, category, start_dt, end_dt)
-        
-        # Update remaining amount
-        budget['remaining'] = budget['amount'] - budget['spent']
         result = mongo.db.budgets.insert_one(budget)
+        
+        # Count existing expenses, which may move over from overlapping budgets
+        cls.recalculate_spend(user_id, [result.inserted_id], windows=[(start_dt, end_dt)])
         return str(result.inserted_id)
     
-    @classmethod
-    def _add_existing_transactions(cls, budget: Dict[str, Any], user_id: str, category: str, 
-                                 start_date: datetime, end_date: datetime) -> None:
-        """
-        Add existing transactions to the budget that fall within the date range
-        and match the category.
-        """
-        query = {
-            'user_id': ObjectId(user_id),
-            'category': category,
-            'type': 'expense',  # Only include expense transactions
-            'date': {
-                '$gte': start_date,
-                '$lte': end_date or datetime.max.replace(tzinfo=IST)
-            }
-        }
-        
-        # Find all matching transactions
-        transactions = list(mongo.db.transactions.find(query))
-        
-        # Add transactions to budget and calculate total spent
-        total_spent = 0.0
-        for tx in transactions:
-            if tx['_id'] not in [t.get('_id') for t in budget['transactions']]:
-                budget['transactions'].append({
-                    'transaction_id': str(tx['_id']),
-                    'amount': float(tx['amount']),
-                    'date': tx['date'],
-                    'note': tx.get('note', '')
-                })
-                total_spent += float(tx['amount'])
-        
-        # Update budget's spent amount
-        budget['spent'] = round(total_spent, 2)
-        
-        # Ensure remaining can't be negative
-        budget['remaining'] = max(0, budget['amount'] - budget['spent'])
+    @staticmethod
+    def recalculate_spend(user_id, budget_ids=None, windows=()):
+        """Rebuild budget spend from the user's transactions (see ``app.budget_spend``)."""
+        budgets = list(mongo.db.budgets.find({'user_id': ObjectId(user_id)}, {'start_date': 1, 'end_date': 1}))
+        if budget_ids is None:
+            budget_ids = [b['_id'] for b in budgets]
+        budget_ids = {ObjectId(b) for b in budget_ids} | overlapping_ids(budgets, windows)
+        # Apply buffered changes first so they are not counted again afterwards
+        if write_behind.enabled():
+            write_behind.flush(budget_ids=list(budget_ids))
+        result = recalculate_user(mongo.db, user_id, budget_ids)
+        for budget_id in budget_ids:
+            loader.invalidate('budgets', budget_id)
+        return result
     
     @staticmethod
-    def get_user_budgets(user_id):
+    def get_user_budgets(user_id, projection=None):
         now = datetime.now(IST)
         budgets = list(mongo.db.budgets.find({
             'user_id': ObjectId(user_id),
@@ -110,7 +109,7 @@ class Budget:
                 {'end_date': None},
                 {'end_date': {'$gte': now}}
             ]
-        }).sort([('start_date', -1)]))
+        }, projection or Budget.LIST_PROJECTION).sort([('start_date', -1)]))
         
         # Convert Decimal128 to float for all numeric fields
         for budget in budgets:
@@ -124,7 +123,7 @@ class Budget:
     
     @staticmethod
     def get_budget_by_id(budget_id):
-        budget = mongo.db.budgets.find_one({'_id': ObjectId(budget_id)})
+        budget = loader.find_by_id('budgets', budget_id)
         if budget:
             # Convert Decimal128 to float for numeric fields
             for key, value in budget.items():
@@ -161,7 +160,7 @@ class Budget:
                 ]
             }
             
-        budget = mongo.db.budgets.find_one(query)
+        budget = mongo.db.budgets.find_one(query, sort=SPEND_ORDER)
         if budget:
             # Convert Decimal128 to float for numeric fields
             for key, value in budget.items():
@@ -184,16 +183,21 @@ class Budget:
         if 'amount' in update_data:
             update_data['amount'] = float(update_data['amount'])
             # Recalculate remaining amount
-            budget = mongo.db.budgets.find_one({'_id': ObjectId(budget_id)})
+            budget = loader.find_by_id('budgets', budget_id)
             if budget:
-                spent = budget.get('spent', 0.0)
+                spent = update_data.get('spent', budget.get('spent', 0.0))
                 update_data['remaining'] = float(update_data['amount']) - spent
         
-        return mongo.db.budgets.update_one(
+        result = mongo.db.budgets.update_one(
             {'_id': ObjectId(budget_id)},
             {'$set': update_data}
         )
+        loader.write_through('budgets', budget_id, update_data)
+        return result
         
+    # Attempts at an entry update before giving up on a budget that keeps changing
+    ENTRY_UPDATE_ATTEMPTS = 3
+    
     @classmethod
     def update_budget_with_transaction(
         cls,
@@ -204,111 +208,109 @@ class Budget:
         """
         Update budget when a transaction is added/updated/deleted
         
+        Every change is a single atomic update: ``spent`` and ``remaining``
+        move by ``$inc`` in the same write that adds, changes or removes the
+        embedded entry, and the filter on the entry makes a repeated change
+        a no-op. Concurrent jobs therefore never lose updates, and a retried
+        job never counts a transaction twice.
+        
         Args:
             budget_id: ID of the budget to update
             transaction_data: Dictionary containing transaction details
             is_new: Whether this is a new transaction (True) or an update/deletion (False)
             
         Returns:
-            bool: True if update was successful, False otherwise
+            bool: True if the budget reflects the change, False if the budget does not exist
+            
+        Raises:
+            PyMongoError: if the write fails, so the job is retried
+            RuntimeError: if the entry kept changing underneath the update
         """
+        amount = float(transaction_data.get('amount'))
+        transaction_date = transaction_data.get('date', datetime.now(IST))
+        if isinstance(transaction_date, str):
+            transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d').replace(tzinfo=IST)
+        transaction_id = str(transaction_data.get('_id') or transaction_data.get('id', ''))
+        entry_id = ObjectId(transaction_id) if transaction_id else ObjectId()
+        deleted = transaction_data.get('_deleted') is True
+        
         try:
-            # Convert string amount to float if needed
-            amount = transaction_data.get('amount')
-            if not isinstance(amount, float):
-                amount = float(amount)
-                
-            # Get the transaction date or use current time
-            transaction_date = transaction_data.get('date', datetime.now(IST))
-            if isinstance(transaction_date, str):
-                transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d').replace(tzinfo=IST)
-            
-            # Get the budget
-            budget = mongo.db.budgets.find_one({
-                '_id': ObjectId(budget_id)
-            })
-            
-            if not budget:
-                print(f"Budget not found: {budget_id}")
-                return False
-                
-            # Initialize spent and transactions if they don't exist
-            current_spent = budget.get('spent', 0.0)
-            transactions = budget.get('transactions', [])
-            
-            # Find the transaction if it exists
-            transaction_id = str(transaction_data.get('_id') or transaction_data.get('id', ''))
-            existing_transaction = next(
-                (t for t in transactions if str(t.get('id')) == transaction_id), 
-                None
-            )
-            
-            # Calculate new spent amount
-            if is_new and not existing_transaction:
-                # Add new transaction
-                new_spent = current_spent + amount
-                transaction_update = {
-                    'id': ObjectId(transaction_id) if transaction_id else ObjectId(),
-                    'amount': amount,
-                    'date': transaction_date,
-                    'note': transaction_data.get('note', '')
-                }
-                update_operation = {'$push': {'transactions': transaction_update}}
-                
-            elif not is_new and existing_transaction:
-                # Remove existing transaction amount
-                old_amount = existing_transaction.get('amount', 0.0)
-                new_spent = current_spent - old_amount
-                
-                # If we're not deleting, add the new amount
-                if transaction_data.get('_deleted') is not True:
-                    new_spent += amount
-                    
-                    # Update the transaction
-                    update_operation = {
-                        '$set': {
-                            'transactions.$.amount': amount,
-                            'transactions.$.date': transaction_date,
-                            'transactions.$.note': transaction_data.get('note', '')
-                        }
-                    }
+            for _ in range(cls.ENTRY_UPDATE_ATTEMPTS):
+                if is_new:
+                    query, update = cls._add_entry(budget_id, entry_id, amount, transaction_date,
+                                                   transaction_data.get('note', ''))
                 else:
-                    # Remove the transaction
-                    update_operation = {
-                        '$pull': {
-                            'transactions': {'id': ObjectId(transaction_id)}
-                        }
-                    }
-            else:
-                print(f"Transaction update case not handled: is_new={is_new}, exists={existing_transaction is not None}")
-                return False
-            
-            # Calculate remaining amount
-            budget_amount = budget.get('amount', 0.0)
-            remaining = budget_amount - new_spent
-            
-            # Update the budget
-            update_operation['$set'] = update_operation.get('$set', {})
-            update_operation['$set'].update({
-                'spent': new_spent,
-                'remaining': remaining,
-                'updated_at': datetime.now(IST)
-            })
-            
-            result = mongo.db.budgets.update_one(
-                {'_id': ObjectId(budget_id)},
-                update_operation
-            )
-            
-            if result.modified_count > 0:
-                print(f"Updated budget {budget_id} - Spent: {new_spent}, Remaining: {remaining}")
-                return True
-            return False
-            
-        except Exception as e:
-            print(f"Error updating budget: {str(e)}")
-            return False
+                    budget = mongo.db.budgets.find_one(
+                        {'_id': ObjectId(budget_id)},
+                        {'transactions': {'$elemMatch': {'$or': [{'id': entry_id}, {'transaction_id': transaction_id}]}}}
+                    )
+                    if budget is None:
+                        current_app.logger.warning(f"Budget not found: {budget_id}")
+                        return False
+                    if not budget.get('transactions'):
+                        # Already removed, or never counted
+                        return True
+                    query, update = cls._change_entry(
+                        budget_id, budget['transactions'][0], amount, transaction_date,
+                        transaction_data.get('note', ''), deleted
+                    )
+                
+                update.setdefault('$set', {})['updated_at'] = datetime.now(IST)
+                if mongo.db.budgets.update_one(query, update).matched_count:
+                    return True
+                if is_new:
+                    if mongo.db.budgets.count_documents({'_id': ObjectId(budget_id)}, limit=1):
+                        # The entry is already there
+                        return True
+                    current_app.logger.warning(f"Budget not found: {budget_id}")
+                    return False
+        finally:
+            loader.invalidate('budgets', budget_id)
+        
+        raise RuntimeError(f"Budget {budget_id} entry for transaction {transaction_id} kept changing")
+    
+    @staticmethod
+    def _add_entry(budget_id, entry_id, amount, date, note):
+        query = {
+            '_id': ObjectId(budget_id),
+            'transactions.id': {'$ne': entry_id},
+            'transactions.transaction_id': {'$ne': str(entry_id)}
+        }
+        update = {
+            '$push': {'transactions': {'id': entry_id, 'amount': amount, 'date': date, 'note': note}},
+            '$inc': {'spent': amount, 'remaining': -amount}
+        }
+        return query, update
+    
+    @staticmethod
+    def _change_entry(budget_id, entry, amount, date, note, deleted):
+        """Replace or remove ``entry``, guarded on it still holding the amount that was read."""
+        # Entries added at budget creation are keyed by ``transaction_id``
+        key = 'id' if 'id' in entry else 'transaction_id'
+        old_amount = float(entry.get('amount', 0.0))
+        query = {
+            '_id': ObjectId(budget_id),
+            'transactions': {'$elemMatch': {key: entry[key], 'amount': entry.get('amount')}}
+        }
+        if deleted:
+            delta = -old_amount
+            update = {'$pull': {'transactions': {key: entry[key]}}}
+        else:
+            delta = amount - old_amount
+            update = {'$set': {
+                'transactions.$.amount': amount,
+                'transactions.$.date': date,
+                'transactions.$.note': note
+            }}
+        update['$inc'] = {'spent': delta, 'remaining': -delta}
+        return query, update
     
     @staticmethod
     def delete_budget(budget_id):
-        return mongo.db.budgets.delete_one({'_id': ObjectId(budget_id)})
\ No newline at end of file
+        loader.invalidate('budgets', budget_id)
+        deleted = mongo.db.budgets.find_one_and_delete(
+            {'_id': ObjectId(budget_id)}, projection={'user_id': 1}
+        )
+        if deleted:
+            Tombstone.record(deleted['user_id'], 'budgets', deleted['_id'])
+        return deleted
\ No newline at end of file
@@ -0,0 +1,142 @@
+from datetime import datetime
+import pytz
+from app import mongo
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from app.utils.cache import invalidate
+
+TIMEZONE = pytz.timezone('Asia/Kolkata')
+
+class Category:
+    """Per-user category catalogue with usage counts.
+
+    One document per ``(user_id, type, name)`` is maintained incrementally
+    on transaction writes, so the category dropdown never has to scan the
+    transactions collection. Users whose transactions predate the catalogue
+    are backfilled once, recorded by ``BACKFILL_FIELD`` on the user.
+    """
+    CACHE_KEY = 'categories:{user_id}'
+    BACKFILL_FIELD = 'categories_backfilled_at'
+    
+    INDEXES = [
+        IndexModel([('user_id', ASCENDING), ('type', ASCENDING), ('name', ASCENDING)],
+                   name='user_type_name', unique=True),
+    ]
+    
+    @staticmethod
+    def create_indexes():
+        return mongo.db.categories.create_indexes(Category.INDEXES)
+    
+    @staticmethod
+    def record_usage(user_id, type, name, used_at=None, delta=1):
+        """Adjust the usage count of a category by ``delta``.
+
+        Decrements never create a row or take a count below zero.
+        """
+        if not type or not name:
+            return None
+        now = datetime.now(TIMEZONE)
+        query = {'user_id': ObjectId(user_id), 'type': type, 'name': name}
+        update = {'$inc': {'count': delta}, '$set': {'updated_at': now}}
+        if delta < 0:
+            query['count'] = {'$gte': -delta}
+            return mongo.db.categories.update_one(query, update)
+        update['$setOnInsert'] = {'created_at': now}
+        update['$max'] = {'last_used': used_at or now}
+        return mongo.db.categories.update_one(query, update, upsert=True)
+    
+    @staticmethod
+    def record_transaction_change(user_id, old_transaction=None, new_transaction=None):
+        """Move usage counts from an old transaction's category to a new one's."""
+        old_key = (old_transaction.get('type'), old_transaction.get('category')) if old_transaction else None
+        new_key = (new_transaction.get('type'), new_transaction.get('category')) if new_transaction else None
+        if old_key == new_key:
+            return
+        if old_key:
+            Category.record_usage(user_id, *old_key, delta=-1)
+        if new_key:
+            Category.record_usage(user_id, *new_key, used_at=new_transaction.get('date'))
+        invalidate(Category.CACHE_KEY.format(user_id=user_id))
+    
+    @staticmethod
+    def get_user_categories(user_id):
+        return list(mongo.db.categories.find(
+            {'user_id': ObjectId(user_id), 'count': {'$gt': 0}},
+            {'_id': 0, 'type': 1, 'name': 1, 'count': 1, 'last_used': 1}
+        ).sort([('count', DESCENDING)]))
+    
+    @staticmethod
+    def rebuild_user_catalogue(user_id):
+        """Recompute a user's catalogue from their transactions.
+
+        Rows for categories no longer used are reset to zero, and the user is
+        marked as backfilled.
+        """
+        now = datetime.now(TIMEZONE)
+        existing = {
+            (row['type'], row['name'])
+            for row in mongo.db.categories.find({'user_id': ObjectId(user_id)}, {'type': 1, 'name': 1})
+        }
+        usage = list(mongo.db.transactions.aggregate([
+            {'$match': {'user_id': ObjectId(user_id)}},
+            {'$group': {
+                '_id': {'type': '$type', 'name': '$category'},
+                'count': {'$sum': 1},
+                'last_used': {'$max': '$date'}
+            }}
+        ]))
+        used = {(row['_id'].get('type'), row['_id'].get('name')) for row in usage}
+        operations = [
+            UpdateOne(
+                {'user_id': ObjectId(user_id), 'type': row['_id']['type'], 'name': row['_id']['name']},
+                {'$set': {'count': row['count'], 'last_used': row['last_used'], 'updated_at': now},
+                 '$setOnInsert': {'created_at': now}},
+                upsert=True
+            )
+            for row in usage if row['_id'].get('type') and row['_id'].get('name')
+        ]
+        operations += [
+            UpdateOne(
+                {'user_id': ObjectId(user_id), 'type': type, 'name': name},
+                {'$set': {'count': 0, 'updated_at': now}}
+            )
+            for type, name in existing - used
+        ]
+        if operations:
+            mongo.db.categories.bulk_write(operations, ordered=False)
+        mongo.db.users.update_one({'_id': ObjectId(user_id)}, {'$set': {Category.BACKFILL_FIELD: now}})
+        invalidate(Category.CACHE_KEY.format(user_id=user_id))
+        return len(operations)
+    
+    @staticmethod
+    def is_backfilled(user_id):
+        return mongo.db.users.find_one(
+            {'_id': ObjectId(user_id), Category.BACKFILL_FIELD: {'$exists': True}}, {'_id': 1}
+        ) is not None
+    
+    @staticmethod
+    def get_catalogue(user_id, defaults):
+        """Return category names per type, most used first, merged with ``defaults``.
+        
+        The result keeps the ``{type: [names]}`` shape of ``defaults`` and adds
+        a ``usage`` map with counts and last-used timestamps.
+        """
+        if not Category.is_backfilled(user_id):
+            Category.rebuild_user_catalogue(user_id)
+        rows = Category.get_user_categories(user_id)
+        
+        catalogue = {type: [] for type in defaults}
+        usage = {type: {} for type in defaults}
+        for row in rows:
+            names = catalogue.setdefault(row['type'], [])
+            names.append(row['name'])
+            last_used = row.get('last_used')
+            usage.setdefault(row['type'], {})[row['name']] = {
+                'count': row['count'],
+                'last_used': last_used.isoformat() if last_used else None
+            }
+        for type, names in defaults.items():
+            catalogue[type].extend(name for name in names if name not in usage[type])
+        
+        catalogue['usage'] = usage
+        return catalogue
@@ -0,0 +1,110 @@
+from flask import g, has_request_context
+from app import mongo
+from bson import ObjectId
+
+class IdentityMap:
+    """Request-scoped cache of documents fetched by ``_id``.
+    
+    Lookups for ids registered with ``want`` are batched into a single
+    ``$in`` query the first time any of them is loaded, and repeated lookups
+    are served from memory. Writers keep it coherent through ``prime``,
+    ``update`` and ``invalidate``. Callers always receive a shallow copy.
+    """
+    def __init__(self):
+        self._docs = {}
+        self._pending = {}
+    
+    def want(self, collection, ids):
+        """Register ids to be fetched together with the next load from ``collection``."""
+        pending = self._pending.setdefault(collection, set())
+        pending.update(ObjectId(i) for i in ids if i)
+    
+    def _fetch(self, collection, ids):
+        ids = [i for i in ids if (collection, i) not in self._docs]
+        if not ids:
+            return
+        if len(ids) == 1:
+            docs = [mongo.db[collection].find_one({'_id': ids[0]})]
+        else:
+            docs = mongo.db[collection].find({'_id': {'$in': ids}})
+        for _id in ids:
+            self._docs[(collection, _id)] = None
+        for doc in docs:
+            if doc:
+                self._docs[(collection, doc['_id'])] = doc
+    
+    def load_many(self, collection, ids):
+        ids = [ObjectId(i) for i in ids]
+        pending = self._pending.pop(collection, set())
+        self._fetch(collection, list(pending.union(ids)))
+        docs = (self._docs.get((collection, i)) for i in ids)
+        return [dict(doc) for doc in docs if doc is not None]
+    
+    def load(self, collection, _id):
+        docs = self.load_many(collection, [_id])
+        return docs[0] if docs else None
+    
+    def prime(self, collection, doc):
+        if doc and doc.get('_id') is not None:
+            self._docs[(collection, ObjectId(doc['_id']))] = dict(doc)
+    
+    def update(self, collection, _id, fields):
+        """Apply a plain ``$set`` to a cached document (write-through)."""
+        key = (collection, ObjectId(_id))
+        doc = self._docs.get(key)
+        if doc is None:
+            return
+        if any('.' in field for field in fields):
+            del self._docs[key]
+        else:
+            doc.update(fields)
+    
+    def invalidate(self, collection, _id=None):
+        if _id is None:
+            self._docs = {k: v for k, v in self._docs.items() if k[0] != collection}
+        else:
+            self._docs.pop((collection, ObjectId(_id)), None)
+    
+    def clear(self):
+        self._docs.clear()
+        self._pending.clear()
+
+def identity_map():
+    """Return the current request's identity map, or None outside a request."""
+    if not has_request_context():
+        return None
+    if '_identity_map' not in g:
+        g._identity_map = IdentityMap()
+    return g._identity_map
+
+def clear_identity_map(exception=None):
+    """Teardown hook dropping everything cached during the request."""
+    if has_request_context() and '_identity_map' in g:
+        g._identity_map.clear()
+
+def find_by_id(collection, _id):
+    imap = identity_map()
+    if imap is None:
+        return mongo.db[collection].find_one({'_id': ObjectId(_id)})
+    return imap.load(collection, _id)
+
+def find_by_ids(collection, ids):
+    imap = identity_map()
+    if imap is None:
+        return list(mongo.db[collection].find({'_id': {'$in': [ObjectId(i) for i in ids]}}))
+    return imap.load_many(collection, ids)
+
+def prime(collection, doc):
+    imap = identity_map()
+    if imap is not None:
+        imap.prime(collection, doc)
+
+def write_through(collection, _id, fields):
+    imap = identity_map()
+    if imap is not None:
+        imap.update(collection, _id, fields)
+
+def invalidate(collection, _id=None):
+    imap = identity_map()
+    if imap is not None:
+        imap.invalidate(collection, _id)
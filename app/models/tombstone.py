@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+import pytz
+from app import mongo
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+
+class Tombstone:
+    """Records of deleted documents so sync clients can drop them locally."""
+    RETENTION = timedelta(days=30)
+    
+    INDEXES = [
+        IndexModel([('user_id', ASCENDING), ('deleted_at', ASCENDING), ('_id', ASCENDING)], name='user_deleted_at'),
+        IndexModel([('deleted_at', ASCENDING)], name='deleted_at_ttl',
+                   expireAfterSeconds=int(RETENTION.total_seconds())),
+    ]
+    
+    @staticmethod
+    def create_indexes():
+        return mongo.db.tombstones.create_indexes(Tombstone.INDEXES)
+    
+    @staticmethod
+    def record(user_id, collection, doc_id):
+        return mongo.db.tombstones.insert_one({
+            'user_id': ObjectId(user_id),
+            'collection': collection,
+            'doc_id': ObjectId(doc_id),
+            'deleted_at': datetime.now(pytz.UTC)
+        })
@@ -1,10 +1,217 @@
 from datetime import datetime, time
+import re
 import pytz
 from app import mongo
+from app.models import loader
+from app.models.tombstone import Tombstone
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
 
 TIMEZONE = pytz.timezone('Asia/Kolkata')
 
+class TransactionQuery:
+    """Composable, index-friendly query builder for a user's transactions.
+
+    Every query is anchored on ``user_id`` and sorted on ``date`` so it maps
+    onto one of the compound indexes in ``Transaction.INDEXES``. The index
+    picked for the current filter combination is exposed as ``index_name``
+    and passed to MongoDB as a ``hint`` when requested. Hints are off by
+    default: a hint naming an index that was never created fails the query,
+    and the filter shapes already lead the planner to the same index.
+    """
+
+    TYPES = ('income', 'expense', 'transfer')
+
+    def __init__(self, user_id):
+        self.user_id = ObjectId(user_id)
+        self._types = []
+        self._categories = []
+        self._accounts = []
+        self._account_fields = ('account_from', 'account_to')
+        self._min_amount = None
+        self._max_amount = None
+        self._start_date = None
+        self._end_date = None
+        self._description = None
+        self._text = None
+        self._sort_direction = DESCENDING
+
+    @classmethod
+    def from_filters(cls, user_id, filters=None):
+        """Build a query from the legacy ``filters`` dict used by the routes."""
+        query = cls(user_id)
+        filters = filters or {}
+        if filters.get('type'):
+            query.types(filters['type'])
+        if filters.get('category'):
+            query.categories(filters['category'])
+        if filters.get('account_from'):
+            query.accounts(filters['account_from'], fields=('account_from',))
+        if filters.get('account_to'):
+            query.accounts(filters['account_to'], fields=('account_to',))
+        if isinstance(filters.get('date'), dict):
+            query.date_range(filters['date'].get('$gte'), filters['date'].get('$lte'))
+        if filters.get('start_date') or filters.get('end_date'):
+            query.date_range(filters.get('start_date'), filters.get('end_date'))
+        return query
+
+    @staticmethod
+    def _as_list(values):
+        if values is None:
+            return []
+        if isinstance(values, (list, tuple, set)):
+            return [v for v in values if v not in (None, '')]
+        return [values] if values != '' else []
+
+    def types(self, values):
+        types = self._as_list(values)
+        invalid = [t for t in types if t not in self.TYPES]
+        if invalid:
+            raise ValueError(f"Invalid transaction type(s): {', '.join(invalid)}")
+        self._types = sorted(set(types))
+        return self
+
+    def categories(self, values):
+        self._categories = sorted(set(self._as_list(values)))
+        return self
+
+    def accounts(self, values, fields=('account_from', 'account_to')):
+        self._accounts = [ObjectId(a) for a in self._as_list(values)]
+        self._account_fields = tuple(fields)
+        return self
+
+    def amount_range(self, min_amount=None, max_amount=None):
+        self._min_amount = float(min_amount) if min_amount not in (None, '') else None
+        self._max_amount = float(max_amount) if max_amount not in (None, '') else None
+        if (self._min_amount is not None and self._max_amount is not None
+                and self._min_amount > self._max_amount):
+            raise ValueError('min_amount cannot be greater than max_amount')
+        return self
+
+    def date_range(self, start_date=None, end_date=None):
+        self._start_date = start_date
+        self._end_date = end_date
+        return self
+
+    def description(self, text):
+        self._description = text.strip() if text else None
+        return self
+
+    def text(self, search):
+        """Full-text search on ``description`` using the text index."""
+        self._text = search.strip() if search else None
+        return self
+
+    def order(self, direction):
+        self._sort_direction = ASCENDING if direction in (ASCENDING, 'asc') else DESCENDING
+        return self
+
+    @staticmethod
+    def _match(values):
+        return values[0] if len(values) == 1 else {'$in': values}
+
+    @property
+    def index_name(self):
+        """Name of the compound index this filter combination is served by.
+
+        Equality prefixes are preferred in order of selectivity; amount and
+        description filters are always applied as residual predicates on the
+        chosen ``(user_id, <equality>, date)`` index so the date sort never
+        happens in memory. Full-text searches must use the text index.
+        """
+        if self._text:
+            return 'user_description_text'
+        if self._categories:
+            return 'user_category_date'
+        if self._accounts:
+            if len(self._account_fields) == 1:
+                return f'user_{self._account_fields[0]}_date_id'
+            # Each $or branch is planned on its own account index
+            return None
+        if self._types:
+            return 'user_type_date'
+        return 'user_date'
+
+    @property
+    def hint(self):
+        # MongoDB rejects hints on $text queries
+        return None if self._text else self.index_name
+
+    def build(self):
+        """Return the MongoDB filter document."""
+        query = {'user_id': self.user_id}
+        if self._text:
+            query['$text'] = {'$search': self._text}
+        if self._types:
+            query['type'] = self._match(self._types)
+        if self._categories:
+            query['category'] = self._match(self._categories)
+
+        date_range = {}
+        if self._start_date:
+            date_range['$gte'] = self._start_date
+        if self._end_date:
+            date_range['$lte'] = self._end_date
+        if date_range:
+            query['date'] = date_range
+
+        amount_range = {}
+        if self._min_amount is not None:
+            amount_range['$gte'] = self._min_amount
+        if self._max_amount is not None:
+            amount_range['$lte'] = self._max_amount
+        if amount_range:
+            query['amount'] = amount_range
+
+        if self._description:
+            query['description'] = {'$regex': re.escape(self._description), '$options': 'i'}
+
+        if self._accounts:
+            accounts = self._match(self._accounts)
+            if len(self._account_fields) == 1:
+                query[self._account_fields[0]] = accounts
+            elif self._text:
+                # Only one $text clause is allowed, so keep it at the top level
+                query['$or'] = [{field: accounts} for field in self._account_fields]
+            else:
+                # Repeat the full predicate in every branch so each one can be
+                # served by its own (user_id, account_*, date, _id) index.
+                base = dict(query)
+                query = {'$or': [dict(base, **{field: accounts}) for field in self._account_fields]}
+        return query
+
+    @property
+    def sort(self):
+        return [('date', self._sort_direction)]
+
+    def find(self, limit=50, skip=0, projection=None, use_hint=False):
+        cursor = mongo.db.transactions.find(self.build(), projection).sort(self.sort)
+        if use_hint and self.hint:
+            cursor = cursor.hint(self.hint)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    def explain(self, use_hint=False):
+        """Return the names of the indexes used by the winning plan."""
+        plan = self.find(limit=1, use_hint=use_hint).explain()
+        names = set()
+
+        def collect(stage):
+            if isinstance(stage, dict):
+                if 'indexName' in stage:
+                    names.add(stage['indexName'])
+                for value in stage.values():
+                    collect(value)
+            elif isinstance(stage, list):
+                for value in stage:
+                    collect(value)
+
+        collect(plan.get('queryPlanner', {}).get('winningPlan', {}))
+        return names
+
 class Transaction:
     DEFAULT_CATEGORIES = {
         'expense': ['Food', 'Transport', 'Entertainment', 'Utilities', 'Rent', 'Shopping', 'Healthcare', 'Education'],
@@ -12,6 +219,28 @@ class Transaction:
         'transfer': ['Between Accounts']
     }
     
+    INDEXES = [
+        IndexModel([('user_id', ASCENDING), ('date', DESCENDING)], name='user_date'),
+        IndexModel([('user_id', ASCENDING), ('type', ASCENDING), ('date', DESCENDING)], name='user_type_date'),
+        IndexModel([('user_id', ASCENDING), ('category', ASCENDING), ('date', DESCENDING)], name='user_category_date'),
+        # _id breaks date ties in the account ledger, which sorts on (date, _id)
+        IndexModel([('user_id', ASCENDING), ('account_from', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)], name='user_account_from_date_id'),
+        IndexModel([('user_id', ASCENDING), ('account_to', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)], name='user_account_to_date_id'),
+        IndexModel([('user_id', ASCENDING), ('description', TEXT)], name='user_description_text'),
+        IndexModel([('user_id', ASCENDING), ('updated_at', ASCENDING), ('_id', ASCENDING)], name='user_updated_at'),
+    ]
+    # Superseded by an index above; dropped by ``create_indexes``
+    RETIRED_INDEXES = ['user_account_from_date', 'user_account_to_date']
+    
+    @staticmethod
+    def create_indexes():
+        names = mongo.db.transactions.create_indexes(Transaction.INDEXES)
+        existing = mongo.db.transactions.index_information()
+        for name in Transaction.RETIRED_INDEXES:
+            if name in existing:
+                mongo.db.transactions.drop_index(name)
+        return names
+    
     @staticmethod
     def create_transaction(user_id, type, amount, category, description, account_from=None, account_to=None, date=None, time_str=None):
         # Create datetime object from date and time
@@ -22,6 +251,8 @@ class Transaction:
                 transaction_date = TIMEZONE.localize(transaction_date)
             except ValueError:
                 transaction_date = datetime.now(TIMEZONE)
+        elif isinstance(date, datetime):
+            transaction_date = date if date.tzinfo else TIMEZONE.localize(date)
         else:
             transaction_date = datetime.now(TIMEZONE)
 
@@ -37,43 +268,144 @@ class Transaction:
             'created_at': datetime.now(TIMEZONE),
             'updated_at': datetime.now(TIMEZONE)
         }
-        return mongo.db.transactions.insert_one(transaction)
+        result = mongo.db.transactions.insert_one(transaction)
+        loader.prime('transactions', transaction)
+        return result
     
     @staticmethod
-    def get_user_transactions(user_id, limit=50, skip=0, filters=None):
-        query = {'user_id': ObjectId(user_id)}
-        if filters:
-            if 'type' in filters:
-                query['type'] = filters['type']
-            if 'category' in filters:
-                query['category'] = filters['category']
-            if 'start_date' in filters and 'end_date' in filters:
-                query['date'] = {'$gte': filters['start_date'], '$lte': filters['end_date']}
-        
-        return list(mongo.db.transactions.find(query).sort('date', -1).limit(limit).skip(skip))
+    def get_user_transactions(user_id, limit=50, skip=0, filters=None, projection=None):
+        return list(TransactionQuery.from_filters(user_id, filters).find(limit, skip, projection))
     
     @staticmethod
     def get_transaction_by_id(transaction_id):
-        return mongo.db.transactions.find_one({'_id': ObjectId(transaction_id)})
+        return loader.find_by_id('transactions', transaction_id)
+    
+    @staticmethod
+    def get_transactions_by_ids(transaction_ids):
+        return loader.find_by_ids('transactions', transaction_ids)
     
     @staticmethod
     def update_transaction(transaction_id, update_data):
-        return mongo.db.transactions.update_one({'_id': ObjectId(transaction_id)}, {'$set': update_data})
+        update_data.setdefault('updated_at', datetime.now(TIMEZONE))
+        result = mongo.db.transactions.update_one({'_id': ObjectId(transaction_id)}, {'$set': update_data})
+        loader.write_through('transactions', transaction_id, update_data)
+        return result
     
     @staticmethod
     def delete_transaction(transaction_id):
-        return mongo.db.transactions.delete_one({'_id': ObjectId(transaction_id)})
+        loader.invalidate('transactions', transaction_id)
+        deleted = mongo.db.transactions.find_one_and_delete(
+            {'_id': ObjectId(transaction_id)}, projection={'user_id': 1}
+        )
+        if deleted:
+            Tombstone.record(deleted['user_id'], 'transactions', deleted['_id'])
+        return deleted
+    
+    @staticmethod
+    def get_account_ledger(user_id, account_id, after=None, descending=True, start=None, end=None,
+                           limit=100, projection=None):
+        """An account's transactions ordered by ``(date, _id)``, resuming after ``after``.
+
+        Each ``$or`` branch is anchored on ``user_id`` plus one account field
+        so it runs on the matching ``user_account_*_date_id`` index and
+        needs no in-memory sort.
+        """
+        op = '$lt' if descending else '$gt'
+        dates = {}
+        if start:
+            dates['$gte'] = start
+        if end:
+            dates['$lt'] = end
+        branches = []
+        for field in ('account_from', 'account_to'):
+            branch = {'user_id': ObjectId(user_id), field: ObjectId(account_id)}
+            if dates:
+                branch['date'] = dict(dates)
+            if after:
+                date, last_id = after
+                branch['$or'] = [{'date': {op: date}}, {'date': date, '_id': {op: last_id}}]
+            branches.append(branch)
+        direction = DESCENDING if descending else ASCENDING
+        return mongo.db.transactions.find({'$or': branches}, projection).sort(
+            [('date', direction), ('_id', direction)]
+        ).limit(limit)
+    
+    @staticmethod
+    def account_has_transactions(user_id, account_id):
+        """Whether any transaction moves money from or to the account."""
+        account_id = ObjectId(account_id)
+        return mongo.db.transactions.find_one(
+            {'$or': [
+                {'user_id': ObjectId(user_id), 'account_from': account_id},
+                {'user_id': ObjectId(user_id), 'account_to': account_id}
+            ]},
+            {'_id': 1}
+        ) is not None
+    
+    @staticmethod
+    def get_account_activity(user_id, account_ids, since):
+        """Transaction count, last activity and inflow/outflow since ``since`` per account.
+        
+        One aggregation with a facet per account field. Both the counts and
+        the flows follow the balance rules: an account's outgoing side is its
+        expenses and transfers out, its incoming side its income and
+        transfers in. A transaction whose type ignores the field (an expense
+        with a leftover ``account_to``) does not count for that account.
+        """
+        user_id = ObjectId(user_id)
+        account_ids = [ObjectId(a) for a in account_ids]
+        if not account_ids:
+            return {}
+        
+        def side(field, other, flow_type):
+            return [
+                {'$match': {field: {'$in': account_ids}, '$or': [
+                    {'type': flow_type},
+                    {'type': 'transfer', other: {'$ne': None}}
+                ]}},
+                {'$group': {
+                    '_id': f'${field}',
+                    'count': {'$sum': 1},
+                    'last_activity': {'$max': '$date'},
+                    'flow': {'$sum': {'$cond': [{'$gte': ['$date', since]}, '$amount', 0]}}
+                }}
+            ]
+        
+        result = list(mongo.db.transactions.aggregate([
+            {'$match': {'$or': [
+                {'user_id': user_id, 'account_from': {'$in': account_ids}},
+                {'user_id': user_id, 'account_to': {'$in': account_ids}}
+            ]}},
+            {'$project': {'type': 1, 'amount': 1, 'date': 1, 'account_from': 1, 'account_to': 1}},
+            {'$facet': {
+                'outgoing': side('account_from', 'account_to', 'expense'),
+                'incoming': side('account_to', 'account_from', 'income')
+            }}
+        ]))
+        
+        activity = {
+            str(a): {'transactions_count': 0, 'last_activity': None, 'inflow_30d': 0.0, 'outflow_30d': 0.0}
+            for a in account_ids
+        }
+        for facet, flow in (('outgoing', 'outflow_30d'), ('incoming', 'inflow_30d')):
+            for row in (result[0][facet] if result else []):
+                stats = activity[str(row['_id'])]
+                stats['transactions_count'] += row['count']
+                stats[flow] = round(row['flow'], 2)
+                if stats['last_activity'] is None or row['last_activity'] > stats['last_activity']:
+                    stats['last_activity'] = row['last_activity']
+        return activity
     
     @staticmethod
-    def get_transactions_by_type(user_id, type, start_date=None, end_date=None):
+    def get_transactions_by_type(user_id, type, start_date=None, end_date=None, projection=None):
         query = {'user_id': ObjectId(user_id), 'type': type}
         if start_date and end_date:
             query['date'] = {'$gte': start_date, '$lte': end_date}
-        return list(mongo.db.transactions.find(query))
+        return list(mongo.db.transactions.find(query, projection))
     
     @staticmethod
-    def get_transactions_by_category(user_id, category, start_date=None, end_date=None):
+    def get_transactions_by_category(user_id, category, start_date=None, end_date=None, projection=None):
         query = {'user_id': ObjectId(user_id), 'category': category}
         if start_date and end_date:
             query['date'] = {'$gte': start_date, '$lte': end_date}
-        return list(mongo.db.transactions.find(query))
\ No newline at end of file
+        return list(mongo.db.transactions.find(query, projection))
\ No newline at end of file
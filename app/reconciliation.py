@@ -0,0 +1,197 @@
+"""Account balance reconciliation.
+
+An account's ``balance`` should equal its ``opening_balance`` plus its
+ledger: expenses and transfers out of ``account_from`` and income and
+transfers into ``account_to``, the same rules the transaction routes apply
+incrementally. Each batch of users is checked with one aggregation over
+their transactions and one read of their accounts, and batches run in a
+process pool with a MongoClient per process.
+
+Accounts created before ``opening_balance`` existed cannot be checked:
+transaction writes never moved their balances (the routes called a missing
+``Account.update_balance``), so the stored balance is not evidence of
+anything. They are reported as unverified. With ``baseline`` they are
+baselined from their balance at creation, which for those accounts is the
+stored balance, and then repaired like any other account.
+"""
+import multiprocessing
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+
+TOLERANCE = 0.005
+
+_present = {'$ne': None}
+
+def ledger_pipeline(user_ids):
+    """Net ledger amount and transaction count per account for ``user_ids``.
+
+    Returns a single document with one facet per side of the ledger.
+    """
+    transfer = {'type': 'transfer', 'account_from': _present, 'account_to': _present}
+    return [
+        {'$match': {'user_id': {'$in': user_ids}, 'amount': {'$gt': 0}}},
+        {'$project': {'_id': 0, 'type': 1, 'amount': 1, 'account_from': 1, 'account_to': 1}},
+        {'$facet': {
+            'outflow': [
+                {'$match': {'$or': [{'type': 'expense', 'account_from': _present}, transfer]}},
+                {'$group': {'_id': '$account_from', 'amount': {'$sum': '$amount'}, 'transactions': {'$sum': 1}}}
+            ],
+            'inflow': [
+                {'$match': {'$or': [{'type': 'income', 'account_to': _present}, transfer]}},
+                {'$group': {'_id': '$account_to', 'amount': {'$sum': '$amount'}, 'transactions': {'$sum': 1}}}
+            ]
+        }}
+    ]
+
+def _ledger(db, user_ids):
+    ledger = {}
+    for sides in db.transactions.aggregate(ledger_pipeline(user_ids), allowDiskUse=True):
+        for side, sign in (('outflow', -1), ('inflow', 1)):
+            for row in sides[side]:
+                entry = ledger.setdefault(row['_id'], {'ledger': 0.0, 'transactions': 0})
+                entry['ledger'] += sign * row['amount']
+                entry['transactions'] += row['transactions']
+    return ledger
+
+def _compare(db, user_ids):
+    """Compare stored balances with the ledger; returns ``(drifted, unverified, stats)``."""
+    accounts = list(db.accounts.find(
+        {'user_id': {'$in': user_ids}},
+        {'user_id': 1, 'name': 1, 'balance': 1, 'opening_balance': 1}
+    ))
+    ledger = _ledger(db, user_ids)
+
+    drifted, unverified = [], []
+    transactions = 0
+    for account in accounts:
+        row = ledger.get(account['_id'], {'ledger': 0.0, 'transactions': 0})
+        transactions += row['transactions']
+        balance = float(account.get('balance') or 0)
+        if 'opening_balance' not in account:
+            unverified.append({
+                'account_id': str(account['_id']),
+                'user_id': str(account['user_id']),
+                'name': account.get('name'),
+                'balance': balance,
+                'ledger': round(row['ledger'], 2),
+                # The balance if none of the account's transactions were ever applied
+                'expected_from_creation': round(balance + row['ledger'], 2)
+            })
+            continue
+        expected = round(float(account['opening_balance']) + row['ledger'], 2)
+        if abs(balance - expected) > TOLERANCE:
+            drifted.append({
+                'account_id': str(account['_id']),
+                'user_id': str(account['user_id']),
+                'name': account.get('name'),
+                'balance': balance,
+                'expected': expected,
+                'drift': round(balance - expected, 2)
+            })
+    return drifted, unverified, {'accounts': len(accounts), 'transactions': transactions}
+
+def check_users(db, user_ids, repair=False, baseline=False):
+    """Reconcile the accounts of ``user_ids``, optionally repairing drift.
+
+    A transaction written between reading the accounts and aggregating the
+    ledger looks like drift, so drifted users are checked a second time and
+    only drift seen identically in both passes is reported. Repairs are
+    conditional on the balance still being the one that was checked.
+    Unverified accounts are only written with ``repair`` and ``baseline``.
+    """
+    user_ids = [ObjectId(u) for u in user_ids]
+    drifted, unverified, stats = _compare(db, user_ids)
+    if drifted:
+        first = {(d['account_id'], d['drift']) for d in drifted}
+        recheck, _, _ = _compare(db, list({ObjectId(d['user_id']) for d in drifted}))
+        drifted = [d for d in recheck if (d['account_id'], d['drift']) in first]
+
+    result = dict(stats, users=len(user_ids), drifted=len(drifted), drift=drifted,
+                  unverified=len(unverified), unverified_accounts=unverified,
+                  baselined=[], repaired=[], repaired_users=[])
+    if not repair:
+        return result
+
+    now = datetime.now(timezone.utc)
+    requests = [
+        UpdateOne(
+            {'_id': ObjectId(d['account_id']), 'balance': d['balance']},
+            {'$set': {'balance': d['expected'], 'updated_at': now}}
+        )
+        for d in drifted
+    ]
+    if baseline:
+        requests += [
+            UpdateOne(
+                {'_id': ObjectId(u['account_id']), 'balance': u['balance'], 'opening_balance': {'$exists': False}},
+                {'$set': {'opening_balance': u['balance'], 'balance': u['expected_from_creation'], 'updated_at': now}}
+            )
+            for u in unverified
+        ]
+    if requests:
+        db.accounts.bulk_write(requests, ordered=False)
+    if baseline and unverified:
+        # Snapshots are only stored for accounts with an opening balance
+        db.balance_snapshots.delete_many({'account_id': {'$in': [ObjectId(u['account_id']) for u in unverified]}})
+        result['baselined'] = [u['account_id'] for u in unverified]
+    result['repaired'] = [d['account_id'] for d in drifted]
+    result['repaired_users'] = sorted(
+        {d['user_id'] for d in drifted} | ({u['user_id'] for u in unverified} if baseline else set())
+    )
+    return result
+
+_db = None
+
+def _init_worker(mongo_uri):
+    global _db
+    _db = MongoClient(mongo_uri).get_default_database()
+
+def _check_batch(task):
+    user_ids, repair, baseline = task
+    return check_users(_db, user_ids, repair=repair, baseline=baseline)
+
+def user_batches(db, batch_size, user_ids=None):
+    query = {'_id': {'$in': [ObjectId(u) for u in user_ids]}} if user_ids else {}
+    batch = []
+    for user in db.users.find(query, {'_id': 1}).sort('_id', 1):
+        batch.append(user['_id'])
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def reconcile(mongo_uri, workers=None, batch_size=500, repair=False, baseline=False, user_ids=None,
+              max_reported=1000, progress=None):
+    """Reconcile every user's accounts (or only ``user_ids``).
+
+    Returns totals, up to ``max_reported`` drifted and unverified accounts,
+    and the ids of the users whose accounts were written.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    totals = {'users': 0, 'accounts': 0, 'transactions': 0, 'drifted': 0, 'unverified': 0,
+              'repaired': 0, 'baselined': 0}
+    drift, unverified, repaired_users = [], [], set()
+
+    client = MongoClient(mongo_uri)
+    try:
+        tasks = (
+            (batch, repair, baseline)
+            for batch in user_batches(client.get_default_database(), batch_size, user_ids)
+        )
+        # Spawned workers avoid inheriting the parent's MongoClient and thread pools
+        with multiprocessing.get_context('spawn').Pool(workers, _init_worker, (mongo_uri,)) as pool:
+            for result in pool.imap_unordered(_check_batch, tasks):
+                for key in ('users', 'accounts', 'transactions', 'drifted', 'unverified'):
+                    totals[key] += result[key]
+                totals['repaired'] += len(result['repaired'])
+                totals['baselined'] += len(result['baselined'])
+                repaired_users.update(result['repaired_users'])
+                drift.extend(result['drift'][:max(0, max_reported - len(drift))])
+                unverified.extend(result['unverified_accounts'][:max(0, max_reported - len(unverified))])
+                if progress:
+                    progress(totals)
+    finally:
+        client.close()
+    return dict(totals, drift=drift, unverified_accounts=unverified, repaired_users=sorted(repaired_users))
@@ -1,28 +1,82 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+import pytz
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import get_jwt_identity
+from app.auth.utils import jwt_required
+from app import mongo
+from app.models import loader
 from app.models.account import Account
+from app.models.transaction import Transaction
+from app.models.balance_snapshot import BalanceSnapshot, IST
+from app.reconciliation import check_users
 from app.utils.validators import validate_amount
+from app.utils.cache import versioned
+from app.utils.helpers import parse_fields, fields_projection, select_fields
+
+# Response fields selectable with ``fields=``
+ACCOUNT_FIELDS = {
+    'id': ('_id',),
+    'name': ('name',),
+    'type': ('type',),
+    'balance': ('balance',),
+    'opening_balance': ('opening_balance',),
+    'bank_name': ('bank_name',),
+    'last_four': ('last_four',),
+    'details': ('details',),
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',),
+    # Computed from the account's transactions
+    'activity': ()
+}
+
+ACTIVITY_WINDOW = timedelta(days=30)
+
+def _format_account(account):
+    """Serialize an account document for API responses."""
+    return {
+        'id': str(account['_id']),
+        'name': account.get('name'),
+        'type': account.get('type'),
+        'balance': account.get('balance'),
+        'opening_balance': account.get('opening_balance'),
+        'bank_name': account.get('bank_name'),
+        'last_four': account.get('last_four'),
+        'details': account.get('details'),
+        'created_at': account['created_at'].isoformat() if 'created_at' in account else None,
+        'updated_at': account['updated_at'].isoformat() if 'updated_at' in account else None
+    }
 
 accounts_bp = Blueprint('accounts', __name__)
 
 @accounts_bp.route('/', methods=['GET', 'POST'])
 @jwt_required()
+@versioned(reads=('accounts', 'transactions'), writes=('accounts',), time_bucket=3600)
 def handle_accounts():
     current_user = get_jwt_identity()
     
     if request.method == 'GET':
-        accounts = Account.get_user_accounts(current_user)
-        return jsonify([{
-            'id': str(a['_id']),
-            'name': a['name'],
-            'type': a['type'],
-            'balance': a['balance'],
-            'bank_name': a.get('bank_name'),
-            'last_four': a.get('last_four'),
-            'details': a.get('details'),
-            'created_at': a['created_at'].isoformat() if 'created_at' in a else None,
-            'updated_at': a['updated_at'].isoformat() if 'updated_at' in a else None
-        } for a in accounts]), 200
+        try:
+            fields = parse_fields(request.args.get('fields'), ACCOUNT_FIELDS)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        accounts = Account.get_user_accounts(current_user, fields_projection(fields, ACCOUNT_FIELDS))
+        items = [_format_account(a) for a in accounts]
+        if fields is None or 'activity' in fields:
+            activity = Transaction.get_account_activity(
+                current_user, [a['_id'] for a in accounts], datetime.now(pytz.UTC) - ACTIVITY_WINDOW
+            )
+            for item in items:
+                stats = activity[item['id']]
+                item['activity'] = dict(
+                    stats,
+                    last_activity=BalanceSnapshot.aware(stats['last_activity']).isoformat() if stats['last_activity'] else None
+                )
+        return jsonify([select_fields(item, fields) for item in items]), 200
     
     elif request.method == 'POST':
         data = request.get_json()
@@ -45,8 +99,36 @@ def handle_accounts():
         
         return jsonify({'message': 'Account created', 'id': str(account.inserted_id)}), 201
 
+@accounts_bp.route('/reconcile', methods=['GET', 'POST'])
+@jwt_required()
+@versioned(reads=('accounts', 'transactions'), writes=('accounts',))
+def reconcile_accounts():
+    """Compare the user's account balances with their transactions.
+
+    GET reports drift and unverified accounts; POST also corrects the stored
+    balances, and with ``baseline=true`` baselines the unverified accounts.
+    """
+    current_user = get_jwt_identity()
+    result = check_users(
+        mongo.db, [current_user], repair=request.method == 'POST',
+        baseline=request.args.get('baseline', 'false').lower() == 'true'
+    )
+    for account_id in result['repaired'] + result['baselined']:
+        loader.invalidate('accounts', account_id)
+    if result['drifted']:
+        current_app.logger.warning(f"Balance drift on {result['drifted']} accounts of user {current_user}")
+    return jsonify({
+        'accounts': result['accounts'],
+        'transactions': result['transactions'],
+        'drift': result['drift'],
+        'unverified': result['unverified_accounts'],
+        'repaired': result['repaired'],
+        'baselined': result['baselined']
+    }), 200
+
 @accounts_bp.route('/<account_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
+@versioned(reads=('accounts',), writes=('accounts',))
 def handle_account(account_id):
     current_user = get_jwt_identity()
     
@@ -55,17 +137,7 @@ def handle_account(account_id):
         return jsonify({'message': 'Account not found'}), 404
     
     if request.method == 'GET':
-        return jsonify({
-            'id': str(account['_id']),
-            'name': account['name'],
-            'type': account['type'],
-            'balance': account['balance'],
-            'bank_name': account.get('bank_name'),
-            'last_four': account.get('last_four'),
-            'details': account.get('details'),
-            'created_at': account['created_at'].isoformat() if 'created_at' in account else None,
-            'updated_at': account['updated_at'].isoformat() if 'updated_at' in account else None
-        }), 200
+        return jsonify(_format_account(account)), 200
     
     elif request.method == 'PUT':
         data = request.get_json()
@@ -90,13 +162,174 @@ def handle_account(account_id):
         return jsonify({'message': 'Account updated'}), 200
     
     elif request.method == 'DELETE':
-        # Check if account has transactions
-        from app.models.transaction import Transaction
-        transactions = Transaction.get_user_transactions(current_user, filters={'account_from': account_id})
-        transactions.extend(Transaction.get_user_transactions(current_user, filters={'account_to': account_id}))
-        
-        if transactions:
+        if Transaction.account_has_transactions(current_user, account_id):
             return jsonify({'message': 'Cannot delete account with transactions'}), 400
         
         Account.delete_account(account_id)
-        return jsonify({'message': 'Account deleted'}), 200
\ No newline at end of file
+        return jsonify({'message': 'Account deleted'}), 200
+
+HISTORY_INTERVALS = {'day': 400, 'week': 400, 'month': 240}
+
+def _parse_day(value, default):
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def _user_account(account_id, user_id):
+    account = Account.get_account_by_id(account_id)
+    if not account or str(account['user_id']) != user_id:
+        return None
+    return account
+
+@accounts_bp.route('/<account_id>/balance', methods=['GET'])
+@jwt_required()
+@versioned(reads=('accounts', 'transactions'))
+def get_balance_at(account_id):
+    """The account's balance at the end of ``date`` (YYYY-MM-DD, default today)."""
+    current_user = get_jwt_identity()
+    account = _user_account(account_id, current_user)
+    if not account:
+        return jsonify({'message': 'Account not found'}), 404
+    try:
+        day = _parse_day(request.args.get('date'), datetime.now(IST).date())
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    balance = BalanceSnapshot.balance_at(account, BalanceSnapshot.day_start(day + timedelta(days=1)))
+    return jsonify({'account_id': account_id, 'date': day.isoformat(), 'balance': balance}), 200
+
+@accounts_bp.route('/<account_id>/balance-history', methods=['GET'])
+@jwt_required()
+@versioned(reads=('accounts', 'transactions'), time_bucket=3600)
+def get_balance_history(account_id):
+    """End-of-day balances between ``start`` and ``end`` every ``interval``."""
+    current_user = get_jwt_identity()
+    account = _user_account(account_id, current_user)
+    if not account:
+        return jsonify({'message': 'Account not found'}), 404
+
+    interval = request.args.get('interval', 'month')
+    if interval not in HISTORY_INTERVALS:
+        return jsonify({'message': f"Invalid interval, use one of: {', '.join(HISTORY_INTERVALS)}"}), 400
+    try:
+        end = _parse_day(request.args.get('end'), datetime.now(IST).date())
+        start = _parse_day(request.args.get('start'), end - timedelta(days=365))
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'message': 'start must not be after end'}), 400
+    days_per_point = {'day': 1, 'week': 7, 'month': 31}[interval]
+    if (end - start).days // days_per_point > HISTORY_INTERVALS[interval]:
+        return jsonify({'message': f'Range too long for interval {interval}'}), 400
+
+    points = BalanceSnapshot.series(account, start, end, interval)
+    return jsonify({
+        'account_id': account_id,
+        'interval': interval,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'points': [{'date': day.isoformat(), 'balance': balance} for day, balance in points]
+    }), 200
+
+LEDGER_MAX_LIMIT = 1000
+LEDGER_PROJECTION = {
+    'type': 1, 'amount': 1, 'category': 1, 'description': 1,
+    'account_from': 1, 'account_to': 1, 'date': 1
+}
+
+def _encode_cursor(date, _id):
+    if date.tzinfo is None:
+        date = pytz.utc.localize(date)
+    raw = json.dumps([int(date.timestamp() * 1000), str(_id)], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(token):
+    try:
+        ms, _id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return datetime.fromtimestamp(int(ms) / 1000, tz=pytz.UTC), ObjectId(_id)
+    except (binascii.Error, ValueError, TypeError, InvalidId):
+        raise ValueError('Invalid cursor')
+
+def _ledger_entry(transaction, change, balance):
+    return {
+        'id': str(transaction['_id']),
+        'date': BalanceSnapshot.aware(transaction['date']).astimezone(IST).isoformat(),
+        'type': transaction.get('type'),
+        'category': transaction.get('category'),
+        'description': transaction.get('description'),
+        'account_from': str(transaction['account_from']) if transaction.get('account_from') else None,
+        'account_to': str(transaction['account_to']) if transaction.get('account_to') else None,
+        'amount': float(transaction['amount']),
+        'change': change,
+        'balance': balance
+    }
+
+@accounts_bp.route('/<account_id>/ledger', methods=['GET'])
+@jwt_required()
+@versioned(reads=('accounts', 'transactions'))
+def get_ledger(account_id):
+    """Stream an account's transactions with the balance after each one.
+
+    ``order`` is ``desc`` (newest first, the default) or ``asc``. ``start`` and
+    ``end`` (YYYY-MM-DD) bound the dates, and ``cursor`` continues from the
+    ``next_cursor`` of the previous page. The running balance of a page is
+    anchored on the nearest balance snapshot, so no page sums earlier rows.
+    """
+    current_user = get_jwt_identity()
+    account = _user_account(account_id, current_user)
+    if not account:
+        return jsonify({'message': 'Account not found'}), 404
+
+    order = request.args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'message': 'order must be asc or desc'}), 400
+    descending = order == 'desc'
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), LEDGER_MAX_LIMIT)
+        start = _parse_day(request.args.get('start'), None)
+        end = _parse_day(request.args.get('end'), None)
+        after = _decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    start = BalanceSnapshot.day_start(start) if start else None
+    end = BalanceSnapshot.day_start(end + timedelta(days=1)) if end else None
+
+    # Balance at the page boundary: after the cursor row going forwards,
+    # after the first row of this page going backwards
+    if after:
+        balance = BalanceSnapshot.balance_before(account, after[0], after[1], inclusive=not descending)
+    elif descending:
+        balance = BalanceSnapshot.balance_before(account, end)
+    elif start:
+        balance = BalanceSnapshot.balance_before(account, start)
+    else:
+        balance = BalanceSnapshot.opening_balance(account)
+
+    rows = Transaction.get_account_ledger(
+        current_user, account_id, after=after, descending=descending, start=start, end=end,
+        limit=limit + 1, projection=LEDGER_PROJECTION
+    )
+
+    def generate():
+        running = balance
+        last = None
+        count = 0
+        more = False
+        yield '{"account_id": %s, "order": "%s", "entries": [' % (json.dumps(account_id), order)
+        for row in rows:
+            if count == limit:
+                more = True
+                break
+            change = BalanceSnapshot.effect(row, account_id)
+            if descending:
+                entry = _ledger_entry(row, change, running)
+                running = round(running - change, 2)
+            else:
+                running = round(running + change, 2)
+                entry = _ledger_entry(row, change, running)
+            yield (', ' if count else '') + json.dumps(entry)
+            last = row
+            count += 1
+        next_cursor = _encode_cursor(last['date'], last['_id']) if more else None
+        yield '], "next_cursor": %s}' % json.dumps(next_cursor)
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,130 @@
+import contextvars
+from flask import Blueprint, request, jsonify, current_app
+from werkzeug.routing import RequestRedirect
+from werkzeug.test import EnvironBuilder
+from urllib.parse import urlsplit
+from typing import Dict, Any, List
+from app.auth.utils import BATCH_IDENTITY_KEY, VERIFIED_JWT_KEY, jwt_required, verified_jwt_state
+from app.utils.concurrency import get_executor
+
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_BLUEPRINTS = {'transactions', 'accounts', 'budgets', 'charts'}
+SAFE_METHODS = ('GET', 'HEAD')
+# The token is not forwarded: sub-requests use the identity verified by the batch
+FORWARDED_HEADERS = ('Cookie',)
+SUB_REQUEST_HEADERS = ('If-None-Match',)
+RESPONSE_HEADERS = ('ETag', 'Cache-Control', 'Location', 'Retry-After')
+
+def _sub_environ(sub: Dict[str, Any], path: str, base_url: str, headers: Dict[str, str], identity: Dict[str, Any]) -> Dict[str, Any]:
+    sub_headers = dict(headers)
+    for name in SUB_REQUEST_HEADERS:
+        value = (sub.get('headers') or {}).get(name)
+        if value:
+            sub_headers[name] = value
+    builder = EnvironBuilder(
+        path=path,
+        method=sub.get('method', 'GET').upper(),
+        json=sub.get('body'),
+        headers=sub_headers,
+        base_url=base_url
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    environ[BATCH_IDENTITY_KEY] = True
+    environ[VERIFIED_JWT_KEY] = identity
+    return environ
+
+def _dispatch(app, sub: Dict[str, Any], base_url: str, headers: Dict[str, str], identity: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one sub-request through the normal Flask dispatch and capture its response."""
+    result = {'id': sub.get('id')}
+    path = sub.get('path')
+    if not isinstance(path, str) or not path.startswith('/'):
+        return dict(result, status=400, body={'message': 'Invalid sub-request path'})
+    
+    # Follow at most one trailing-slash redirect, as a browser would
+    for _ in range(2):
+        # A fresh app context gives every sub-request its own ``g``; otherwise
+        # they would share (and overwrite) the batch request's
+        with app.app_context(), app.request_context(_sub_environ(sub, path, base_url, headers, identity)):
+            if isinstance(request.routing_exception, RequestRedirect):
+                url = urlsplit(request.routing_exception.new_url)
+                path = f'{url.path}?{url.query}' if url.query else url.path
+                continue
+            if request.routing_exception is None and request.blueprint not in BATCH_BLUEPRINTS:
+                return dict(result, status=403, body={'message': 'Endpoint not allowed in batch'})
+            
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                app.logger.error(f"Error in batch sub-request {path}: {str(e)}", exc_info=True)
+                return dict(result, status=500, body={'message': 'Internal server error'})
+            body = response.get_json(silent=True)
+            if body is None and response.status_code != 304:
+                body = response.get_data(as_text=True)
+            result.update({
+                'status': response.status_code,
+                'headers': {k: response.headers[k] for k in RESPONSE_HEADERS if k in response.headers},
+                'body': body
+            })
+            return result
+    return dict(result, status=400, body={'message': 'Too many redirects'})
+
+def _stages(sub_requests: List[Dict[str, Any]]) -> List[List[int]]:
+    """Group sub-requests into stages: consecutive reads run together, writes run alone in order."""
+    stages = []
+    for index, sub in enumerate(sub_requests):
+        is_safe = str(sub.get('method', 'GET')).upper() in SAFE_METHODS
+        if is_safe and stages and stages[-1][0] is True:
+            stages[-1][1].append(index)
+        else:
+            stages.append((is_safe, [index]))
+    return [indexes for _, indexes in stages]
+
+@batch_bp.route('', methods=['POST'])
+@jwt_required()
+def batch():
+    """Execute several API calls in one HTTP request.
+    
+    Expects ``{"requests": [{"id", "method", "path", "body", "headers"}, ...]}``
+    and returns ``{"responses": [...]}`` in the same order. The token is
+    verified once here and its decoded state is bound into every
+    sub-request, so neither the authentication hooks nor the views'
+    ``jwt_required`` decode it again.
+    Consecutive read-only sub-requests run concurrently on a bounded pool,
+    while writes act as barriers and run sequentially in order.
+    """
+    identity = verified_jwt_state()
+    data = request.get_json(silent=True) or {}
+    sub_requests = data.get('requests')
+    
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return jsonify({'message': 'requests must be a non-empty list'}), 400
+    if len(sub_requests) > current_app.config['BATCH_MAX_REQUESTS']:
+        return jsonify({'message': f"At most {current_app.config['BATCH_MAX_REQUESTS']} requests per batch"}), 400
+    if not all(isinstance(sub, dict) for sub in sub_requests):
+        return jsonify({'message': 'Each request must be an object'}), 400
+    
+    app = current_app._get_current_object()
+    base_url = request.host_url
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    executor = get_executor('batch', current_app.config['BATCH_MAX_WORKERS'])
+    
+    responses = [None] * len(sub_requests)
+    for stage in _stages(sub_requests):
+        if len(stage) == 1:
+            responses[stage[0]] = _dispatch(app, sub_requests[stage[0]], base_url, headers, identity)
+            continue
+        futures = {
+            index: executor.submit(
+                contextvars.copy_context().run,
+                _dispatch, app, sub_requests[index], base_url, headers, identity
+            )
+            for index in stage
+        }
+        for index, future in futures.items():
+            responses[index] = future.result()
+    
+    return jsonify({'responses': responses}), 200
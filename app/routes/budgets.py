@@ -1,12 +1,15 @@
 from datetime import datetime, timedelta
 import pytz
 from flask import Blueprint, request, jsonify, current_app, make_response
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import get_jwt_identity
+from app.auth.utils import jwt_required
 from bson import ObjectId
 from typing import Dict, List, Any, Optional, Union, Any
 from app import mongo
 from app.models.budget import Budget
 from app.utils.validators import validate_amount, validate_date
+from app.utils.cache import versioned
+from app.utils.helpers import parse_fields, select_fields
 
 def convert_floats(obj):
     """Convert numeric types to float recursively"""
@@ -57,6 +60,12 @@ UTC_ISO_FORMAT = '+00:00'  # Reusable constant for UTC timezone offset
 
 budgets_bp = Blueprint('budgets', __name__)
 
+# Response fields selectable with ``fields=`` on the budget list
+BUDGET_FIELDS = (
+    'id', 'category', 'amount', 'period', 'start_date', 'end_date', 'spent', 'remaining',
+    'progress_percent', 'is_over_budget', 'transactions_count', 'note', 'notifications', 'is_active'
+)
+
 # Budget tips
 BUDGET_TIPS = [
     {
@@ -104,6 +113,7 @@ def get_budget_tips():
 
 @budgets_bp.route('/', methods=['GET', 'POST'])
 @jwt_required()
+@versioned(reads=('budgets',), writes=('budgets',), time_bucket=300)
 def handle_budgets():
     try:
         current_user = get_jwt_identity()
@@ -125,6 +135,10 @@ def _handle_get_budgets(current_user):
         period = request.args.get('period')
         category = request.args.get('category')
         show_all = request.args.get('show_all', 'false').lower() == 'true'
+        try:
+            fields = parse_fields(request.args.get('fields'), BUDGET_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Get current date in UTC for filtering
         today_utc = datetime.now(pytz.UTC)
@@ -165,12 +179,12 @@ def _handle_get_budgets(current_user):
         elif period == 'future':
             # For future budgets
             query['start_date'] = {'$gt': today_utc}
-            budgets = list(mongo.db.budgets.find(query).sort('start_date', -1))
+            budgets = list(mongo.db.budgets.find(query, Budget.LIST_PROJECTION).sort('start_date', -1))
         
         # Find budgets based on show_all flag
         if show_all:
             # Get all budgets matching the filters
-            budgets = list(mongo.db.budgets.find(query).sort('start_date', -1))
+            budgets = list(mongo.db.budgets.find(query, Budget.LIST_PROJECTION).sort('start_date', -1))
         else:
             # Only get active budgets (current date is between start_date and end_date)
             query['start_date'] = {'$lte': today_utc}
@@ -178,31 +192,12 @@ def _handle_get_budgets(current_user):
                 {'end_date': None},
                 {'end_date': {'$gte': today_ist.astimezone(pytz.UTC)}}
             ]
-            budgets = list(mongo.db.budgets.find(query).sort('start_date', -1))
+            budgets = list(mongo.db.budgets.find(query, Budget.LIST_PROJECTION).sort('start_date', -1))
         
         # Format response
         budgets_with_progress = []
         for budget in budgets:
             try:
-                # Calculate period start and end dates based on the period type
-                period_start, period_end = _get_budget_period_dates(
-                    budget.get('period', 'monthly'),
-                    budget.get('start_date', datetime.now(IST))
-                )
-                
-                # Get transactions for this budget period
-                query = {
-                    'user_id': ObjectId(current_user),
-                    'category': budget['category'],
-                    'date': {
-                        '$gte': period_start,
-                        '$lte': period_end
-                    },
-                    'type': 'expense'
-                }
-                
-                transactions = list(mongo.db.transactions.find(query))
-                
                 # Calculate total spent and remaining
                 total_spent = float(budget.get('spent', 0))  # Use pre-calculated spent amount
                 budget_amount = float(budget.get('amount', 0))
@@ -237,7 +232,7 @@ def _handle_get_budgets(current_user):
                     'remaining': remaining,
                     'progress_percent': round(progress_percent, 1),
                     'is_over_budget': total_spent > budget_amount,
-                    'transactions_count': len(transactions),
+                    'transactions_count': budget.get('transactions_count', 0),
                     'note': budget.get('note', '')
                 }
                 
@@ -247,7 +242,7 @@ def _handle_get_budgets(current_user):
                 if 'is_active' in budget:
                     formatted_budget['is_active'] = budget['is_active']
                 
-                budgets_with_progress.append(formatted_budget)
+                budgets_with_progress.append(select_fields(formatted_budget, fields))
                 
             except Exception as e:
                 current_app.logger.error(f"Error processing budget {budget.get('_id', 'unknown')}: {str(e)}", exc_info=True)
@@ -428,20 +423,38 @@ def _handle_post_budget(current_user):
         current_app.logger.error(f'Error processing budget creation request: {str(e)}', exc_info=True)
         return jsonify({'error': 'Failed to process budget creation request'}), 500
         
+@budgets_bp.route('/recalculate', methods=['POST'])
+@jwt_required()
+@versioned(writes=('budgets',))
+def recalculate_budgets():
+    """Rebuild the spend of all of the user's budgets."""
+    current_user = get_jwt_identity()
+    result = Budget.recalculate_spend(current_user)
+    return jsonify(dict(result, message='Budgets recalculated')), 200
+
+@budgets_bp.route('/<string:budget_id>/recalculate', methods=['POST'])
+@jwt_required()
+@versioned(writes=('budgets',))
+def recalculate_budget(budget_id):
+    current_user = get_jwt_identity()
+    budget = Budget.get_budget_by_id(budget_id)
+    if not budget or str(budget.get('user_id')) != current_user:
+        return jsonify({'error': 'Budget not found'}), 404
+    result = Budget.recalculate_spend(current_user, [budget_id])
+    return jsonify(dict(result, message='Budget recalculated')), 200
+
 @budgets_bp.route('/<string:budget_id>', methods=['PUT'])
 @jwt_required()
+@versioned(writes=('budgets',))
 def handle_budget(budget_id):
     try:
         current_user = get_jwt_identity()
         data = request.get_json()
         
         # Check if budget exists and belongs to user
-        budget = mongo.db.budgets.find_one({
-            '_id': ObjectId(budget_id),
-            'user_id': ObjectId(current_user)
-        })
+        budget = Budget.get_budget_by_id(budget_id)
         
-        if not budget:
+        if not budget or str(budget.get('user_id')) != current_user:
             return jsonify({'error': 'Budget not found'}), 404
             
         # Prepare update data
@@ -499,50 +512,21 @@ def handle_budget(budget_id):
         if 'note' in data:
             update_data['note'] = data['note']
             
-        # Update the budget with the new data
-        update_data['updated_at'] = datetime.now(IST)
-        
         # Update the budget document
-        result = mongo.db.budgets.update_one(
-            {'_id': ObjectId(budget_id), 'user_id': ObjectId(current_user)},
-            {'$set': update_data}
-        )
+        result = Budget.update_budget(budget_id, update_data)
         
         if result.matched_count == 0:
             return jsonify({'error': 'Budget not found or not updated'}), 404
             
-        # If dates or category changed, we need to recalculate the budget
+        # The budget's window or category changed, so rebuild its spend and
+        # that of the budgets it may have taken expenses from or handed back
         if 'start_date' in update_data or 'end_date' in update_data or 'category' in update_data:
-            # Get the updated budget to calculate new values
-            updated_budget = mongo.db.budgets.find_one({
-                '_id': ObjectId(budget_id),
-                'user_id': ObjectId(current_user)
-            })
-            
-            if updated_budget:
-                # Recalculate spent amount based on transactions
-                total_spent = 0
-                for tx in updated_budget.get('transactions', []):
-                    total_spent += tx.get('amount', 0)
-                
-                # Update the budget with new calculated values
-                result = mongo.db.budgets.update_one(
-                    {'_id': ObjectId(budget_id)},
-                    {'$set': {
-                        'spent': round(total_spent, 2),
-                        'remaining': max(0, (update_data.get('amount', updated_budget.get('amount', 0)) - total_spent)),
-                        'updated_at': datetime.now(IST)
-                    }}
-                )
-                
-                if result.matched_count == 0:
-                    return jsonify({'error': 'Failed to update budget calculations'}), 500
+            Budget.recalculate_spend(current_user, [budget_id], windows=[
+                (budget.get('start_date'), budget.get('end_date')), (start_date, end_date)
+            ])
         
         # Get the updated budget to return
-        updated_budget = mongo.db.budgets.find_one({
-            '_id': ObjectId(budget_id),
-            'user_id': ObjectId(current_user)
-        })
+        updated_budget = Budget.get_budget_by_id(budget_id)
         
         # Convert ObjectId to string for JSON serialization
         updated_budget['_id'] = str(updated_budget['_id'])
@@ -1,12 +1,15 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import get_jwt_identity
+from app.auth.utils import jwt_required
 from app.utils.calculations import calculate_income_vs_expense, calculate_category_totals
+from app.utils.cache import versioned
 from datetime import datetime, timedelta
 
 charts_bp = Blueprint('charts', __name__)
 
 @charts_bp.route('/income-vs-expense')
 @jwt_required()
+@versioned(reads=('transactions',), time_bucket=300)
 def income_vs_expense_chart():
     current_user = get_jwt_identity()
     
@@ -31,6 +34,7 @@ def income_vs_expense_chart():
 
 @charts_bp.route('/expense-by-category')
 @jwt_required()
+@versioned(reads=('transactions',), time_bucket=300)
 def expense_by_category_chart():
     current_user = get_jwt_identity()
     
@@ -55,6 +59,7 @@ def expense_by_category_chart():
 
 @charts_bp.route('/income-by-category')
 @jwt_required()
+@versioned(reads=('transactions',), time_bucket=300)
 def income_by_category_chart():
     current_user = get_jwt_identity()
     
@@ -79,11 +84,12 @@ def income_by_category_chart():
 
 @charts_bp.route('/account-balances')
 @jwt_required()
+@versioned(reads=('accounts',))
 def account_balances_chart():
     current_user = get_jwt_identity()
     
     from app.models.account import Account
-    accounts = Account.get_user_accounts(current_user)
+    accounts = Account.get_user_accounts(current_user, {'name': 1, 'balance': 1})
     
     data = {
         'labels': [account['name'] for account in accounts],
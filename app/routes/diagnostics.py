@@ -0,0 +1,120 @@
+import os
+from flask import Blueprint, request, jsonify, current_app, send_from_directory, abort, make_response
+from flask_jwt_extended import jwt_required
+from app.auth.utils import admin_required
+from app.utils import memory
+from app.utils.profiling import PROFILE_NAME_PATTERN, list_profiles, profile_dir, render_profile
+
+diagnostics_bp = Blueprint('diagnostics', __name__)
+
+def _limit_arg(default, maximum):
+    """The ``limit`` query parameter capped at ``maximum``; aborts with 400 if it is not an integer."""
+    try:
+        return min(int(request.args.get('limit', default)), maximum)
+    except ValueError:
+        abort(make_response(jsonify({'message': 'limit must be an integer'}), 400))
+
+@diagnostics_bp.route('/profiles')
+@jwt_required()
+@admin_required
+def get_profiles():
+    """List recently captured request profiles."""
+    return jsonify(list_profiles(current_app)), 200
+
+@diagnostics_bp.route('/profiles/<name>')
+@jwt_required()
+@admin_required
+def get_profile(name):
+    """Download a profile, or render it as text with ``?format=text``."""
+    directory = profile_dir(current_app)
+    if not PROFILE_NAME_PATTERN.match(name) or not os.path.isfile(os.path.join(directory, name)):
+        return jsonify({'message': 'Profile not found'}), 404
+    
+    if request.args.get('format') == 'text':
+        limit = _limit_arg(50, 500)
+        return current_app.response_class(
+            render_profile(os.path.join(directory, name), limit), mimetype='text/plain'
+        )
+    return send_from_directory(directory, name, as_attachment=True)
+
+def _memory_enabled():
+    return current_app.config.get('MEMORY_PROFILING_ENABLED')
+
+def _memory_disabled_response():
+    return jsonify({'message': 'Memory profiling is disabled'}), 404
+
+@diagnostics_bp.route('/memory', methods=['GET', 'POST', 'DELETE'])
+@jwt_required()
+@admin_required
+def handle_memory():
+    """Report tracemalloc status, start tracing (POST) or stop it (DELETE)."""
+    if not _memory_enabled():
+        return _memory_disabled_response()
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        frames = min(int(data.get('frames', current_app.config.get('MEMORY_PROFILING_FRAMES', 10))), 50)
+        return jsonify(memory.start(frames)), 200
+    if request.method == 'DELETE':
+        return jsonify(memory.stop()), 200
+    return jsonify(memory.status()), 200
+
+@diagnostics_bp.route('/memory/snapshots', methods=['POST'])
+@jwt_required()
+@admin_required
+def take_memory_snapshot():
+    """Take a snapshot, or arm one to be taken after ``requests`` more requests."""
+    if not _memory_enabled():
+        return _memory_disabled_response()
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        if data.get('requests'):
+            return jsonify(memory.arm(max(int(data['requests']), 1))), 200
+        return jsonify(memory.take_snapshot(baseline=bool(data.get('baseline')))), 200
+    except RuntimeError as e:
+        return jsonify({'message': str(e)}), 409
+    except (TypeError, ValueError):
+        return jsonify({'message': 'requests must be an integer'}), 400
+
+def _stats_args():
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        group_by = 'lineno'
+    return _limit_arg(20, 200), group_by
+
+@diagnostics_bp.route('/memory/top')
+@jwt_required()
+@admin_required
+def get_memory_top():
+    """Top allocation sites in the most recent snapshot."""
+    if not _memory_enabled():
+        return _memory_disabled_response()
+    
+    stats = memory.top(*_stats_args())
+    if stats is None:
+        return jsonify({'message': 'No snapshot has been taken'}), 404
+    return jsonify({'pid': os.getpid(), 'stats': stats}), 200
+
+@diagnostics_bp.route('/memory/diff')
+@jwt_required()
+@admin_required
+def get_memory_diff():
+    """Allocation growth between the baseline and the latest snapshot."""
+    if not _memory_enabled():
+        return _memory_disabled_response()
+    
+    stats = memory.diff(*_stats_args())
+    if stats is None:
+        return jsonify({'message': 'Need a baseline and a later snapshot to diff'}), 404
+    return jsonify({'pid': os.getpid(), 'stats': stats}), 200
+
+@diagnostics_bp.route('/memory/endpoints')
+@jwt_required()
+@admin_required
+def get_memory_endpoints():
+    """Endpoints ranked by their largest per-request peak allocation."""
+    if not _memory_enabled():
+        return _memory_disabled_response()
+    
+    return jsonify({'pid': os.getpid(), 'endpoints': memory.endpoint_peaks(_limit_arg(20, 200))}), 200
@@ -5,9 +5,14 @@ from app.models.transaction import Transaction
 from app.models.account import Account
 from app.models.budget import Budget
 from app.models.user import User
+from app.utils.concurrency import request_executor
 
 main_bp = Blueprint('main', __name__)
 
+# Only the fields the dashboard template renders
+DASHBOARD_TRANSACTION_FIELDS = {'date': 1, 'description': 1, 'category': 1, 'type': 1, 'amount': 1}
+DASHBOARD_ACCOUNT_FIELDS = {'name': 1, 'type': 1, 'bank_name': 1, 'balance': 1}
+
 @main_bp.route('/api/check-session')
 def check_session():
     try:
@@ -32,25 +37,26 @@ def check_session():
 def dashboard():
     current_user = get_jwt_identity()
     
-    # Get recent transactions
-    recent_transactions = Transaction.get_user_transactions(current_user, limit=5)
-    
-    # Get accounts
-    accounts = Account.get_user_accounts(current_user)
-    
-    # Get budgets
-    budgets = Budget.get_user_budgets(current_user)
+    # Independent loads run concurrently; the page waits for the slowest one
+    executor = request_executor()
+    recent_transactions = executor.submit(
+        Transaction.get_user_transactions, current_user, limit=5,
+        projection=DASHBOARD_TRANSACTION_FIELDS
+    )
+    accounts = executor.submit(Account.get_user_accounts, current_user, DASHBOARD_ACCOUNT_FIELDS)
+    budgets = executor.submit(Budget.get_user_budgets, current_user)
+    income_expense = executor.submit(calculate_income_vs_expense, current_user)
     
-    # Calculate totals
-    total_balance = calculate_total_balance(current_user)
-    income_expense = calculate_income_vs_expense(current_user)
+    # Total balance is derived from the accounts already loaded
+    accounts = accounts.result()
+    total_balance = calculate_total_balance(current_user, accounts=accounts)
     
     return render_template('dashboard.html', 
-                         transactions=recent_transactions,
+                         transactions=recent_transactions.result(),
                          accounts=accounts,
-                         budgets=budgets,
+                         budgets=budgets.result(),
                          total_balance=total_balance,
-                         income_expense=income_expense)
+                         income_expense=income_expense.result())
 
 @main_bp.route('/transactions')
 @jwt_required()
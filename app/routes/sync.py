@@ -0,0 +1,164 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+import pytz
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import Dict, Any, Optional, Tuple
+from app import mongo
+from app.models.tombstone import Tombstone
+from app.routes.accounts import _format_account
+from app.routes.transactions import _format_transaction_dates
+
+sync_bp = Blueprint('sync', __name__)
+
+# Streams tracked by a sync token, and the timestamp field each is ordered by
+SYNC_STREAMS = {
+    'transactions': 'updated_at',
+    'accounts': 'updated_at',
+    'budgets': 'updated_at',
+    'tombstones': 'deleted_at'
+}
+# Embedded arrays are never shipped over the sync feed
+SYNC_PROJECTIONS = {
+    'budgets': {'transactions': 0}
+}
+
+def _format_budget(budget: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize a budget document for the sync feed."""
+    def iso(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+    
+    return {
+        'id': str(budget['_id']),
+        'category': budget.get('category', ''),
+        'amount': float(budget.get('amount', 0)),
+        'period': budget.get('period', 'monthly'),
+        'start_date': iso(budget.get('start_date')),
+        'end_date': iso(budget.get('end_date')),
+        'spent': float(budget.get('spent', 0)),
+        'remaining': float(budget.get('remaining', 0)),
+        'note': budget.get('note', ''),
+        'updated_at': iso(budget.get('updated_at'))
+    }
+
+SYNC_FORMATTERS = {
+    'transactions': _format_transaction_dates,
+    'accounts': _format_account,
+    'budgets': _format_budget
+}
+
+def _to_ms(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return int(dt.timestamp() * 1000)
+
+def _from_ms(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=pytz.UTC)
+
+def _encode_token(cursors: Dict[str, Tuple[datetime, Optional[ObjectId]]]) -> str:
+    payload = {
+        name: [_to_ms(dt), str(oid) if oid else None]
+        for name, (dt, oid) in cursors.items()
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_token(token: str) -> Dict[str, Tuple[datetime, Optional[ObjectId]]]:
+    """Parse a sync token into per-stream ``(timestamp, last_id)`` cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        return {
+            name: (_from_ms(int(payload[name][0])), ObjectId(payload[name][1]) if payload[name][1] else None)
+            for name in SYNC_STREAMS
+        }
+    except (binascii.Error, ValueError, TypeError, KeyError, IndexError, InvalidId):
+        raise ValueError('Invalid sync token')
+
+def _changes_after(stream: str, user_id: str, cursor, until: datetime, limit: int):
+    """Fetch up to ``limit`` documents of a stream after ``cursor`` and before ``until``.
+    
+    Documents are ordered by ``(timestamp, _id)`` so paging never skips or
+    repeats rows that share a timestamp.
+    """
+    field = SYNC_STREAMS[stream]
+    query = {'user_id': ObjectId(user_id), field: {'$lt': until}}
+    if cursor:
+        dt, last_id = cursor
+        if last_id is None:
+            query[field]['$gte'] = dt
+        else:
+            query['$or'] = [
+                {field: {'$gt': dt}},
+                {field: dt, '_id': {'$gt': last_id}}
+            ]
+    
+    docs = list(
+        mongo.db[stream].find(query, SYNC_PROJECTIONS.get(stream))
+        .sort([(field, 1), ('_id', 1)])
+        .limit(limit + 1)
+    )
+    return docs[:limit], len(docs) > limit
+
+@sync_bp.route('', methods=['GET'])
+@jwt_required()
+def sync():
+    """Return transactions, accounts and budgets changed since ``since``.
+    
+    Without a token (or with one whose tombstone cursor is older than the
+    tombstone retention window) the full data set is returned with ``reset``
+    set, and the client should replace its local cache; later pages of that
+    reset continue from the returned token. Rows written in the last few
+    seconds are held back until they have settled so a write in flight is
+    never skipped.
+    """
+    current_user = get_jwt_identity()
+    
+    try:
+        limit = min(int(request.args.get('limit', current_app.config['SYNC_PAGE_SIZE'])), 1000)
+        now = datetime.now(pytz.UTC)
+        until = now - timedelta(seconds=current_app.config['SYNC_SETTLE_SECONDS'])
+        
+        token = request.args.get('since')
+        cursors = _decode_token(token) if token else None
+        # Deletions are only kept for the retention window, so a client that
+        # has not caught up on tombstones since then may have missed some
+        reset = cursors is None or cursors['tombstones'][0] < now - Tombstone.RETENTION
+        if reset:
+            # Start over: everything currently alive, no deletions to replay
+            cursors = {name: None for name in SYNC_STREAMS}
+            cursors['tombstones'] = (until, None)
+        
+        response = {'reset': reset, 'has_more': False}
+        next_cursors = {}
+        deleted = {name: [] for name in SYNC_FORMATTERS}
+        
+        for stream in SYNC_STREAMS:
+            docs, has_more = _changes_after(stream, current_user, cursors[stream], until, limit)
+            response['has_more'] = response['has_more'] or has_more
+            
+            if docs:
+                field = SYNC_STREAMS[stream]
+                next_cursors[stream] = (docs[-1][field], docs[-1]['_id'])
+            else:
+                # Nothing changed before ``until``, so the stream is caught up to it
+                next_cursors[stream] = (until, None)
+            
+            if stream == 'tombstones':
+                for doc in docs:
+                    if doc.get('collection') in deleted:
+                        deleted[doc['collection']].append(str(doc['doc_id']))
+            else:
+                response[stream] = {'updated': [SYNC_FORMATTERS[stream](d) for d in docs]}
+        
+        for name, ids in deleted.items():
+            response[name]['deleted'] = ids
+        response['next'] = _encode_token(next_cursors)
+        
+        return jsonify(response), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
@@ -1,16 +1,43 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.transaction import Transaction
+from flask_jwt_extended import get_jwt_identity
+from app.auth.utils import jwt_required
+from app.models.transaction import Transaction, TransactionQuery
 from app.models.account import Account
-from app.models.budget import Budget
+from app.models.balance_snapshot import BalanceSnapshot
+from app.models.category import Category
 from app.utils.validators import validate_date, validate_amount
+from app.utils.suggestions import get_suggestions
+from app.tasks import transaction_changed
+from app.utils.cache import cached_payload, conditional_json_response, versioned
+from app.utils.helpers import parse_fields, fields_projection, select_fields
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, Optional, List, Union, Tuple
 import pytz
 from bson import ObjectId
+from bson.errors import InvalidId
 
 TIMEZONE = pytz.timezone('Asia/Kolkata')
 
+# Response fields selectable with ``fields=``, and the document fields each is built from
+TRANSACTION_FIELDS = {
+    'id': ('_id',),
+    'user_id': ('user_id',),
+    'type': ('type',),
+    'amount': ('amount',),
+    'category': ('category',),
+    'description': ('description',),
+    'account_from': ('account_from',),
+    'account_to': ('account_to',),
+    'date': ('date',),
+    'date_str': ('date',),
+    'time_str': ('date',),
+    'date_full': ('date',),
+    'time': ('date',),
+    'formatted_date': ('date',),
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',)
+}
+
 def _update_account_balances(transaction_data: Dict[str, Any], reverse: bool = False) -> None:
     """Update account balances based on transaction data.
     
@@ -31,12 +58,15 @@ def _update_account_balances(transaction_data: Dict[str, Any], reverse: bool = F
     # Handle different transaction types
     try:
         if transaction_data['type'] == 'expense' and 'account_from' in transaction_data:
-            Account.update_balance(transaction_data['account_from'], -amount)  # Decrease source account
+            Account.update_account_balance(transaction_data['account_from'], -amount)  # Decrease source account
         elif transaction_data['type'] == 'income' and 'account_to' in transaction_data:
-            Account.update_balance(transaction_data['account_to'], amount)  # Increase destination account
+            Account.update_account_balance(transaction_data['account_to'], amount)  # Increase destination account
         elif transaction_data['type'] == 'transfer' and all(k in transaction_data for k in ['account_from', 'account_to']):
-            Account.update_balance(transaction_data['account_from'], -amount)  # Decrease source
-            Account.update_balance(transaction_data['account_to'], amount)  # Increase destination
+            Account.update_account_balance(transaction_data['account_from'], -amount)  # Decrease source
+            Account.update_account_balance(transaction_data['account_to'], amount)  # Increase destination
+        
+        # Month-end snapshots after a back-dated transaction move with the balance
+        BalanceSnapshot.apply_transaction(transaction_data, reverse=reverse)
     except Exception as e:
         current_app.logger.error(f"Error updating account balances: {str(e)}")
         # Don't raise the exception to avoid failing the transaction operation
@@ -92,124 +122,85 @@ def _format_transaction_dates(transaction: Dict[str, Any]) -> Dict[str, Any]:
     
     return formatted
 
-def _update_budget_for_transaction(
-    transaction: Dict[str, Any], 
-    old_transaction: Optional[Dict[str, Any]] = None,
-    is_deleted: bool = False
-) -> None:
+def _parse_date_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Convert YYYY-MM-DD strings into an inclusive IST datetime range."""
+    start_dt = end_dt = None
+    if start_date:
+        start_dt = TIMEZONE.localize(datetime.strptime(start_date, '%Y-%m-%d'))
+    if end_date:
+        end_dt = TIMEZONE.localize(
+            datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+        )
+    return start_dt, end_dt
+
+def _get_list_arg(name: str) -> List[str]:
+    """Read a multi-valued query parameter given as repeats and/or comma-separated values."""
+    values = []
+    for raw in request.args.getlist(name):
+        values.extend(v.strip() for v in raw.split(',') if v.strip())
+    return values
+
+transactions_bp = Blueprint('transactions', __name__)
+
+@transactions_bp.route('/search')
+@jwt_required()
+@versioned(reads=('transactions',))
+def search_transactions():
+    """Search transactions by any combination of type, category, account,
+    amount range, date range, description substring (``q``) and full-text
+    (``text``).
     """
-    Update the relevant budget when a transaction is created, updated, or deleted.
+    current_user = get_jwt_identity()
     
-    Args:
-        transaction: The transaction data
-        old_transaction: The old transaction data (for updates)
-        is_deleted: Whether this is a delete operation
-    """
     try:
-        from app import mongo
-        
-        # Get the transaction date (use current time if not provided)
-        transaction_date = transaction.get('date')
-        if not transaction_date:
-            transaction_date = datetime.now(pytz.timezone('Asia/Kolkata'))
-        elif isinstance(transaction_date, str):
-            # Parse string date if needed
-            try:
-                transaction_date = datetime.fromisoformat(transaction_date.replace('Z', '+00:00'))
-            except (ValueError, AttributeError):
-                transaction_date = datetime.now(pytz.timezone('Asia/Kolkata'))
+        limit = min(int(request.args.get('limit', 50)), 200)
+        skip = int(request.args.get('skip', 0))
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        for value in (start_date, end_date):
+            if value and not validate_date(value):
+                return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
         
-        # Only process expense transactions for budget updates
-        if transaction.get('type') != 'expense':
-            return
-            
-        category = transaction.get('category')
-        if not category:
-            return
-            
-        user_id = transaction.get('user_id')
-        if not user_id:
-            return
-            
-        # For updates, if the category or date changed, we need to update both old and new budgets
-        if old_transaction and old_transaction.get('type') == 'expense':
-            old_category = old_transaction.get('category')
-            old_date = old_transaction.get('date')
-            
-            if old_category != category or old_date != transaction_date:
-                # Remove from old budget
-                old_budget = mongo.db.budgets.find_one({
-                    'user_id': ObjectId(user_id),
-                    'category': old_category,
-                    'start_date': {'$lte': old_date},
-                    '$or': [
-                        {'end_date': None},
-                        {'end_date': {'$gte': old_date}}
-                    ]
-                })
-                
-                if old_budget:
-                    Budget.update_budget_with_transaction(
-                        str(old_budget['_id']),
-                        {
-                            '_id': transaction.get('_id') or transaction.get('id'),
-                            'amount': old_transaction.get('amount', 0),
-                            'category': old_category,
-                            'date': old_date,
-                            'description': old_transaction.get('description', ''),
-                            '_deleted': True
-                        },
-                        is_new=False
-                    )
-        
-        # Find the relevant budget for this transaction
-        # First try to find a budget for the specific category and date
-        budget = mongo.db.budgets.find_one({
-            'user_id': ObjectId(user_id),
-            'category': category,
-            'start_date': {'$lte': transaction_date},
-            '$or': [
-                {'end_date': None},
-                {'end_date': {'$gte': transaction_date}}
-            ]
-        })
+        query = (TransactionQuery(current_user)
+                 .types(_get_list_arg('type'))
+                 .categories(_get_list_arg('category'))
+                 .accounts(_get_list_arg('account'))
+                 .amount_range(request.args.get('min_amount'), request.args.get('max_amount'))
+                 .date_range(*_parse_date_range(start_date, end_date))
+                 .description(request.args.get('q'))
+                 .text(request.args.get('text'))
+                 .order(request.args.get('order', 'desc')))
         
-        if not budget:
-            # If no budget found for this category, try to find a general budget (no category)
-            budget = mongo.db.budgets.find_one({
-                'user_id': ObjectId(user_id),
-                'category': None,
-                'start_date': {'$lte': transaction_date},
-                '$or': [
-                    {'end_date': None},
-                    {'end_date': {'$gte': transaction_date}}
-                ]
-            })
-        
-        if budget:
-            # Update the budget with this transaction
-            Budget.update_budget_with_transaction(
-                str(budget['_id']),
-                {
-                    '_id': transaction.get('_id') or transaction.get('id'),
-                    'amount': transaction.get('amount', 0),
-                    'category': category,
-                    'date': transaction_date,
-                    'description': transaction.get('description', ''),
-                    '_deleted': is_deleted
-                },
-                is_new=not old_transaction and not is_deleted
-            )
-            
-    except Exception as e:
-        current_app.logger.error(f"Error updating budget for transaction: {str(e)}")
-        # Don't raise the exception to avoid failing the transaction operation
-        pass
+        use_hint = request.args.get('hint', 'false').lower() == 'true'
+        fields = parse_fields(request.args.get('fields'), TRANSACTION_FIELDS)
+        transactions = query.find(
+            limit, skip, projection=fields_projection(fields, TRANSACTION_FIELDS), use_hint=use_hint
+        )
+        return jsonify([select_fields(_format_transaction_dates(t), fields) for t in transactions]), 200
+    except (ValueError, TypeError, InvalidId) as e:
+        return jsonify({'message': str(e)}), 400
 
-transactions_bp = Blueprint('transactions', __name__)
+@transactions_bp.route('/suggest')
+@jwt_required()
+def suggest():
+    """Type-ahead suggestions for descriptions or categories."""
+    current_user = get_jwt_identity()
+    
+    try:
+        limit = min(int(request.args.get('limit', 10)), 50)
+        suggestions = get_suggestions(
+            current_user,
+            request.args.get('q', ''),
+            field=request.args.get('field', 'description'),
+            limit=limit
+        )
+        return jsonify(suggestions), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
 @transactions_bp.route('/', methods=['GET', 'POST'])
 @jwt_required()
+@versioned(reads=('transactions',), writes=('transactions', 'accounts', 'budgets'))
 def handle_transactions():
     current_user = get_jwt_identity()
     
@@ -228,15 +219,14 @@ def handle_transactions():
             if category_filter:
                 filters['category'] = category_filter
             if start_date and end_date and validate_date(start_date) and validate_date(end_date):
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-                filters['date'] = {
-                    '$gte': TIMEZONE.localize(start_dt),
-                    '$lte': TIMEZONE.localize(end_dt)
-                }
+                filters['start_date'], filters['end_date'] = _parse_date_range(start_date, end_date)
             
-            transactions = Transaction.get_user_transactions(current_user, limit, skip, filters)
-            return jsonify([_format_transaction_dates(t) for t in transactions]), 200
+            fields = parse_fields(request.args.get('fields'), TRANSACTION_FIELDS)
+            transactions = Transaction.get_user_transactions(
+                current_user, limit, skip, filters,
+                projection=fields_projection(fields, TRANSACTION_FIELDS)
+            )
+            return jsonify([select_fields(_format_transaction_dates(t), fields) for t in transactions]), 200
         except Exception as e:
             return jsonify({'message': str(e)}), 400
     
@@ -314,31 +304,22 @@ def handle_transactions():
                 transaction_data['account_from'] = account_from
                 transaction_data['account_to'] = account_to
             
-            # Create the transaction
-            result = Transaction.create_transaction(**transaction_data)
+            # Create the transaction and update account balances
+            with BalanceSnapshot.writing(transaction_data):
+                result = Transaction.create_transaction(**transaction_data)
+                _update_account_balances({
+                    'type': transaction_type,
+                    'amount': amount,
+                    'account_from': account_from,
+                    'account_to': account_to,
+                    'date': transaction_date or datetime.now(TIMEZONE)
+                })
 
             # Get the created transaction
             transaction = Transaction.get_transaction_by_id(result.inserted_id)
             
-            # Update account balances
-            _update_account_balances({
-                'type': transaction_type,
-                'amount': amount,
-                'account_from': account_from,
-                'account_to': account_to,
-                'date': transaction_date or datetime.now(TIMEZONE)
-            })
-            
-            # Update budget for this transaction
-            _update_budget_for_transaction({
-                '_id': result.inserted_id,
-                'user_id': current_user,
-                'type': transaction_type,
-                'amount': amount,
-                'category': category,
-                'description': description,
-                'date': transaction_date or datetime.now(TIMEZONE)
-            })
+            # Budgets, category usage and suggestions are updated off the request path
+            transaction_changed(current_user, new_transaction=transaction)
 
             return jsonify(_format_transaction_dates(transaction)), 201
         except Exception as e:
@@ -346,6 +327,7 @@ def handle_transactions():
 
 @transactions_bp.route('/<transaction_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
+@versioned(reads=('transactions',), writes=('transactions', 'accounts', 'budgets'))
 def handle_transaction(transaction_id):
     current_user = get_jwt_identity()
     
@@ -427,32 +409,20 @@ def handle_transaction(transaction_id):
             # Add updated_at timestamp
             update_data['updated_at'] = datetime.now(TIMEZONE)
             
-            # First reverse the old transaction effect
-            _update_account_balances(transaction, reverse=True)
-            
-            # Perform the update
-            Transaction.update_transaction(transaction_id, update_data)
-            
-            # Get the updated transaction with all fields
-            updated_transaction = Transaction.get_transaction_by_id(transaction_id)
-            
-            # Apply the new transaction effect
-            _update_account_balances(updated_transaction)
+            with BalanceSnapshot.writing(transaction, dict(transaction, **update_data)):
+                # First reverse the old transaction effect
+                _update_account_balances(transaction, reverse=True)
+                
+                # Perform the update
+                Transaction.update_transaction(transaction_id, update_data)
+                
+                # Get the updated transaction with all fields
+                updated_transaction = Transaction.get_transaction_by_id(transaction_id)
+                
+                # Apply the new transaction effect
+                _update_account_balances(updated_transaction)
             
-            # Update budget if this is an expense
-            if updated_transaction['type'] == 'expense':
-                budget = Budget.get_budget_by_category(current_user, updated_transaction['category'], date=updated_transaction['date'])
-                if budget:
-                    Budget.update_budget_with_transaction(
-                        str(budget['_id']),
-                        {
-                            'amount': updated_transaction['amount'],
-                            'category': updated_transaction['category'],
-                            'date': updated_transaction['date'],
-                            'description': updated_transaction['description'],
-                            '_id': str(updated_transaction['_id'])
-                        }
-                    )
+            transaction_changed(current_user, transaction, updated_transaction)
             
             return jsonify({
                 'message': 'Transaction updated',
@@ -460,37 +430,20 @@ def handle_transaction(transaction_id):
             }), 200
         
         elif request.method == 'DELETE':
-            # Delete the transaction
-            Transaction.delete_transaction(transaction_id)
-            
-            # Update account balances by reversing the transaction
-            _update_account_balances({
-                'type': transaction['type'],
-                'amount': float(transaction['amount']),
-                'account_from': transaction.get('account_from'),
-                'account_to': transaction.get('account_to'),
-                'date': transaction['date']
-            }, reverse=True)
+            with BalanceSnapshot.writing(transaction):
+                # Delete the transaction
+                Transaction.delete_transaction(transaction_id)
+                
+                # Update account balances by reversing the transaction
+                _update_account_balances({
+                    'type': transaction['type'],
+                    'amount': float(transaction['amount']),
+                    'account_from': transaction.get('account_from'),
+                    'account_to': transaction.get('account_to'),
+                    'date': transaction['date']
+                }, reverse=True)
             
-            # Update budget if this was an expense
-            if transaction['type'] == 'expense':
-                budget = Budget.get_budget_by_category(
-                    current_user, 
-                    transaction['category'],
-                    date=transaction['date']
-                )
-                if budget:
-                    Budget.update_budget_with_transaction(
-                        str(budget['_id']),
-                        {
-                            'amount': float(transaction['amount']),
-                            'category': transaction['category'],
-                            'date': transaction['date'],
-                            'description': transaction['description'],
-                            '_id': str(transaction['_id'])
-                        },
-                        is_new=False  # This will remove the transaction from the budget
-                    )
+            transaction_changed(current_user, old_transaction=transaction)
         
             return jsonify({'message': 'Transaction deleted successfully'}), 200
     
@@ -500,4 +453,10 @@ def handle_transaction(transaction_id):
 @transactions_bp.route('/categories')
 @jwt_required()
 def get_categories():
-    return jsonify(Transaction.DEFAULT_CATEGORIES), 200
\ No newline at end of file
+    """Category names per type, most used first, served from cache with an ETag."""
+    current_user = get_jwt_identity()
+    body, etag = cached_payload(
+        Category.CACHE_KEY.format(user_id=current_user),
+        lambda: Category.get_catalogue(current_user, Transaction.DEFAULT_CATEGORIES)
+    )
+    return conditional_json_response(body, etag)
\ No newline at end of file
@@ -0,0 +1,311 @@
+"""High-volume synthetic data for load testing.
+
+Each worker process owns a slice of the users and generates their accounts,
+transactions, budgets and category catalogue in memory, so derived values
+(account balances, budget spend, category usage) are computed from the same
+ledger that is written instead of being rebuilt with follow-up queries.
+Documents have the same shape the models write.
+"""
+import calendar
+import multiprocessing
+import random
+from datetime import datetime, timedelta
+import bcrypt
+import pytz
+from bson import ObjectId
+from pymongo import MongoClient
+from app.models.category import Category
+from app.models.transaction import Transaction
+
+TIMEZONE = pytz.timezone('Asia/Kolkata')
+PASSWORD = 'seed-password'
+
+ACCOUNTS = [
+    ('Salary Account', 'bank'),
+    ('Credit Card', 'credit_card'),
+    ('Cash', 'cash'),
+    ('Savings', 'bank'),
+    ('Wallet', 'wallet'),
+]
+
+# (weight, min, max) of everyday expenses; Rent and Utilities are monthly bills
+EXPENSE_PROFILE = {
+    'Food': (40, 50, 900),
+    'Transport': (20, 20, 600),
+    'Shopping': (14, 200, 6000),
+    'Entertainment': (12, 100, 2500),
+    'Healthcare': (7, 100, 4000),
+    'Education': (4, 500, 12000),
+    'Utilities': (3, 100, 1500),
+}
+EXPENSE_DESCRIPTIONS = {
+    'Food': ['Groceries', 'Coffee', 'Lunch', 'Dinner out', 'Food delivery', 'Bakery'],
+    'Transport': ['Metro card recharge', 'Cab ride', 'Fuel', 'Auto rickshaw', 'Parking'],
+    'Shopping': ['Clothes', 'Electronics', 'Home supplies', 'Online order', 'Shoes'],
+    'Entertainment': ['Movie tickets', 'Streaming subscription', 'Concert', 'Games'],
+    'Healthcare': ['Pharmacy', 'Doctor visit', 'Lab tests', 'Gym membership'],
+    'Education': ['Online course', 'Books', 'Workshop fee', 'Exam fee'],
+    'Utilities': ['Mobile recharge', 'Internet bill', 'Water bill', 'Gas cylinder'],
+    'Rent': ['Monthly rent'],
+}
+INCOME_DESCRIPTIONS = {
+    'Freelance': ['Freelance invoice', 'Consulting fee'],
+    'Investment': ['Dividend', 'Interest credit', 'Mutual fund redemption'],
+    'Gift': ['Birthday gift', 'Festival gift'],
+    'Bonus': ['Performance bonus', 'Festival bonus'],
+}
+BUDGET_CATEGORIES = ['Food', 'Transport', 'Shopping', 'Entertainment', 'Utilities']
+
+def _months(start, end):
+    """Yield the first day (IST) of every month between ``start`` and ``end``."""
+    month = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month <= end:
+        yield month
+        days = calendar.monthrange(month.year, month.month)[1]
+        month = TIMEZONE.localize(month.replace(tzinfo=None) + timedelta(days=days))
+
+def _at(rng, day, start_hour=7, end_hour=23):
+    return day + timedelta(hours=rng.uniform(start_hour, end_hour))
+
+class _UserLedger:
+    """Generates one user's documents and keeps the derived totals in step."""
+
+    def __init__(self, rng, user_id, start, end, account_count):
+        self.rng = rng
+        self.user_id = user_id
+        self.start = start
+        self.end = end
+        self.accounts = []
+        for name, type in ACCOUNTS[:max(account_count, 1)]:
+            opening = 0.0 if type == 'credit_card' else round(rng.uniform(5000, 150000), 2)
+            self.accounts.append({
+                '_id': ObjectId(),
+                'user_id': user_id,
+                'name': name,
+                'type': type,
+                'balance': opening,
+                'opening_balance': opening,
+                'bank_name': 'Seed Bank' if type in ('bank', 'credit_card') else None,
+                'last_four': f'{rng.randint(0, 9999):04d}' if type in ('bank', 'credit_card') else None,
+                'details': None,
+                'created_at': start,
+                'updated_at': end,
+            })
+        self.primary = self.accounts[0]
+        self.balances = {a['_id']: a['balance'] for a in self.accounts}
+        self.transactions = []
+        self.expenses = {}  # (category, month) -> [(transaction_id, amount, date)]
+        self.usage = {}  # (type, category) -> [count, last_used]
+
+    def add(self, type, category, amount, date, description, account_from=None, account_to=None):
+        amount = round(amount, 2)
+        transaction_id = ObjectId()
+        self.transactions.append({
+            '_id': transaction_id,
+            'user_id': self.user_id,
+            'type': type,
+            'amount': amount,
+            'category': category,
+            'description': description,
+            'account_from': account_from,
+            'account_to': account_to,
+            'date': date,
+            'created_at': date,
+            'updated_at': date,
+        })
+        if account_from:
+            self.balances[account_from] -= amount
+        if account_to:
+            self.balances[account_to] += amount
+        if type == 'expense':
+            key = (category, date.astimezone(TIMEZONE).strftime('%Y-%m'))
+            self.expenses.setdefault(key, []).append((transaction_id, amount, date))
+        usage = self.usage.setdefault((type, category), [0, date])
+        usage[0] += 1
+        usage[1] = max(usage[1], date)
+
+    def _spending_account(self):
+        roll = self.rng.random()
+        if len(self.accounts) > 1 and roll < 0.3:
+            return self.accounts[1]['_id']
+        if len(self.accounts) > 2 and roll < 0.45:
+            return self.accounts[2]['_id']
+        return self.primary['_id']
+
+    def generate(self, count):
+        rng = self.rng
+        months = list(_months(self.start, self.end))
+        salary = round(rng.uniform(30000, 250000), -2)
+        rent = round(salary * rng.uniform(0.15, 0.35), -2)
+
+        # Salary, rent and the utility bill land at the start of every month
+        for month in months:
+            if len(self.transactions) + 3 > count:
+                break
+            bills = [
+                ('income', 'Salary', salary, _at(rng, month, 9, 11), 'Monthly salary'),
+                ('expense', 'Rent', rent, _at(rng, month + timedelta(days=rng.randint(1, 4))), 'Monthly rent'),
+                ('expense', 'Utilities', rng.uniform(800, 4000),
+                 _at(rng, month + timedelta(days=rng.randint(5, 10))), 'Electricity bill'),
+            ]
+            for type, category, amount, date, description in bills:
+                if self.start <= date <= self.end:
+                    account = {'account_to' if type == 'income' else 'account_from': self.primary['_id']}
+                    self.add(type, category, amount, date, description, **account)
+
+        categories = [c for c in Transaction.DEFAULT_CATEGORIES['expense'] if c in EXPENSE_PROFILE]
+        extra_income = [c for c in Transaction.DEFAULT_CATEGORIES['income'] if c in INCOME_DESCRIPTIONS]
+        transfer_category = Transaction.DEFAULT_CATEGORIES['transfer'][0]
+        weights = [EXPENSE_PROFILE[c][0] for c in categories]
+        span = (self.end - self.start).total_seconds()
+        while len(self.transactions) < count:
+            date = self.start + timedelta(seconds=rng.uniform(0, span))
+            roll = rng.random()
+            if roll < 0.03:
+                category = rng.choice(extra_income)
+                self.add('income', category, rng.uniform(1000, salary * 0.5), date,
+                         rng.choice(INCOME_DESCRIPTIONS[category]), account_to=self.primary['_id'])
+            elif roll < 0.09 and len(self.accounts) > 1:
+                source = self.primary['_id']
+                target = rng.choice(self.accounts[1:])['_id']
+                self.add('transfer', transfer_category, rng.uniform(500, salary * 0.3), date,
+                         'Account transfer', account_from=source, account_to=target)
+            else:
+                category = rng.choices(categories, weights)[0]
+                _, low, high = EXPENSE_PROFILE[category]
+                # Skew towards small purchases
+                amount = low + (high - low) * rng.random() ** 2
+                self.add('expense', category, amount, date,
+                         rng.choice(EXPENSE_DESCRIPTIONS[category]), account_from=self._spending_account())
+
+        for account in self.accounts:
+            account['balance'] = round(self.balances[account['_id']], 2)
+        return self
+
+    def budgets(self, months_back=12):
+        months = list(_months(self.start, self.end))[-months_back:]
+        now = datetime.now(TIMEZONE)
+        budgets = []
+        for category in BUDGET_CATEGORIES:
+            spend = [sum(a for _, a, _ in self.expenses.get((category, m.strftime('%Y-%m')), []))
+                     for m in months]
+            typical = sum(spend) / len(spend) if spend else 0
+            amount = max(round(typical * self.rng.uniform(0.8, 1.3), -2), 1000.0)
+            for month, spent in zip(months, spend):
+                days = calendar.monthrange(month.year, month.month)[1]
+                end_date = month + timedelta(days=days - 1, hours=23, minutes=59, seconds=59)
+                entries = self.expenses.get((category, month.strftime('%Y-%m')), [])
+                budgets.append({
+                    'user_id': self.user_id,
+                    'category': category,
+                    'amount': float(amount),
+                    'period': 'monthly',
+                    'start_date': month,
+                    'end_date': end_date,
+                    'note': None,
+                    'created_at': month,
+                    'updated_at': now,
+                    'spent': round(spent, 2),
+                    'remaining': max(0, round(amount - spent, 2)),
+                    'transactions': [
+                        {'transaction_id': str(t), 'amount': a, 'date': d, 'note': ''}
+                        for t, a, d in entries
+                    ],
+                })
+        return budgets
+
+    def categories(self):
+        now = datetime.now(TIMEZONE)
+        return [
+            {'user_id': self.user_id, 'type': type, 'name': name, 'count': count,
+             'last_used': last_used, 'created_at': now, 'updated_at': now}
+            for (type, name), (count, last_used) in self.usage.items()
+        ]
+
+def _seed_slice(task):
+    """Worker entry point: seed users ``task['first']`` .. ``task['last'] - 1``."""
+    client = MongoClient(task['mongo_uri'])
+    db = client.get_default_database()
+    end = datetime.now(TIMEZONE)
+    start = end - timedelta(days=int(365 * task['years']))
+    batch_size = task['batch_size']
+    totals = {'users': 0, 'transactions': 0, 'accounts': 0, 'budgets': 0}
+
+    pending = []
+    try:
+        for index in range(task['first'], task['last']):
+            rng = random.Random(task['seed'] * 1000003 + index)
+            username = f"{task['prefix']}{index:07d}"
+            user_id = ObjectId()
+            db.users.insert_one({
+                '_id': user_id,
+                'username': username,
+                'email': f'{username}@example.com',
+                'password': task['password_hash'],
+                'created_at': start,
+                'updated_at': end,
+                # The catalogue is written from the ledger below
+                Category.BACKFILL_FIELD: end,
+            })
+            ledger = _UserLedger(rng, user_id, start, end, task['accounts']).generate(task['transactions'])
+
+            pending.extend(ledger.transactions)
+            while len(pending) >= batch_size:
+                db.transactions.insert_many(pending[:batch_size], ordered=False)
+                del pending[:batch_size]
+
+            # Derived documents come straight from the generated ledger
+            budgets = ledger.budgets()
+            db.accounts.insert_many(ledger.accounts, ordered=False)
+            if budgets:
+                db.budgets.insert_many(budgets, ordered=False)
+            db.categories.insert_many(ledger.categories(), ordered=False)
+
+            totals['users'] += 1
+            totals['transactions'] += len(ledger.transactions)
+            totals['accounts'] += len(ledger.accounts)
+            totals['budgets'] += len(budgets)
+        if pending:
+            db.transactions.insert_many(pending, ordered=False)
+    finally:
+        client.close()
+    return totals
+
+def seed(mongo_uri, users, transactions_per_user, years=2, accounts=3, workers=None,
+         batch_size=10000, prefix='seed-', random_seed=42, first_index=0, progress=None):
+    """Seed ``users`` users with ``transactions_per_user`` transactions each.
+
+    Work is split into slices handled by ``workers`` processes, each with
+    its own MongoClient. Returns the number of documents written per
+    collection.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt())
+
+    # Several slices per worker keeps processes busy when users differ in cost
+    slice_size = max(1, users // (workers * 4) or 1)
+    tasks = [
+        {
+            'mongo_uri': mongo_uri,
+            'first': first,
+            'last': min(first + slice_size, first_index + users),
+            'transactions': transactions_per_user,
+            'years': years,
+            'accounts': accounts,
+            'batch_size': batch_size,
+            'prefix': prefix,
+            'seed': random_seed,
+            'password_hash': password_hash,
+        }
+        for first in range(first_index, first_index + users, slice_size)
+    ]
+
+    totals = {'users': 0, 'transactions': 0, 'accounts': 0, 'budgets': 0}
+    # Spawned workers avoid inheriting the parent's MongoClient and thread pools
+    with multiprocessing.get_context('spawn').Pool(min(workers, len(tasks))) as pool:
+        for result in pool.imap_unordered(_seed_slice, tasks):
+            for key, value in result.items():
+                totals[key] += value
+            if progress:
+                progress(totals)
+    return totals
@@ -0,0 +1,103 @@
+"""Background jobs for side effects that do not need to finish inside the request."""
+from bson import ObjectId
+from app import mongo
+from app.budget_spend import SPEND_ORDER
+from app.models.budget import Budget
+from app.models.category import Category
+from app.utils import suggestions, write_behind
+from app.utils.jobs import job, enqueue_many, periodic, on_shutdown
+
+def _budget_for(user_id, transaction):
+    """The one budget an expense counts towards (see ``app.budget_spend``)."""
+    budget = Budget.get_budget_by_category(user_id, transaction['category'], date=transaction['date'])
+    if budget:
+        return budget
+    return mongo.db.budgets.find_one({
+        'user_id': ObjectId(user_id),
+        'category': None,
+        'start_date': {'$lte': transaction['date']},
+        '$or': [
+            {'end_date': None},
+            {'end_date': {'$gte': transaction['date']}}
+        ]
+    }, sort=SPEND_ORDER)
+
+def _budget_entry(transaction, deleted=False):
+    return {
+        '_id': str(transaction['_id']),
+        'amount': float(transaction['amount']),
+        'category': transaction['category'],
+        'date': transaction['date'],
+        'description': transaction.get('description', ''),
+        '_deleted': deleted
+    }
+
+@job('budgets.apply_transaction', bumps=('budgets',))
+def update_budgets(user_id, old_transaction=None, new_transaction=None):
+    """Move an expense's amount out of its old budget and into its new one.
+
+    Both steps check the budget's embedded transactions first, so a retry
+    does not count the same transaction twice. With ``BUDGET_WRITE_BEHIND``
+    the changes are buffered and applied in batches by ``flush_budget_buffer``.
+    """
+    if write_behind.enabled():
+        _buffer_budget_changes(user_id, old_transaction, new_transaction)
+        return
+    if old_transaction and old_transaction.get('type') == 'expense':
+        budget = _budget_for(user_id, old_transaction)
+        if budget:
+            Budget.update_budget_with_transaction(
+                str(budget['_id']), _budget_entry(old_transaction, deleted=True), is_new=False
+            )
+    if new_transaction and new_transaction.get('type') == 'expense':
+        budget = _budget_for(user_id, new_transaction)
+        if budget:
+            Budget.update_budget_with_transaction(str(budget['_id']), _budget_entry(new_transaction))
+
+def _buffer_budget_changes(user_id, old_transaction, new_transaction):
+    changes = {}
+    if old_transaction and old_transaction.get('type') == 'expense':
+        budget = _budget_for(user_id, old_transaction)
+        if budget:
+            changes.setdefault(budget['_id'], ([], []))[0].append(old_transaction)
+    if new_transaction and new_transaction.get('type') == 'expense':
+        budget = _budget_for(user_id, new_transaction)
+        if budget:
+            changes.setdefault(budget['_id'], ([], []))[1].append(new_transaction)
+    for budget_id, (removed, added) in changes.items():
+        write_behind.buffer_changes(budget_id, user_id, removed=removed, added=added)
+
+@periodic(interval=1)
+def flush_budget_buffer():
+    if write_behind.enabled():
+        write_behind.flush()
+
+# Nothing buffered is lost if this fails: it stays in Redis for the next worker
+@on_shutdown
+def drain_budget_buffer():
+    if write_behind.enabled():
+        write_behind.flush(force=True)
+
+# Usage counts are incremented, so a retry could double count; the catalogue
+# can be rebuilt from the transactions instead.
+@job('categories.record_change', max_retries=0)
+def record_category_change(user_id, old_transaction=None, new_transaction=None):
+    Category.record_transaction_change(user_id, old_transaction, new_transaction)
+
+@job('suggestions.add')
+def add_suggestions(user_id, description=None, category=None):
+    suggestions.add_suggestions(user_id, description, category)
+
+def transaction_changed(user_id, old_transaction=None, new_transaction=None):
+    """Enqueue the side effects of a transaction write in one round trip."""
+    calls = [
+        (update_budgets.job_name, (user_id,), {'old_transaction': old_transaction, 'new_transaction': new_transaction}),
+        (record_category_change.job_name, (user_id,), {'old_transaction': old_transaction, 'new_transaction': new_transaction}),
+    ]
+    if new_transaction and (
+        not old_transaction
+        or new_transaction.get('description') != old_transaction.get('description')
+        or new_transaction.get('category') != old_transaction.get('category')
+    ):
+        calls.append((add_suggestions.job_name, (user_id, new_transaction.get('description'), new_transaction.get('category')), {}))
+    return enqueue_many(calls)
@@ -0,0 +1,57 @@
+"""Helpers for asserting how much database work a request does.
+
+Create the app with ``TESTING = True`` so query monitoring is installed,
+then wrap requests in ``query_budget``::
+
+    with query_budget(mongo=3, redis=2):
+        client.get('/api/budgets/', headers=auth)
+
+or use ``assert_request_budget`` for a single call. Work done on the
+request's worker threads (dashboard fan-out, batch sub-requests) counts
+towards the budget as well.
+
+Only clients created after monitoring was installed are counted: a
+``pymongo.MongoClient`` and the app's instrumented Redis class. A budget
+on a client that is not counted (mongomock, a plain fakeredis) raises
+instead of passing vacuously.
+"""
+from contextlib import contextmanager
+from app import mongo as flask_mongo
+from app.utils import monitoring
+from app.utils.cache import get_redis
+
+def _breakdown(stats):
+    return ', '.join(
+        f'{collection}.{command}={count}'
+        for (collection, command), count in sorted(stats.commands.items())
+    )
+
+@contextmanager
+def query_budget(mongo=None, redis=None):
+    """Fail if the block issues more than ``mongo`` Mongo commands or ``redis`` Redis calls."""
+    if not monitoring.is_installed():
+        raise RuntimeError('Query monitoring is not installed; create the app with TESTING = True')
+    if mongo is not None and not monitoring.observes_mongo(flask_mongo.cx):
+        raise RuntimeError('The Mongo client is not monitored, so its commands cannot be counted')
+    redis_client = get_redis()
+    if redis is not None and redis_client is not None and not monitoring.observes_redis(redis_client):
+        raise RuntimeError('The Redis client is not instrumented, so its calls cannot be counted')
+    
+    stats, token = monitoring.start_stats()
+    try:
+        yield stats
+    finally:
+        monitoring.stop_stats(token)
+    
+    if mongo is not None and stats.mongo_commands > mongo:
+        raise AssertionError(
+            f'Expected at most {mongo} Mongo commands, got {stats.mongo_commands} ({_breakdown(stats)})'
+        )
+    if redis is not None and stats.redis_calls > redis:
+        raise AssertionError(f'Expected at most {redis} Redis calls, got {stats.redis_calls}')
+
+def assert_request_budget(client, method, path, mongo=None, redis=None, **kwargs):
+    """Issue one request through a Flask test client within a query budget."""
+    with query_budget(mongo=mongo, redis=redis):
+        response = client.open(path, method=method, **kwargs)
+    return response
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import time
+from functools import wraps
+from flask import current_app, request, make_response
+from flask_jwt_extended import get_jwt_identity
+
+DEFAULT_TTL = 24 * 60 * 60
+VERSION_KEY = 'version:{user_id}:{resource}'
+SAFE_METHODS = ('GET', 'HEAD')
+
+def get_redis():
+    """Return the shared Redis client, or None before ``create_app`` has run."""
+    from app import get_redis_client
+    return get_redis_client()
+
+def redis_error():
+    """``redis.RedisError``, imported on first use.
+
+    Only evaluated when an exception is being handled, i.e. after a Redis
+    client exists, so redis-py stays out of the startup import path.
+    """
+    from redis import RedisError
+    return RedisError
+
+def _etag_for(body):
+    return hashlib.sha1(body).hexdigest()
+
+def cached_payload(key, build, ttl=DEFAULT_TTL):
+    """Return ``(body, etag)`` for a JSON payload cached in Redis.
+    
+    ``build`` is only called on a cache miss (or when Redis is unavailable);
+    its result is serialized once and stored together with its ETag.
+    """
+    client = get_redis()
+    if client is not None:
+        try:
+            body, etag = client.hmget(key, 'body', 'etag')
+            if body is not None and etag is not None:
+                return body, etag.decode('utf-8')
+        except redis_error() as e:
+            current_app.logger.warning(f"Error reading cache key {key}: {str(e)}")
+    
+    body = json.dumps(build(), separators=(',', ':'), sort_keys=True, default=str).encode('utf-8')
+    etag = _etag_for(body)
+    if client is not None:
+        try:
+            pipe = client.pipeline()
+            pipe.hset(key, mapping={'body': body, 'etag': etag})
+            pipe.expire(key, ttl)
+            pipe.execute()
+        except redis_error() as e:
+            current_app.logger.warning(f"Error writing cache key {key}: {str(e)}")
+    return body, etag
+
+def invalidate(*keys):
+    """Drop cached payloads so the next read rebuilds them."""
+    client = get_redis()
+    if client is None or not keys:
+        return
+    try:
+        client.delete(*keys)
+    except redis_error() as e:
+        current_app.logger.warning(f"Error invalidating cache keys {keys}: {str(e)}")
+
+def conditional_json_response(body, etag):
+    """Build a JSON response that short-circuits to 304 on a matching If-None-Match."""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def get_versions(user_id, resources):
+    """Return the current version counters for a user's resources.
+    
+    Missing counters are seeded from the clock rather than 0 so ETags issued
+    before a Redis flush can never match again. Returns None if Redis is
+    unavailable.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    keys = [VERSION_KEY.format(user_id=user_id, resource=r) for r in resources]
+    try:
+        versions = client.mget(keys)
+        if any(v is None for v in versions):
+            seed = time.time_ns()
+            pipe = client.pipeline()
+            for key, version in zip(keys, versions):
+                if version is None:
+                    pipe.set(key, seed, nx=True)
+            pipe.mget(keys)
+            versions = pipe.execute()[-1]
+        return [v.decode('utf-8') for v in versions]
+    except redis_error() as e:
+        current_app.logger.warning(f"Error reading resource versions: {str(e)}")
+        return None
+
+def bump_versions(user_id, *resources):
+    """Invalidate ETags for a user's resources after a write."""
+    client = get_redis()
+    if client is None or not resources:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for resource in resources:
+            pipe.incr(VERSION_KEY.format(user_id=user_id, resource=resource))
+        pipe.execute()
+    except redis_error() as e:
+        current_app.logger.warning(f"Error bumping resource versions: {str(e)}")
+
+def versioned(reads=(), writes=(), time_bucket=None):
+    """Conditional GET support driven by per-user resource version counters.
+    
+    Safe requests get a strong ETag derived from the versions of ``reads``
+    and are answered with 304 before the view (and any Mongo query) runs when
+    ``If-None-Match`` matches. Successful unsafe requests bump ``writes``.
+    ``time_bucket`` (seconds) additionally rolls the ETag over time for views
+    whose output depends on the current time. Must be applied below
+    ``jwt_required``.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            
+            if request.method in SAFE_METHODS:
+                versions = get_versions(user_id, reads) if reads else None
+                if versions is None:
+                    return fn(*args, **kwargs)
+                
+                parts = [user_id, request.full_path, *versions]
+                if time_bucket:
+                    parts.append(str(int(time.time() // time_bucket)))
+                etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+                
+                if request.if_none_match.contains(etag):
+                    response = current_app.response_class(status=304)
+                else:
+                    response = make_response(fn(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            
+            response = make_response(fn(*args, **kwargs))
+            if writes and response.status_code < 400:
+                bump_versions(user_id, *writes)
+            return response
+        return wrapper
+    return decorator
@@ -2,13 +2,14 @@ from datetime import datetime, timedelta
 from app.models.transaction import Transaction
 from app.models.account import Account
 
-def calculate_total_balance(user_id):
-    accounts = Account.get_user_accounts(user_id)
+def calculate_total_balance(user_id, accounts=None):
+    if accounts is None:
+        accounts = Account.get_user_accounts(user_id)
     return sum(account['balance'] for account in accounts)
 
 def calculate_income_vs_expense(user_id, start_date=None, end_date=None):
-    income = Transaction.get_transactions_by_type(user_id, 'income', start_date, end_date)
-    expense = Transaction.get_transactions_by_type(user_id, 'expense', start_date, end_date)
+    income = Transaction.get_transactions_by_type(user_id, 'income', start_date, end_date, {'amount': 1})
+    expense = Transaction.get_transactions_by_type(user_id, 'expense', start_date, end_date, {'amount': 1})
     
     total_income = sum(t['amount'] for t in income)
     total_expense = sum(t['amount'] for t in expense)
@@ -20,7 +21,9 @@ def calculate_income_vs_expense(user_id, start_date=None, end_date=None):
     }
 
 def calculate_category_totals(user_id, type, start_date=None, end_date=None):
-    transactions = Transaction.get_transactions_by_type(user_id, type, start_date, end_date)
+    transactions = Transaction.get_transactions_by_type(
+        user_id, type, start_date, end_date, {'category': 1, 'amount': 1}
+    )
     category_totals = {}
     
     for transaction in transactions:
@@ -48,7 +51,9 @@ def calculate_budget_progress(user_id, budget):
         start_date = datetime(now.year, 1, 1)
         end_date = datetime(now.year + 1, 1, 1)
     
-    transactions = Transaction.get_transactions_by_category(user_id, budget['category'], start_date, end_date)
+    transactions = Transaction.get_transactions_by_category(
+        user_id, budget['category'], start_date, end_date, {'type': 1, 'amount': 1}
+    )
     spent = sum(t['amount'] for t in transactions if t['type'] == 'expense')
     
     return {
@@ -59,5 +64,5 @@ def calculate_budget_progress(user_id, budget):
     }
 
 def calculate_account_balances(user_id):
-    accounts = Account.get_user_accounts(user_id)
+    accounts = Account.get_user_accounts(user_id, {'balance': 1})
     return {str(account['_id']): account['balance'] for account in accounts}
\ No newline at end of file
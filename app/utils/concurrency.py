@@ -0,0 +1,70 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g
+
+_executors = {}
+_lock = threading.Lock()
+
+def get_executor(name, max_workers):
+    """Return the process-wide bounded thread pool called ``name``.
+    
+    Pools are created lazily so nothing is started in a pre-fork master.
+    """
+    with _lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+            _executors[name] = executor
+        return executor
+
+def _freeze(value):
+    """Turn arguments into a hashable key (dicts and lists become tuples)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+class RequestExecutor:
+    """Runs a request's independent data loads in parallel on a shared pool.
+    
+    Identical loads (same function and arguments) submitted more than once
+    during the request share a single future. Each load runs inside the
+    submitting request's context variables and its own application context,
+    so it can use ``mongo`` and ``current_app`` as usual.
+    """
+    def __init__(self, pool):
+        self._pool = pool
+        self._app = current_app._get_current_object()
+        self._futures = {}
+    
+    def _run(self, fn, args, kwargs):
+        with self._app.app_context():
+            return fn(*args, **kwargs)
+    
+    def submit(self, fn, *args, **kwargs):
+        key = (fn, _freeze(args), _freeze(kwargs))
+        future = self._futures.get(key)
+        if future is None:
+            context = contextvars.copy_context()
+            future = self._pool.submit(context.run, self._run, fn, args, kwargs)
+            self._futures[key] = future
+        return future
+
+def request_executor():
+    """Return the executor for the current request, creating it on first use."""
+    if 'request_executor' not in g:
+        pool = get_executor('queries', current_app.config['QUERY_MAX_WORKERS'])
+        g.request_executor = RequestExecutor(pool)
+    return g.request_executor
+
+def _reset_after_fork():
+    """Forget pools inherited from the parent; their threads do not survive fork."""
+    global _lock
+    _lock = threading.Lock()
+    _executors.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,34 @@
+def parse_fields(raw, allowed):
+    """Parse a ``fields=a,b,c`` query parameter.
+    
+    Returns the requested field names (in order, de-duplicated) or None when
+    no selection was made. Unknown fields raise ValueError.
+    """
+    if not raw:
+        return None
+    fields = list(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+def fields_projection(fields, source_fields):
+    """Map API field names to a MongoDB projection using ``source_fields``.
+    
+    ``source_fields`` maps each API field to the document fields it is built
+    from; ``_id`` is always included by MongoDB.
+    """
+    if fields is None:
+        return None
+    projection = {}
+    for field in fields:
+        for source in source_fields.get(field, (field,)):
+            projection[source] = 1
+    return projection
+
+def select_fields(item, fields, always=('id',)):
+    """Trim a serialized item down to the requested fields."""
+    if fields is None:
+        return item
+    keep = set(fields).union(always)
+    return {k: v for k, v in item.items() if k in keep}
@@ -0,0 +1,281 @@
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timezone
+from bson import json_util
+from flask import current_app
+from app.utils.cache import get_redis, bump_versions, redis_error
+
+QUEUE_KEY = 'jobs:queue:{queue}'
+DELAYED_KEY = 'jobs:delayed:{queue}'
+DEAD_KEY = 'jobs:dead:{queue}'
+PROCESSING_KEY = 'jobs:processing:{worker}:{slot}'
+HEARTBEAT_KEY = 'jobs:heartbeat:{worker}'
+WORKERS_KEY = 'jobs:workers'
+HEARTBEAT_TTL = 30
+
+# ObjectIds and datetimes round-trip; datetimes come back timezone-aware
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS.with_options(tz_aware=True, tzinfo=timezone.utc)
+
+# Moves due retries back onto the queue atomically
+PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, payload in ipairs(due) do
+    redis.call('ZREM', KEYS[1], payload)
+    redis.call('LPUSH', KEYS[2], payload)
+end
+return #due
+"""
+
+_registry = {}
+_periodic = []
+_shutdown_hooks = []
+
+def job(name, max_retries=None, bumps=()):
+    """Register a function as a background job.
+
+    The decorated function gains ``delay(*args, **kwargs)`` to enqueue it.
+    Jobs whose first argument is a user id can list resources in ``bumps``
+    to invalidate that user's ETags once the job has succeeded. Jobs may
+    be retried, so they should be idempotent or set ``max_retries=0``.
+    """
+    def decorator(fn):
+        _registry[name] = {'fn': fn, 'max_retries': max_retries, 'bumps': tuple(bumps)}
+        fn.job_name = name
+        fn.delay = lambda *args, **kwargs: enqueue(name, *args, **kwargs)
+        return fn
+    return decorator
+
+def periodic(interval=1.0):
+    """Register a function that every worker runs each ``interval`` seconds.
+
+    It runs in the scheduler thread inside an app context, so it should be
+    quick; errors are logged and it is tried again on the next interval.
+    """
+    def decorator(fn):
+        _periodic.append({'fn': fn, 'interval': interval})
+        return fn
+    return decorator
+
+def on_shutdown(fn):
+    """Register a function a worker runs after its job threads have stopped."""
+    _shutdown_hooks.append(fn)
+    return fn
+
+def _payload(name, args, kwargs):
+    return {
+        'id': uuid.uuid4().hex,
+        'name': name,
+        'args': list(args),
+        'kwargs': kwargs,
+        'attempts': 0,
+        'enqueued_at': datetime.now(timezone.utc),
+    }
+
+def _dumps(payload):
+    return json_util.dumps(payload, json_options=JSON_OPTIONS)
+
+def _loads(raw):
+    return json_util.loads(raw, json_options=JSON_OPTIONS)
+
+def _execute(payload):
+    spec = _registry.get(payload['name'])
+    if spec is None:
+        raise LookupError(f"Unknown job: {payload['name']}")
+    result = spec['fn'](*payload['args'], **payload['kwargs'])
+    if spec['bumps'] and payload['args']:
+        bump_versions(payload['args'][0], *spec['bumps'])
+    return result
+
+def _run_inline(payload):
+    try:
+        _execute(payload)
+    except Exception as e:
+        # The synchronous backend is used by tests, which should see failures
+        if current_app.testing:
+            raise
+        current_app.logger.error(f"Job {payload['name']} failed: {str(e)}")
+    return payload['id']
+
+def enqueue_many(calls):
+    """Enqueue ``(name, args, kwargs)`` calls in one Redis round trip.
+
+    With ``JOBS_BACKEND = 'sync'``, or when Redis is unavailable, the jobs
+    run immediately in the calling thread instead.
+    """
+    payloads = [_payload(name, args, kwargs) for name, args, kwargs in calls]
+    if not payloads:
+        return []
+    if current_app.config.get('JOBS_BACKEND', 'sync') == 'redis':
+        queue = QUEUE_KEY.format(queue=current_app.config.get('JOBS_QUEUE', 'default'))
+        try:
+            get_redis().lpush(queue, *[_dumps(p) for p in payloads])
+            return [p['id'] for p in payloads]
+        except redis_error() as e:
+            current_app.logger.warning(f"Could not enqueue jobs, running them inline: {str(e)}")
+    return [_run_inline(p) for p in payloads]
+
+def enqueue(name, *args, **kwargs):
+    return enqueue_many([(name, args, kwargs)])[0]
+
+def _backoff(app, attempts):
+    base = app.config.get('JOBS_BACKOFF_BASE', 2)
+    delay = min(base * 2 ** (attempts - 1), app.config.get('JOBS_BACKOFF_MAX', 300))
+    return delay * random.uniform(0.5, 1.0)
+
+def requeue_dead(client, queue='default', limit=None):
+    """Move dead-lettered jobs back onto the queue with a fresh retry budget."""
+    moved = 0
+    while limit is None or moved < limit:
+        raw = client.rpop(DEAD_KEY.format(queue=queue))
+        if raw is None:
+            break
+        payload = _loads(raw)
+        payload.pop('error', None)
+        payload['attempts'] = 0
+        client.lpush(QUEUE_KEY.format(queue=queue), _dumps(payload))
+        moved += 1
+    return moved
+
+class Worker:
+    """A pool of threads consuming one queue.
+
+    Every thread moves a job into its own processing list while running it
+    (BRPOPLPUSH), so jobs held by a worker that died are put back on the
+    queue once its heartbeat expires. Failed jobs are retried with
+    exponential backoff through a delayed sorted set and end up in the
+    dead-letter list when their retries are exhausted.
+    """
+    def __init__(self, app, queue='default', concurrency=4):
+        self.app = app
+        self.queue = queue
+        self.concurrency = concurrency
+        self.id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.client = get_redis()
+        self.stopping = threading.Event()
+        self._promote = self.client.register_script(PROMOTE_SCRIPT)
+        self._queue_key = QUEUE_KEY.format(queue=queue)
+        self._delayed_key = DELAYED_KEY.format(queue=queue)
+        self._dead_key = DEAD_KEY.format(queue=queue)
+
+    def _heartbeat(self):
+        self.client.set(HEARTBEAT_KEY.format(worker=self.id), 1, ex=HEARTBEAT_TTL)
+
+    def recover_orphans(self):
+        """Requeue jobs left in the processing lists of workers that stopped heartbeating."""
+        recovered = 0
+        for worker in self.client.smembers(WORKERS_KEY):
+            worker = worker.decode()
+            if worker == self.id or self.client.exists(HEARTBEAT_KEY.format(worker=worker)):
+                continue
+            for key in self.client.scan_iter(match=PROCESSING_KEY.format(worker=worker, slot='*')):
+                while self.client.rpoplpush(key, self._queue_key):
+                    recovered += 1
+            self.client.srem(WORKERS_KEY, worker)
+        return recovered
+
+    def _fail(self, payload, error):
+        spec = _registry.get(payload['name']) or {}
+        max_retries = spec.get('max_retries')
+        if max_retries is None:
+            max_retries = self.app.config.get('JOBS_MAX_RETRIES', 5)
+        payload['attempts'] += 1
+        payload['error'] = error
+
+        if payload['attempts'] <= max_retries:
+            retry_at = time.time() + _backoff(self.app, payload['attempts'])
+            self.client.zadd(self._delayed_key, {_dumps(payload): retry_at})
+            self.app.logger.warning(
+                f"Job {payload['name']} {payload['id']} failed (attempt {payload['attempts']}), retrying"
+            )
+        else:
+            payload['failed_at'] = datetime.now(timezone.utc)
+            pipe = self.client.pipeline(transaction=False)
+            pipe.lpush(self._dead_key, _dumps(payload))
+            pipe.ltrim(self._dead_key, 0, self.app.config.get('JOBS_DEAD_LETTER_MAX', 10000) - 1)
+            pipe.execute()
+            self.app.logger.error(f"Job {payload['name']} {payload['id']} moved to the dead-letter queue: {error.strip().splitlines()[-1]}")
+
+    def _process(self, slot):
+        processing = PROCESSING_KEY.format(worker=self.id, slot=slot)
+        while not self.stopping.is_set():
+            try:
+                raw = self.client.brpoplpush(self._queue_key, processing, timeout=1)
+            except redis_error() as e:
+                self.app.logger.error(f"Job queue unavailable: {str(e)}")
+                self.stopping.wait(1)
+                continue
+            if raw is None:
+                continue
+
+            try:
+                payload = _loads(raw)
+            except ValueError:
+                self.app.logger.error('Discarding undecodable job payload')
+                self.client.lrem(processing, 1, raw)
+                continue
+
+            try:
+                with self.app.app_context():
+                    _execute(payload)
+            except Exception:
+                self._fail(payload, traceback.format_exc(limit=5))
+            finally:
+                self.client.lrem(processing, 1, raw)
+
+    def _run_hook(self, fn):
+        try:
+            with self.app.app_context():
+                fn()
+        except Exception as e:
+            self.app.logger.error(f"Worker task {fn.__name__} failed: {str(e)}")
+
+    def _maintain(self):
+        next_run = [0] * len(_periodic)
+        while not self.stopping.is_set():
+            try:
+                self._heartbeat()
+                self._promote(keys=[self._delayed_key, self._queue_key], args=[time.time(), 100])
+            except redis_error() as e:
+                self.app.logger.error(f"Job scheduler error: {str(e)}")
+            for i, task in enumerate(_periodic):
+                if time.monotonic() >= next_run[i]:
+                    self._run_hook(task['fn'])
+                    next_run[i] = time.monotonic() + task['interval']
+            self.stopping.wait(min([1] + [task['interval'] for task in _periodic]))
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def run(self):
+        self._heartbeat()
+        self.client.sadd(WORKERS_KEY, self.id)
+        recovered = self.recover_orphans()
+        if recovered:
+            self.app.logger.warning(f'Requeued {recovered} jobs from stopped workers')
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        threads = [threading.Thread(target=self._maintain, name='jobs-maintain', daemon=True)]
+        threads += [
+            threading.Thread(target=self._process, args=(slot,), name=f'jobs-{slot}', daemon=True)
+            for slot in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        # Wake up regularly so signals are handled promptly
+        while not self.stopping.is_set():
+            self.stopping.wait(0.5)
+        for thread in threads:
+            thread.join()
+        for fn in _shutdown_hooks:
+            self._run_hook(fn)
+
+        self.client.srem(WORKERS_KEY, self.id)
+        self.client.delete(HEARTBEAT_KEY.format(worker=self.id))
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+import tracemalloc
+from flask import g, request
+
+# State is per worker process; every response reports the pid it came from
+_lock = threading.Lock()
+_state = {
+    'baseline': None,
+    'latest': None,
+    'armed': None,
+    'endpoints': {}
+}
+
+def _filtered(snapshot):
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+
+def _format_stat(stat):
+    frame = stat.traceback[0]
+    return {
+        'location': f'{frame.filename}:{frame.lineno}',
+        'size': stat.size,
+        'count': stat.count,
+        'size_diff': getattr(stat, 'size_diff', None),
+        'count_diff': getattr(stat, 'count_diff', None),
+        'traceback': stat.traceback.format()
+    }
+
+def status():
+    current, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        armed = dict(_state['armed']) if _state['armed'] else None
+        return {
+            'pid': os.getpid(),
+            'tracing': tracemalloc.is_tracing(),
+            'traced_current': current,
+            'traced_peak': peak,
+            'has_baseline': _state['baseline'] is not None,
+            'has_latest': _state['latest'] is not None,
+            'armed': armed
+        }
+
+def start(frames=10):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return status()
+
+def stop():
+    tracemalloc.stop()
+    with _lock:
+        _state.update(baseline=None, latest=None, armed=None)
+        _state['endpoints'].clear()
+    return status()
+
+def take_snapshot(baseline=False):
+    """Store a snapshot as the new baseline, or as the latest to diff against it."""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError('tracemalloc is not tracing')
+    snapshot = _filtered(tracemalloc.take_snapshot())
+    with _lock:
+        if baseline or _state['baseline'] is None:
+            _state['baseline'] = snapshot
+            _state['latest'] = None
+        else:
+            _state['latest'] = snapshot
+    return status()
+
+def arm(requests):
+    """Take a baseline now and a second snapshot after ``requests`` more requests."""
+    take_snapshot(baseline=True)
+    with _lock:
+        _state['armed'] = {'remaining': requests, 'requests': requests, 'armed_at': time.time()}
+    return status()
+
+def top(limit=20, group_by='lineno'):
+    with _lock:
+        snapshot = _state['latest'] or _state['baseline']
+    if snapshot is None:
+        return None
+    return [_format_stat(stat) for stat in snapshot.statistics(group_by)[:limit]]
+
+def diff(limit=20, group_by='lineno'):
+    with _lock:
+        baseline, latest = _state['baseline'], _state['latest']
+    if baseline is None or latest is None:
+        return None
+    return [_format_stat(stat) for stat in latest.compare_to(baseline, group_by)[:limit]]
+
+def endpoint_peaks(limit=20):
+    with _lock:
+        rows = [dict(stats, endpoint=endpoint) for endpoint, stats in _state['endpoints'].items()]
+    rows.sort(key=lambda row: row['max_peak'], reverse=True)
+    return rows[:limit]
+
+def _record_request(endpoint, peak):
+    with _lock:
+        stats = _state['endpoints'].setdefault(
+            endpoint, {'requests': 0, 'max_peak': 0, 'total_peak': 0}
+        )
+        stats['requests'] += 1
+        stats['max_peak'] = max(stats['max_peak'], peak)
+        stats['total_peak'] += peak
+        stats['avg_peak'] = stats['total_peak'] // stats['requests']
+        
+        armed = _state['armed']
+        if not armed:
+            return False
+        armed['remaining'] -= 1
+        if armed['remaining'] > 0:
+            return False
+        _state['armed'] = None
+        return True
+
+def init_memory_profiling(app):
+    """Track per-endpoint peak allocations while tracemalloc is tracing.
+    
+    Registered only when MEMORY_PROFILING_ENABLED is set; set
+    MEMORY_PROFILING_START to begin tracing at startup instead of waiting
+    for the diagnostics endpoint. Peaks are approximate under threaded
+    workers because tracemalloc tracks one peak per process.
+    """
+    if not app.config.get('MEMORY_PROFILING_ENABLED'):
+        return app
+    if app.config.get('MEMORY_PROFILING_START'):
+        start(app.config.get('MEMORY_PROFILING_FRAMES', 10))
+    
+    @app.before_request
+    def reset_memory_peak():
+        if tracemalloc.is_tracing() and not (request.endpoint or '').startswith('diagnostics.'):
+            tracemalloc.reset_peak()
+            g._memory_start = tracemalloc.get_traced_memory()[0]
+    
+    @app.teardown_request
+    def record_memory_peak(exception=None):
+        started = g.pop('_memory_start', None)
+        if started is None or not tracemalloc.is_tracing():
+            return
+        peak = max(tracemalloc.get_traced_memory()[1] - started, 0)
+        if _record_request(request.endpoint or 'unmatched', peak):
+            take_snapshot()
+    
+    return app
@@ -0,0 +1,154 @@
+import hmac
+import os
+import time
+from flask import request, g, current_app, abort
+from app import METRICS_PATH
+from app.utils import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+def _build_metrics(prometheus_client):
+    Counter, Gauge, Histogram = prometheus_client.Counter, prometheus_client.Gauge, prometheus_client.Histogram
+    return {
+        'requests': Counter(
+            'http_requests_total', 'HTTP requests',
+            ['blueprint', 'endpoint', 'method', 'status']
+        ),
+        'latency': Histogram(
+            'http_request_duration_seconds', 'HTTP request latency',
+            ['blueprint', 'endpoint', 'method'], buckets=LATENCY_BUCKETS
+        ),
+        'request_mongo_commands': Histogram(
+            'http_request_mongo_commands', 'Mongo commands issued per request',
+            ['blueprint', 'endpoint'], buckets=COUNT_BUCKETS
+        ),
+        'request_redis_calls': Histogram(
+            'http_request_redis_calls', 'Redis round trips per request',
+            ['blueprint', 'endpoint'], buckets=COUNT_BUCKETS
+        ),
+        'mongo_commands': Counter(
+            'mongo_commands_total', 'Mongo commands',
+            ['collection', 'command', 'outcome']
+        ),
+        'mongo_latency': Histogram(
+            'mongo_command_duration_seconds', 'Mongo command latency',
+            ['collection', 'command'], buckets=LATENCY_BUCKETS
+        ),
+        'redis_latency': Histogram(
+            'redis_command_duration_seconds', 'Redis command latency',
+            ['command'], buckets=LATENCY_BUCKETS
+        ),
+        'mongo_pool': Gauge(
+            'mongo_pool_connections', 'Mongo pool connections',
+            ['state'], multiprocess_mode='livesum'
+        ),
+        'redis_pool': Gauge(
+            'redis_pool_connections', 'Redis pool connections',
+            ['state'], multiprocess_mode='livesum'
+        ),
+    }
+
+_metrics = None
+
+# Pool events as (gauge state, delta)
+POOL_DELTAS = {
+    'created': ('open', 1),
+    'closed': ('open', -1),
+    'checked_out': ('in_use', 1),
+    'checked_in': ('in_use', -1)
+}
+
+def _observe_mongo(collection, command, seconds, outcome):
+    _metrics['mongo_commands'].labels(collection, command, outcome).inc()
+    _metrics['mongo_latency'].labels(collection, command).observe(seconds)
+
+def _observe_redis(command, seconds):
+    _metrics['redis_latency'].labels(command).observe(seconds)
+
+def _observe_pool(name, address):
+    state, delta = POOL_DELTAS[name]
+    _metrics['mongo_pool'].labels(state).inc(delta)
+
+def _labels():
+    endpoint = request.endpoint or 'unmatched'
+    return request.blueprint or 'app', endpoint
+
+def _update_redis_pool_gauge(metrics):
+    from app.utils.cache import get_redis
+    client = get_redis()
+    pool = getattr(client, 'connection_pool', None)
+    if pool is None:
+        return
+    created = getattr(pool, '_created_connections', None)
+    in_use = getattr(pool, '_in_use_connections', None)
+    if created is not None:
+        metrics['redis_pool'].labels('open').set(created)
+    if in_use is not None:
+        metrics['redis_pool'].labels('in_use').set(len(in_use))
+
+def init_metrics(app):
+    """Expose Prometheus metrics at ``/metrics`` when METRICS_ENABLED is set.
+    
+    When disabled nothing is registered, so requests pay no extra cost.
+    Must be called after ``monitoring.init_app`` and before the Mongo client
+    is created.
+    """
+    if not app.config.get('METRICS_ENABLED'):
+        return app
+    try:
+        import prometheus_client
+    except ImportError:
+        app.logger.warning('METRICS_ENABLED is set but prometheus_client is not installed')
+        return app
+    
+    # Metrics live in the process-wide registry, so build them only once
+    global _metrics
+    if _metrics is None:
+        _metrics = _build_metrics(prometheus_client)
+    metrics = _metrics
+    
+    monitoring.install()
+    monitoring.add_observer('mongo', _observe_mongo)
+    monitoring.add_observer('redis', _observe_redis)
+    monitoring.add_observer('pool', _observe_pool)
+    
+    @app.before_request
+    def start_request_metrics():
+        g._metrics_start = time.perf_counter()
+    
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('_metrics_start', None)
+        stats = g.get('request_stats')
+        if start is None or request.path == METRICS_PATH:
+            return response
+        blueprint, endpoint = _labels()
+        metrics['requests'].labels(blueprint, endpoint, request.method, response.status_code).inc()
+        metrics['latency'].labels(blueprint, endpoint, request.method).observe(time.perf_counter() - start)
+        if stats is not None:
+            metrics['request_mongo_commands'].labels(blueprint, endpoint).observe(stats.mongo_commands)
+            metrics['request_redis_calls'].labels(blueprint, endpoint).observe(stats.redis_calls)
+        _update_redis_pool_gauge(metrics)
+        return response
+    
+    def metrics_view():
+        token = current_app.config.get('METRICS_TOKEN')
+        if token:
+            provided = request.headers.get('Authorization', '').replace('Bearer ', '', 1)
+            if not hmac.compare_digest(provided, token):
+                abort(403)
+        
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            from prometheus_client import CollectorRegistry, multiprocess
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        return current_app.response_class(
+            prometheus_client.generate_latest(registry),
+            mimetype=prometheus_client.CONTENT_TYPE_LATEST
+        )
+    
+    app.add_url_rule(METRICS_PATH, 'metrics', metrics_view)
+    return app
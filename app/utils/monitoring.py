@@ -0,0 +1,218 @@
+import contextvars
+import functools
+import threading
+import time
+from flask import g
+from pymongo import MongoClient, monitoring
+
+STATS_HEADER = 'X-Query-Stats'
+
+class RequestStats:
+    """Mongo and Redis activity attributed to one request (or test block).
+    
+    Stats nest: anything recorded is also added to the parent, so a test can
+    wrap several requests and still see their totals.
+    """
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.mongo_commands = 0
+        self.mongo_seconds = 0.0
+        self.redis_calls = 0
+        self.redis_seconds = 0.0
+        self.commands = {}
+        self._lock = threading.Lock()
+    
+    def record_mongo(self, collection, command, seconds):
+        stats = self
+        while stats is not None:
+            with stats._lock:
+                stats.mongo_commands += 1
+                stats.mongo_seconds += seconds
+                key = (collection, command)
+                stats.commands[key] = stats.commands.get(key, 0) + 1
+            stats = stats.parent
+    
+    def record_redis(self, command, seconds):
+        stats = self
+        while stats is not None:
+            with stats._lock:
+                stats.redis_calls += 1
+                stats.redis_seconds += seconds
+            stats = stats.parent
+
+_current_stats = contextvars.ContextVar('request_stats', default=None)
+_observers = {'mongo': [], 'redis': [], 'pool': []}
+_installed = False
+_install_lock = threading.Lock()
+
+def current_stats():
+    return _current_stats.get()
+
+def start_stats():
+    """Begin collecting stats in the current context; returns a token for ``stop_stats``."""
+    stats = RequestStats(parent=_current_stats.get())
+    return stats, _current_stats.set(stats)
+
+def stop_stats(token):
+    _current_stats.reset(token)
+
+def add_observer(kind, callback):
+    """Call ``callback`` for every ``kind`` event ('mongo', 'redis' or 'pool')."""
+    if callback not in _observers[kind]:
+        _observers[kind].append(callback)
+
+class CommandMonitor(monitoring.CommandListener):
+    """Attributes every Mongo command to the current request's stats."""
+    def __init__(self):
+        self._collections = {}
+    
+    def started(self, event):
+        if event.command_name == 'getMore':
+            target = event.command.get('collection')
+        else:
+            target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.database_name
+        self._collections[(event.connection_id, event.request_id)] = collection
+    
+    def _finished(self, event, outcome):
+        collection = self._collections.pop((event.connection_id, event.request_id), 'unknown')
+        seconds = event.duration_micros / 1e6
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record_mongo(collection, event.command_name, seconds)
+        for callback in _observers['mongo']:
+            callback(collection, event.command_name, seconds, outcome)
+    
+    def succeeded(self, event):
+        self._finished(event, 'success')
+    
+    def failed(self, event):
+        self._finished(event, 'failure')
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Forwards connection pool changes to observers as (event, address) pairs."""
+    def _notify(self, name, event):
+        for callback in _observers['pool']:
+            callback(name, event.address)
+    
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): pass
+    
+    def connection_created(self, event):
+        self._notify('created', event)
+    
+    def connection_closed(self, event):
+        self._notify('closed', event)
+    
+    def connection_checked_out(self, event):
+        self._notify('checked_out', event)
+    
+    def connection_checked_in(self, event):
+        self._notify('checked_in', event)
+
+def _record_redis(command, seconds):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record_redis(command, seconds)
+    for callback in _observers['redis']:
+        callback(command, seconds)
+
+@functools.lru_cache(maxsize=None)
+def instrumented_redis_class():
+    """Redis client class that records every call against the current request.
+
+    Built on first use so importing this module does not load redis-py.
+    """
+    import redis
+
+    class InstrumentedPipeline(redis.client.Pipeline):
+        """Counts a pipeline as a single round trip."""
+        def execute(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().execute(*args, **kwargs)
+            finally:
+                _record_redis('PIPELINE', time.perf_counter() - start)
+
+    class InstrumentedRedis(redis.Redis):
+        def execute_command(self, *args, **options):
+            start = time.perf_counter()
+            try:
+                return super().execute_command(*args, **options)
+            finally:
+                _record_redis(str(args[0]).upper(), time.perf_counter() - start)
+        
+        def pipeline(self, transaction=True, shard_hint=None):
+            return InstrumentedPipeline(
+                self.connection_pool, self.response_callbacks, transaction, shard_hint
+            )
+
+    return InstrumentedRedis
+
+def observes_mongo(client):
+    """Whether ``client`` reports its commands to the request stats."""
+    if not isinstance(client, MongoClient):
+        return False
+    return any(isinstance(listener, CommandMonitor) for listener in client.options.event_listeners)
+
+def observes_redis(client):
+    """Whether ``client`` reports its calls to the request stats."""
+    return isinstance(client, instrumented_redis_class())
+
+def install():
+    """Register the Mongo listeners once per process.
+    
+    Must run before the MongoClient is created; listeners registered with
+    ``pymongo.monitoring`` apply to clients created afterwards.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        monitoring.register(CommandMonitor())
+        monitoring.register(PoolMonitor())
+        _installed = True
+
+def is_installed():
+    return _installed
+
+def init_app(app):
+    """Collect per-request Mongo/Redis stats when metrics, the debug header or testing need them.
+    
+    Nothing is installed otherwise, so the hot path is untouched. With
+    ``QUERY_STATS_HEADER`` (or in debug mode) every response carries the
+    request's counts in an ``X-Query-Stats`` header for manual profiling.
+    """
+    from app import monitoring_required
+    if not monitoring_required(app):
+        return app
+    send_header = app.debug or app.config.get('QUERY_STATS_HEADER')
+    install()
+    
+    @app.before_request
+    def start_request_stats():
+        g.request_stats, g._request_stats_token = start_stats()
+    
+    if send_header:
+        @app.after_request
+        def add_request_stats_header(response):
+            stats = g.get('request_stats')
+            if stats is not None:
+                response.headers[STATS_HEADER] = (
+                    f'mongo={stats.mongo_commands};mongo_ms={stats.mongo_seconds * 1000:.1f};'
+                    f'redis={stats.redis_calls};redis_ms={stats.redis_seconds * 1000:.1f}'
+                )
+            return response
+    
+    @app.teardown_request
+    def stop_request_stats(exception=None):
+        token = g.pop('_request_stats_token', None)
+        if token is not None:
+            stop_stats(token)
+    
+    return app
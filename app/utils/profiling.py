@@ -0,0 +1,116 @@
+import cProfile
+import hashlib
+import hmac
+import io
+import os
+import pstats
+import re
+import time
+from flask import g, request, current_app
+from app.auth.utils import current_user_id
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_NAME_PATTERN = re.compile(r'^\d+-[\w.]+-[0-9a-f]{12}\.prof$')
+
+def _sign(secret, expires):
+    return hmac.new(secret.encode('utf-8'), str(expires).encode('utf-8'), hashlib.sha256).hexdigest()
+
+def make_profile_token(secret, ttl=3600):
+    """Create an ``X-Profile-Token`` value valid for ``ttl`` seconds."""
+    expires = int(time.time()) + ttl
+    return f'{expires}.{_sign(secret, expires)}'
+
+def _valid_token(secret, token):
+    try:
+        expires, signature = token.split('.', 1)
+        if int(expires) < time.time():
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(signature, _sign(secret, expires))
+
+def _user_hash(user_id):
+    return hashlib.sha256(str(user_id or 'anonymous').encode('utf-8')).hexdigest()[:12]
+
+def profile_dir(app):
+    return app.config.get('PROFILING_DIR') or os.path.join(app.instance_path, 'profiles')
+
+def _should_profile(app):
+    secret = app.config.get('PROFILING_SECRET')
+    token = request.headers.get(PROFILE_HEADER)
+    if secret and token and _valid_token(secret, token):
+        return True
+    allowlist = app.config.get('PROFILING_USER_IDS')
+    return bool(allowlist) and current_user_id() in allowlist
+
+def _prune(directory, keep):
+    profiles = sorted(
+        (name for name in os.listdir(directory) if PROFILE_NAME_PATTERN.match(name)),
+        reverse=True
+    )
+    for name in profiles[keep:]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+def list_profiles(app):
+    """Return metadata for saved profiles, newest first."""
+    directory = profile_dir(app)
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not PROFILE_NAME_PATTERN.match(name):
+            continue
+        timestamp, endpoint, user_hash = name[:-len('.prof')].split('-', 2)
+        profiles.append({
+            'name': name,
+            'endpoint': endpoint,
+            'user_hash': user_hash,
+            'created_at': int(timestamp) / 1000,
+            'size': os.path.getsize(os.path.join(directory, name))
+        })
+    return profiles
+
+def render_profile(path, limit=50):
+    """Render a saved profile as text, sorted by cumulative time."""
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
+
+def init_profiling(app):
+    """Profile individual requests flagged by a signed header or user allowlist.
+    
+    Hooks are only registered when PROFILING_SECRET or PROFILING_USER_IDS is
+    configured, and unflagged requests only pay for the flag check.
+    """
+    if not (app.config.get('PROFILING_SECRET') or app.config.get('PROFILING_USER_IDS')):
+        return app
+    
+    @app.before_request
+    def start_profiling():
+        if request.endpoint and request.endpoint.startswith('diagnostics.'):
+            return None
+        if _should_profile(app):
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+        return None
+    
+    @app.teardown_request
+    def save_profile(exception=None):
+        profiler = g.pop('_profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        try:
+            directory = profile_dir(app)
+            os.makedirs(directory, exist_ok=True)
+            endpoint = re.sub(r'[^\w.]', '_', request.endpoint or 'unmatched')
+            name = f'{int(time.time() * 1000)}-{endpoint}-{_user_hash(current_user_id())}.prof'
+            profiler.dump_stats(os.path.join(directory, name))
+            _prune(directory, app.config.get('PROFILING_KEEP', 50))
+        except Exception as e:
+            current_app.logger.error(f"Error saving request profile: {str(e)}")
+    
+    return app
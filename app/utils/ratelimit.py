@@ -0,0 +1,153 @@
+import math
+import threading
+from flask import g, request, jsonify, current_app
+from app.auth.utils import BATCH_IDENTITY_KEY, current_user_id
+from app.utils.cache import get_redis, redis_error
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+BUCKET_KEY = 'ratelimit:{scope}:{kind}:{identity}'
+
+# Checks every bucket and only takes a token when all of them have one, so a
+# denied request never drains the buckets that still had capacity.
+# KEYS: bucket keys. ARGV: capacity and refill rate (tokens/ms) per key.
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local tokens = {}
+local wait = 0
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local last = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - last) * rate)
+    tokens[i] = available
+    if available < 1 then
+        wait = math.max(wait, math.ceil((1 - available) / rate))
+    end
+end
+if wait > 0 then
+    return {0, wait}
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    redis.call('HSET', KEYS[i], 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate))
+end
+return {1, 0}
+"""
+
+_scripts = {}
+_scripts_lock = threading.Lock()
+
+def parse_limit(limit):
+    """Parse ``'<count>/<period>'`` into ``(capacity, tokens per millisecond)``."""
+    count, _, period = limit.partition('/')
+    if period not in PERIODS or not count.isdigit() or int(count) < 1:
+        raise ValueError(f"Invalid rate limit {limit!r}, expected e.g. '60/minute'")
+    return int(count), int(count) / (PERIODS[period] * 1000)
+
+def _script(client):
+    # One Script per client; redis-py sends EVALSHA and only falls back to
+    # loading the script after a NOSCRIPT error.
+    script = _scripts.get(id(client))
+    if script is None:
+        with _scripts_lock:
+            script = _scripts.setdefault(id(client), client.register_script(TOKEN_BUCKET_SCRIPT))
+    return script
+
+def consume(buckets):
+    """Take one token from every ``(key, capacity, rate)`` bucket in a single round trip.
+
+    Returns ``(allowed, retry_after_seconds)``.
+    """
+    client = get_redis()
+    args = []
+    for _, capacity, rate in buckets:
+        args.extend((capacity, rate))
+    allowed, wait_ms = _script(client)(keys=[key for key, _, _ in buckets], args=args)
+    return bool(allowed), max(1, math.ceil(int(wait_ms) / 1000))
+
+def _rules_for_request(app):
+    limits = app.config.get('RATE_LIMITS', {})
+    # Endpoint rules take precedence over their blueprint's
+    for scope in (request.endpoint, request.blueprint):
+        rule = limits.get(scope) if scope else None
+        if rule and request.method in rule.get('methods', (request.method,)):
+            return scope, rule
+    return None, None
+
+def _too_many(message, status, retry_after):
+    response = jsonify({'message': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def init_rate_limiting(app):
+    """Per-user/per-IP token buckets and a per-process in-flight request cap.
+
+    ``RATE_LIMITS`` maps a blueprint or endpoint name to ``{'user': '60/minute',
+    'ip': '120/minute', 'methods': [...]}``; each request is checked against
+    all of its buckets with one Lua call. ``MAX_IN_FLIGHT_REQUESTS`` sheds
+    load with 503 once that many requests are being served by the process.
+    Redis errors fail open.
+    """
+    # Shedding runs first so an overloaded process never waits on Redis
+    max_in_flight = app.config.get('MAX_IN_FLIGHT_REQUESTS')
+    if max_in_flight:
+        lock = threading.Lock()
+        in_flight = [0]
+        retry_after = app.config.get('LOAD_SHED_RETRY_AFTER', 1)
+
+        @app.before_request
+        def shed_load():
+            # Batch sub-requests run inside a request that already holds a slot
+            if request.environ.get(BATCH_IDENTITY_KEY):
+                return None
+            with lock:
+                if in_flight[0] >= max_in_flight:
+                    return _too_many('Server is busy, please retry', 503, retry_after)
+                in_flight[0] += 1
+            g._holds_request_slot = True
+            return None
+
+        @app.teardown_request
+        def release_request_slot(exception=None):
+            if g.pop('_holds_request_slot', False):
+                with lock:
+                    in_flight[0] -= 1
+
+    if app.config.get('RATE_LIMIT_ENABLED') and app.config.get('RATE_LIMITS'):
+        parsed = {
+            scope: {kind: parse_limit(rule[kind]) for kind in ('user', 'ip') if rule.get(kind)}
+            for scope, rule in app.config['RATE_LIMITS'].items()
+        }
+
+        @app.before_request
+        def check_rate_limit():
+            scope, rule = _rules_for_request(app)
+            if not scope:
+                return None
+            limits = parsed[scope]
+            buckets = []
+            if 'user' in limits:
+                user_id = current_user_id()
+                if user_id:
+                    buckets.append((BUCKET_KEY.format(scope=scope, kind='user', identity=user_id), *limits['user']))
+            if 'ip' in limits and request.remote_addr:
+                buckets.append((BUCKET_KEY.format(scope=scope, kind='ip', identity=request.remote_addr), *limits['ip']))
+            if not buckets:
+                return None
+
+            try:
+                allowed, retry_after = consume(buckets)
+            except redis_error() as e:
+                current_app.logger.warning(f"Rate limit check skipped: {str(e)}")
+                return None
+            if not allowed:
+                return _too_many('Too many requests', 429, retry_after)
+            return None
+
+    return app
@@ -0,0 +1,99 @@
+import re
+from flask import current_app
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from app import mongo
+from app.models.transaction import Transaction
+from app.utils.cache import get_redis, redis_error
+
+# Suggestions are kept per user and field in a Redis sorted set where every
+# member has score 0, so ZRANGEBYLEX gives a sorted prefix index. Members are
+# "<normalized>\x00<original>" so lookups are case-insensitive but the
+# original spelling is what gets returned.
+SUGGEST_KEY = 'suggest:{user_id}:{field}'
+SUGGEST_READY_KEY = 'suggest:{user_id}:ready'
+FIELDS = ('description', 'category')
+MAX_LENGTH = 100
+SEPARATOR = '\x00'
+# Distinct values per field loaded by the backfill, most recently used first
+BACKFILL_LIMIT = 5000
+
+def _normalize(text):
+    return re.sub(r'\s+', ' ', text.strip().lower())[:MAX_LENGTH]
+
+def _member(text):
+    text = re.sub(r'\s+', ' ', text.strip())[:MAX_LENGTH]
+    return f'{_normalize(text)}{SEPARATOR}{text}'
+
+def _recent_values(user_id, field):
+    """The user's most recently used distinct values of ``field``.
+
+    Grouped in an aggregation rather than ``distinct`` so the result is
+    streamed in batches instead of one document capped at 16MB.
+    """
+    rows = mongo.db.transactions.aggregate([
+        {'$match': {'user_id': ObjectId(user_id), field: {'$type': 'string'}}},
+        {'$group': {'_id': f'${field}', 'last_used': {'$max': '$date'}}},
+        {'$sort': {'last_used': -1}},
+        {'$limit': BACKFILL_LIMIT}
+    ], allowDiskUse=True)
+    return [row['_id'] for row in rows]
+
+def _build_index(client, user_id):
+    """Backfill a user's prefix index from MongoDB (runs once per user)."""
+    values = {field: _recent_values(user_id, field) for field in FIELDS}
+    for categories in Transaction.DEFAULT_CATEGORIES.values():
+        values['category'].extend(categories)
+    
+    pipe = client.pipeline(transaction=False)
+    for field, items in values.items():
+        members = {_member(v): 0 for v in items if isinstance(v, str) and v.strip()}
+        if members:
+            pipe.zadd(SUGGEST_KEY.format(user_id=user_id, field=field), members)
+    pipe.set(SUGGEST_READY_KEY.format(user_id=user_id), 1)
+    pipe.execute()
+
+def add_suggestions(user_id, description=None, category=None):
+    """Record a transaction's description and category for type-ahead."""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for field, value in (('description', description), ('category', category)):
+            if isinstance(value, str) and value.strip():
+                pipe.zadd(SUGGEST_KEY.format(user_id=user_id, field=field), {_member(value): 0})
+        pipe.execute()
+    except redis_error() as e:
+        current_app.logger.warning(f"Error recording suggestions: {str(e)}")
+
+def get_suggestions(user_id, prefix, field='description', limit=10):
+    """Return up to ``limit`` distinct values of ``field`` starting with ``prefix``."""
+    if field not in FIELDS:
+        raise ValueError(f"Invalid suggestion field: {field}")
+    client = get_redis()
+    if client is None:
+        return []
+    try:
+        if not client.exists(SUGGEST_READY_KEY.format(user_id=user_id)):
+            _build_index(client, user_id)
+        
+        prefix = _normalize(prefix or '').encode('utf-8')
+        start = b'[' + prefix if prefix else b'-'
+        end = b'[' + prefix + b'\xff' if prefix else b'+'
+        members = client.zrangebylex(
+            SUGGEST_KEY.format(user_id=user_id, field=field), start, end, start=0, num=limit * 2
+        )
+        # Collapse spellings that only differ in case or spacing
+        suggestions = {}
+        for member in members:
+            normalized, original = member.decode('utf-8').split(SEPARATOR, 1)
+            suggestions.setdefault(normalized, original)
+        return list(suggestions.values())[:limit]
+    except redis_error() as e:
+        current_app.logger.warning(f"Error fetching suggestions: {str(e)}")
+        return []
+    except PyMongoError as e:
+        # The index is not marked ready, so the backfill is retried next time
+        current_app.logger.warning(f"Error building suggestions: {str(e)}")
+        return []
@@ -0,0 +1,277 @@
+"""Write-behind buffer for budget spend.
+
+Budget changes from the job workers are appended to a per-budget list in
+Redis instead of being written straight to MongoDB. A budget is flushed
+once its oldest buffered change is ``BUDGET_FLUSH_MAX_STALENESS`` seconds
+old or it has ``BUDGET_FLUSH_MAX_EVENTS`` changes, and every flushed budget
+gets a single ``$inc`` of its net spend in one ``bulk_write``.
+
+The buffer lives in Redis, so changes survive a worker restart. A flush
+first moves a budget's list to an in-flight key tagged with a token that
+is recorded on the budget document by the update itself; replaying an
+in-flight list after a crash therefore never applies it twice. The spend
+delta is computed against the budget's embedded entries, so a change that
+was buffered twice (a replayed job) is only counted once.
+"""
+import json
+import uuid
+from datetime import datetime, timezone
+from bson import ObjectId
+from flask import current_app
+from pymongo import UpdateOne
+from app import mongo
+from app.utils.cache import get_redis, bump_versions
+
+OPS_KEY = 'budget_buffer:ops:'
+INFLIGHT_KEY = 'budget_buffer:inflight:'
+DIRTY_KEY = 'budget_buffer:dirty'
+INFLIGHT_SET_KEY = 'budget_buffer:inflight'
+APPLIED_FIELD = 'buffer_flushes'
+APPLIED_KEEP = 20
+
+# Appends changes and marks the budget dirty with the time of its oldest
+# buffered change, or as due immediately once it holds enough changes.
+# KEYS: ops list, dirty set. ARGV: now, max events, budget id, ops...
+ADD_SCRIPT = """
+for i = 4, #ARGV do
+    redis.call('RPUSH', KEYS[1], ARGV[i])
+end
+local count = redis.call('LLEN', KEYS[1])
+if count >= tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[2], 0, ARGV[3])
+else
+    redis.call('ZADD', KEYS[2], 'NX', ARGV[1], ARGV[3])
+end
+return count
+"""
+
+# Claims due budgets by renaming their ops list to an in-flight key. A budget
+# whose previous flush is still in flight stays dirty and is not renamed.
+# Keys are built from prefixes, so this assumes a single Redis node.
+# KEYS: dirty set, in-flight set. ARGV: max score, limit, ops prefix, in-flight prefix, token,
+# then optionally the budget ids to claim instead of the due ones.
+CLAIM_SCRIPT = """
+local due
+if #ARGV > 5 then
+    due = {}
+    for i = 6, #ARGV do
+        if redis.call('ZSCORE', KEYS[1], ARGV[i]) then
+            table.insert(due, ARGV[i])
+        end
+    end
+else
+    due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+end
+local claimed = {}
+for _, id in ipairs(due) do
+    local inflight = ARGV[4] .. id
+    if redis.call('EXISTS', inflight) == 0 then
+        redis.call('ZREM', KEYS[1], id)
+        if redis.call('EXISTS', ARGV[3] .. id) == 1 then
+            redis.call('RENAME', ARGV[3] .. id, inflight)
+            redis.call('SET', inflight .. ':token', ARGV[5] .. ':' .. id)
+            redis.call('SADD', KEYS[2], id)
+            table.insert(claimed, id)
+        end
+    end
+end
+return claimed
+"""
+
+def enabled():
+    return current_app.config.get('BUDGET_WRITE_BEHIND') and current_app.config.get('JOBS_BACKEND') == 'redis'
+
+def _op(kind, user_id, transaction):
+    return json.dumps({
+        'op': kind,
+        'user_id': str(user_id),
+        'id': str(transaction['_id']),
+        'amount': float(transaction['amount']),
+        'date': transaction['date'].isoformat() if transaction.get('date') else None,
+    })
+
+def buffer_changes(budget_id, user_id, removed=(), added=()):
+    """Buffer transactions leaving and entering a budget, in that order."""
+    ops = [_op('remove', user_id, t) for t in removed] + [_op('add', user_id, t) for t in added]
+    if not ops:
+        return 0
+    client = get_redis()
+    return client.register_script(ADD_SCRIPT)(
+        keys=[OPS_KEY + str(budget_id), DIRTY_KEY],
+        args=[datetime.now(timezone.utc).timestamp(), current_app.config['BUDGET_FLUSH_MAX_EVENTS'], str(budget_id), *ops]
+    )
+
+def _current_entries(budget_ids, touched):
+    """The embedded entries of ``touched`` transactions in each budget, in one read."""
+    touched = sorted(touched)
+    rows = mongo.db.budgets.aggregate([
+        {'$match': {'_id': {'$in': [ObjectId(b) for b in budget_ids]}}},
+        {'$project': {APPLIED_FIELD: 1, 'transactions': {'$filter': {
+            'input': {'$ifNull': ['$transactions', []]},
+            'as': 't',
+            'cond': {'$or': [
+                {'$in': ['$$t.id', {'$literal': [ObjectId(t) for t in touched]}]},
+                {'$in': ['$$t.transaction_id', {'$literal': touched}]}
+            ]}
+        }}}}
+    ])
+    return {str(row['_id']): row for row in rows}
+
+def _entry_key(entry):
+    # Entries added at budget creation are keyed by ``transaction_id``
+    return ('id', entry['id']) if 'id' in entry else ('transaction_id', entry['transaction_id'])
+
+def _coalesce(budget_id, token, raw_ops, budget):
+    """Turn one budget's ordered changes into two guarded updates.
+
+    Only the last change to each transaction matters: its entry must end up
+    holding the last added amount, or be gone after a remove. The spend delta
+    is worked out against the entries ``budget`` holds now, so changes that
+    were buffered twice (a replayed job) are not counted twice. The first
+    update pulls the touched entries and is guarded on them being as read; the
+    second pushes the final entries and only runs after the first did.
+    """
+    final = {}
+    users = set()
+    for raw in raw_ops:
+        op = json.loads(raw)
+        users.add(op['user_id'])
+        final[op['id']] = op
+
+    current = {}
+    for entry in budget.get('transactions', []):
+        key, value = _entry_key(entry)
+        if str(value) in final:
+            current[str(value)] = (key, value, entry.get('amount'))
+
+    _id = ObjectId(budget_id)
+    now = datetime.now(timezone.utc)
+    guards = []
+    for transaction_id in final:
+        if transaction_id in current:
+            key, value, amount = current[transaction_id]
+            guards.append({'transactions': {'$elemMatch': {key: value, 'amount': amount}}})
+        else:
+            guards.append({
+                'transactions.id': {'$ne': ObjectId(transaction_id)},
+                'transactions.transaction_id': {'$ne': transaction_id}
+            })
+    removed = round(sum(float(amount or 0) for _, _, amount in current.values()), 2)
+    pushes = [
+        {
+            'id': ObjectId(op['id']),
+            'amount': op['amount'],
+            'date': datetime.fromisoformat(op['date']) if op['date'] else now,
+            'note': ''
+        }
+        for op in final.values() if op['op'] == 'add'
+    ]
+    added = round(sum(p['amount'] for p in pushes), 2)
+
+    pull_token = f'{token}:pull'
+    pull = {
+        '$inc': {'spent': -removed, 'remaining': removed},
+        '$push': {APPLIED_FIELD: {'$each': [pull_token], '$slice': -APPLIED_KEEP}}
+    }
+    by_key = {}
+    for key, value, _ in current.values():
+        by_key.setdefault(key, []).append(value)
+    if by_key:
+        conditions = [{key: {'$in': values}} for key, values in by_key.items()]
+        pull['$pull'] = {'transactions': conditions[0] if len(conditions) == 1 else {'$or': conditions}}
+
+    requests = [
+        UpdateOne({'_id': _id, APPLIED_FIELD: {'$ne': pull_token}, '$and': guards}, pull),
+        UpdateOne(
+            {'_id': _id, APPLIED_FIELD: {'$eq': pull_token, '$ne': token}},
+            {
+                '$inc': {'spent': added, 'remaining': -added},
+                '$push': {APPLIED_FIELD: {'$each': [token], '$slice': -APPLIED_KEEP},
+                          'transactions': {'$each': pushes}},
+                '$set': {'updated_at': now}
+            }
+        )
+    ]
+    return requests, users
+
+def _claim(client, max_score, limit, budget_ids=None):
+    args = [max_score, limit, OPS_KEY, INFLIGHT_KEY, uuid.uuid4().hex]
+    claimed = {
+        budget_id.decode() for budget_id in client.register_script(CLAIM_SCRIPT)(
+            keys=[DIRTY_KEY, INFLIGHT_SET_KEY], args=args + list(budget_ids or ())
+        )
+    }
+    inflight = {b.decode() for b in client.smembers(INFLIGHT_SET_KEY)}
+    if budget_ids is not None:
+        inflight &= set(budget_ids)
+    return sorted(claimed | inflight)
+
+def flush(force=False, limit=500, budget_ids=None):
+    """Write due budgets to MongoDB; returns the number of budgets flushed.
+
+    ``force`` flushes everything regardless of staleness (used on worker
+    shutdown). ``budget_ids`` flushes only those budgets, due or not. In-flight
+    lists left by a failed or interrupted flush are replayed; the applied
+    tokens make that safe even when another worker is flushing the same
+    list. A budget whose entries changed between the read and the write
+    stays in flight and is retried by the next flush.
+    """
+    client = get_redis()
+    if budget_ids is not None:
+        budget_ids = [str(b) for b in budget_ids]
+        if not budget_ids:
+            return 0
+    max_score = '+inf' if force or budget_ids else (
+        datetime.now(timezone.utc).timestamp() - current_app.config['BUDGET_FLUSH_MAX_STALENESS']
+    )
+    claimed = _claim(client, max_score, limit, budget_ids)
+    if not claimed:
+        return 0
+
+    pipe = client.pipeline(transaction=False)
+    for budget_id in claimed:
+        pipe.lrange(INFLIGHT_KEY + budget_id, 0, -1)
+        pipe.get(INFLIGHT_KEY + budget_id + ':token')
+    results = pipe.execute()
+    pending_ops = {
+        budget_id: (token.decode(), raw_ops)
+        for budget_id, raw_ops, token in zip(claimed, results[::2], results[1::2])
+        if raw_ops and token
+    }
+    touched = {json.loads(raw)['id'] for _, raw_ops in pending_ops.values() for raw in raw_ops}
+    budgets = _current_entries(list(pending_ops), touched) if pending_ops else {}
+
+    requests, users = [], {}
+    for budget_id, (token, raw_ops) in pending_ops.items():
+        if budget_id in budgets:
+            budget_requests, users[budget_id] = _coalesce(budget_id, token, raw_ops, budgets[budget_id])
+            requests.extend(budget_requests)
+
+    # Each budget's pull must land before its push
+    if requests:
+        mongo.db.budgets.bulk_write(requests, ordered=True)
+        applied = {
+            str(b['_id']) for b in mongo.db.budgets.find(
+                {'_id': {'$in': [ObjectId(b) for b in users]}, APPLIED_FIELD: {'$in': [t for t, _ in pending_ops.values()]}},
+                {'_id': 1}
+            )
+        }
+    else:
+        applied = set()
+    # Deleted budgets and empty lists are dropped; conflicted ones stay in flight
+    done = [b for b in claimed if b not in users or b in applied]
+
+    pipe = client.pipeline(transaction=False)
+    for budget_id in done:
+        pipe.delete(INFLIGHT_KEY + budget_id, INFLIGHT_KEY + budget_id + ':token')
+        pipe.srem(INFLIGHT_SET_KEY, budget_id)
+    pipe.execute()
+    for user_id in {u for b in applied for u in users[b]}:
+        bump_versions(user_id, 'budgets')
+    if len(done) < len(claimed):
+        current_app.logger.info(f"{len(claimed) - len(done)} buffered budgets changed during the flush; retrying later")
+    return len(done)
+
+def pending():
+    """Number of budgets with buffered changes."""
+    return get_redis().zcard(DIRTY_KEY)
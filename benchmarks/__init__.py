@@ -0,0 +1,9 @@
+"""Load benchmarks for the expense tracker.
+
+Run against a local mongod and Redis, ideally with ``MONGODB_URI`` pointing
+at a throwaway database::
+
+    python -m benchmarks seed --users 20 --transactions 2000
+    python -m benchmarks run --output results.json
+    python -m benchmarks compare baseline.json results.json
+"""
@@ -0,0 +1,141 @@
+import argparse
+import os
+import sys
+from benchmarks import report
+
+def _create_app():
+    from app import create_app
+    return create_app()
+
+def cmd_seed(args):
+    from benchmarks.seed import seed, reset
+    app = _create_app()
+    with app.app_context():
+        if args.reset:
+            print(f'removed {reset()} benchmark users')
+        seed(args.users, args.transactions, args.accounts, args.budgets, args.days, args.seed)
+
+def cmd_run(args):
+    from benchmarks.runner import run, TestClientDriver, HttpDriver, READ_ENDPOINTS
+    from benchmarks.seed import bench_users
+    app = _create_app()
+    with app.app_context():
+        user_ids = bench_users(args.prefix)
+    
+    driver = HttpDriver(args.base_url) if args.base_url else TestClientDriver(app)
+    endpoints = args.endpoint or None
+    unknown = set(endpoints or ()) - set(READ_ENDPOINTS) - {'transaction_write'}
+    if unknown:
+        sys.exit(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+    
+    results = run(app, driver, user_ids, args.requests, args.concurrency, endpoints, args.seed)
+    report.save(results, args.output)
+    for endpoint, stats in results['endpoints'].items():
+        print(f"{endpoint:32} p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+              f"p99={stats['p99_ms']:.1f}ms rps={stats['throughput_rps']} errors={stats['errors']}")
+    print(f'wrote {args.output}')
+
+def cmd_scale(args):
+    from benchmarks.scaling import scale
+    from benchmarks.seed import bench_users
+    app = _create_app()
+    with app.app_context():
+        user_ids = bench_users(args.prefix)
+    
+    workers = [int(n) for n in args.workers.split(',')]
+    results = scale(app, user_ids, workers, args.requests, args.concurrency, args.endpoint,
+                    args.port, args.worker_class)
+    report.save(results, args.output)
+    print(f'wrote {args.output}')
+
+def cmd_startup(args):
+    from benchmarks.startup import import_audit, boot_times, check
+    audit = import_audit(args.target)
+    boot = boot_times(args.runs)
+    report.save({'imports': audit, 'boot': boot}, args.output)
+    
+    print(f"import {args.target}: {audit['total_ms']:.1f}ms across {audit['module_count']} modules")
+    for package in audit['packages'][:args.top]:
+        print(f"  {package['package']:28} {package['self_ms']:8.1f}ms")
+    print(f"create_app boot: median {boot['median_ms']:.1f}ms (min {boot['min_ms']:.1f}ms, {boot['runs']} runs)")
+    print(f'wrote {args.output}')
+    
+    problems = check(audit, boot, args.max_import_ms, args.max_boot_ms)
+    if problems:
+        print('\n' + '\n'.join(problems))
+        sys.exit(1)
+
+def cmd_compare(args):
+    rows, regressions = report.compare(
+        report.load(args.baseline), report.load(args.current), args.threshold, args.metric
+    )
+    print(report.format_table(rows))
+    if regressions:
+        print(f"\nregressions over {args.threshold}% ({args.metric}): {', '.join(regressions)}")
+        sys.exit(1)
+
+def _default_worker_counts():
+    cores = os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Expense tracker load benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    seed = commands.add_parser('seed', help='Create benchmark users and data through the models')
+    seed.add_argument('--users', type=int, default=10)
+    seed.add_argument('--transactions', type=int, default=1000, help='per user')
+    seed.add_argument('--accounts', type=int, default=3, help='per user')
+    seed.add_argument('--budgets', type=int, default=5, help='per user')
+    seed.add_argument('--days', type=int, default=365, help='spread transactions over this many days')
+    seed.add_argument('--seed', type=int, default=42)
+    seed.add_argument('--reset', action='store_true', help='remove existing benchmark users first')
+    seed.set_defaults(func=cmd_seed)
+    
+    run = commands.add_parser('run', help='Measure endpoint latency and throughput')
+    run.add_argument('--requests', type=int, default=200, help='iterations per endpoint')
+    run.add_argument('--concurrency', type=int, default=8)
+    run.add_argument('--base-url', help='benchmark a running server instead of the test client')
+    run.add_argument('--endpoint', action='append', help='limit to these endpoints (repeatable)')
+    run.add_argument('--output', default='benchmark-results.json')
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--prefix', default='bench-', help="benchmark users with this username prefix ('seed-' for flask seed)")
+    run.set_defaults(func=cmd_run)
+    
+    scale_parser = commands.add_parser('scale', help='Measure gunicorn throughput across worker counts')
+    scale_parser.add_argument('--workers', default=','.join(str(n) for n in _default_worker_counts()),
+                              help='comma-separated worker counts')
+    scale_parser.add_argument('--worker-class', default='gthread', choices=['gthread', 'gevent'])
+    scale_parser.add_argument('--requests', type=int, default=200, help='iterations per endpoint')
+    scale_parser.add_argument('--concurrency', type=int, default=32)
+    scale_parser.add_argument('--endpoint', action='append', help='limit to these endpoints (repeatable)')
+    scale_parser.add_argument('--port', type=int, default=8765)
+    scale_parser.add_argument('--output', default='benchmark-scaling.json')
+    scale_parser.add_argument('--prefix', default='bench-', help='benchmark users with this username prefix')
+    scale_parser.set_defaults(func=cmd_scale)
+    
+    startup = commands.add_parser('startup', help='Audit import time and measure create_app boot time')
+    startup.add_argument('--target', default='wsgi', help='module to import for the audit')
+    startup.add_argument('--runs', type=int, default=5)
+    startup.add_argument('--top', type=int, default=15, help='packages to list')
+    startup.add_argument('--max-import-ms', type=float, help='fail when importing the target takes longer')
+    startup.add_argument('--max-boot-ms', type=float, help='fail when the median boot takes longer')
+    startup.add_argument('--output', default='benchmark-startup.json')
+    startup.set_defaults(func=cmd_startup)
+    
+    compare = commands.add_parser('compare', help='Compare results against a saved baseline')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=10.0, help='allowed regression in percent')
+    compare.add_argument('--metric', default='p95_ms', choices=['p50_ms', 'p95_ms', 'p99_ms'])
+    compare.set_defaults(func=cmd_compare)
+    
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
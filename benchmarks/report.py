@@ -0,0 +1,87 @@
+import json
+import math
+from collections import defaultdict
+
+PERCENTILES = (50, 95, 99)
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(values)), 1)
+    return values[rank - 1]
+
+def summarize(samples, elapsed):
+    """Aggregate ``(endpoint, latency_ms, ok)`` samples per endpoint."""
+    grouped = defaultdict(list)
+    errors = defaultdict(int)
+    for endpoint, latency, ok in samples:
+        grouped[endpoint].append(latency)
+        if not ok:
+            errors[endpoint] += 1
+    
+    summary = {}
+    for endpoint, latencies in sorted(grouped.items()):
+        latencies.sort()
+        stats = {
+            'count': len(latencies),
+            'errors': errors[endpoint],
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'max_ms': round(latencies[-1], 3),
+        }
+        for pct in PERCENTILES:
+            stats[f'p{pct}_ms'] = round(_percentile(latencies, pct), 3)
+        summary[endpoint] = stats
+    return summary
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+def compare(baseline, current, threshold=10.0, metric='p95_ms'):
+    """Return ``(rows, regressions)`` comparing two result files.
+    
+    A regression is an endpoint whose ``metric`` grew by more than
+    ``threshold`` percent, or that started returning errors.
+    """
+    rows, regressions = [], []
+    for endpoint in sorted(set(baseline['endpoints']) | set(current['endpoints'])):
+        before = baseline['endpoints'].get(endpoint)
+        after = current['endpoints'].get(endpoint)
+        row = {'endpoint': endpoint}
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'):
+            old = before.get(key) if before else None
+            new = after.get(key) if after else None
+            change = round((new - old) / old * 100, 1) if old and new is not None else None
+            row[key] = (old, new, change)
+        rows.append(row)
+        
+        change = row[metric][2]
+        if change is not None and change > threshold:
+            regressions.append(endpoint)
+        elif after and after['errors'] and not (before and before['errors']):
+            regressions.append(endpoint)
+    return rows, regressions
+
+def format_table(rows):
+    def cell(value):
+        old, new, change = value
+        if new is None:
+            return 'missing'
+        if change is None:
+            return f'{new:.1f}'
+        return f'{new:.1f} ({change:+.1f}%)'
+    
+    header = f"{'endpoint':32} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18} {'rps':>18}"
+    lines = [header, '-' * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['endpoint']:32} {cell(row['p50_ms']):>18} {cell(row['p95_ms']):>18} "
+            f"{cell(row['p99_ms']):>18} {cell(row['throughput_rps']):>18}"
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,150 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from flask_jwt_extended import create_access_token
+from app import mongo
+from bson import ObjectId
+from benchmarks.report import summarize
+
+READ_ENDPOINTS = {
+    'dashboard': '/',
+    'transactions_list': '/api/transactions/',
+    'budgets_list': '/api/budgets/',
+    'chart_income_vs_expense': '/api/charts/income-vs-expense',
+    'chart_expense_by_category': '/api/charts/expense-by-category',
+    'chart_income_by_category': '/api/charts/income-by-category',
+    'chart_account_balances': '/api/charts/account-balances',
+}
+WRITE_ENDPOINTS = ('transaction_post', 'transaction_put', 'transaction_delete')
+
+class TestClientDriver:
+    """Dispatch requests in-process through one Flask test client per thread."""
+    
+    name = 'test-client'
+    
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+    
+    def request(self, method, path, token, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(
+            path, method=method, json=body,
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        return response.status_code, response.get_json(silent=True)
+
+class HttpDriver:
+    """Dispatch requests over HTTP to a running server."""
+    
+    name = 'http'
+    
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+    
+    def request(self, method, path, token, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        req.add_header('Authorization', f'Bearer {token}')
+        if data is not None:
+            req.add_header('Content-Type', 'application/json')
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                payload = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            payload, status = e.read(), e.code
+        try:
+            return status, json.loads(payload)
+        except ValueError:
+            return status, None
+
+def _user_fixtures(user_ids):
+    """Access tokens and one account id per benchmark user."""
+    fixtures = []
+    for user_id in user_ids:
+        account = mongo.db.accounts.find_one({'user_id': ObjectId(user_id)}, {'_id': 1})
+        fixtures.append({
+            'user_id': user_id,
+            'token': create_access_token(identity=user_id),
+            'account_id': str(account['_id']) if account else None
+        })
+    return fixtures
+
+def _timed(samples, name, driver, method, path, token, body=None):
+    started = time.perf_counter()
+    try:
+        status, payload = driver.request(method, path, token, body)
+    except Exception:
+        status, payload = 599, None
+    samples.append((name, (time.perf_counter() - started) * 1000, status < 400))
+    return status, payload
+
+def _write_cycle(samples, driver, fixture, rng):
+    body = {
+        'type': 'expense',
+        'amount': round(rng.uniform(10, 500), 2),
+        'category': 'Food',
+        'description': 'Benchmark expense',
+        'account_from': fixture['account_id'],
+    }
+    status, created = _timed(samples, 'transaction_post', driver, 'POST', '/api/transactions/', fixture['token'], body)
+    if status != 201 or not created:
+        return
+    path = f"/api/transactions/{created['id']}"
+    _timed(samples, 'transaction_put', driver, 'PUT', path, fixture['token'], {'amount': body['amount'] + 1})
+    _timed(samples, 'transaction_delete', driver, 'DELETE', path, fixture['token'])
+
+def run(app, driver, user_ids, requests=200, concurrency=8, endpoints=None, random_seed=42):
+    """Issue ``requests`` iterations per endpoint across ``concurrency`` threads.
+    
+    Read endpoints are timed one request at a time; each write iteration
+    creates, updates and deletes a transaction so the dataset stays stable.
+    """
+    endpoints = endpoints or list(READ_ENDPOINTS) + ['transaction_write']
+    with app.app_context():
+        fixtures = _user_fixtures(user_ids)
+    if not fixtures:
+        raise RuntimeError('No benchmark users found; run the seed command first')
+    
+    rng = random.Random(random_seed)
+    jobs = [(endpoint, rng.choice(fixtures)) for endpoint in endpoints for _ in range(requests)]
+    rng.shuffle(jobs)
+    
+    samples = []
+    lock = threading.Lock()
+    
+    def execute(job):
+        endpoint, fixture = job
+        local = []
+        if endpoint == 'transaction_write':
+            _write_cycle(local, driver, fixture, random.Random())
+        else:
+            _timed(local, endpoint, driver, 'GET', READ_ENDPOINTS[endpoint], fixture['token'])
+        with lock:
+            samples.extend(local)
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(execute, jobs))
+    elapsed = time.perf_counter() - started
+    
+    return {
+        'meta': {
+            'driver': driver.name,
+            'requests': requests,
+            'concurrency': concurrency,
+            'users': len(fixtures),
+            'elapsed_s': round(elapsed, 3),
+            'started_at': datetime.now(timezone.utc).isoformat()
+        },
+        'endpoints': summarize(samples, elapsed)
+    }
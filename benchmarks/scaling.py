@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from benchmarks.runner import HttpDriver, run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _wait_until_ready(base_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'{base_url}/auth/login', timeout=2).close()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f'gunicorn did not start within {timeout}s')
+
+def scale(app, user_ids, worker_counts, requests=200, concurrency=32, endpoints=None,
+          port=8765, worker_class='gthread', log=print):
+    """Benchmark gunicorn at each worker count and report throughput per run."""
+    base_url = f'http://127.0.0.1:{port}'
+    results = {'meta': {'worker_class': worker_class, 'concurrency': concurrency}, 'runs': []}
+    
+    for workers in worker_counts:
+        env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f'127.0.0.1:{port}',
+                   GUNICORN_WORKER_CLASS=worker_class, GUNICORN_ACCESS_LOG='')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_until_ready(base_url)
+            result = run(app, HttpDriver(base_url), user_ids, requests, concurrency, endpoints)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        
+        total = sum(stats['count'] for stats in result['endpoints'].values())
+        rps = round(total / result['meta']['elapsed_s'], 2)
+        results['runs'].append({'workers': workers, 'throughput_rps': rps, 'endpoints': result['endpoints']})
+        log(f'{workers:3d} workers: {rps} requests/s')
+    
+    baseline = results['runs'][0]['throughput_rps'] if results['runs'] else None
+    for entry in results['runs']:
+        entry['speedup'] = round(entry['throughput_rps'] / baseline, 2) if baseline else None
+    return results
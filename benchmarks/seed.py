@@ -0,0 +1,106 @@
+import random
+import re
+from datetime import datetime, timedelta
+import pytz
+from app import mongo
+from app.models.user import User
+from app.models.account import Account
+from app.models.transaction import Transaction
+from app.models.budget import Budget
+
+USER_PREFIX = 'bench-'
+PASSWORD = 'bench-password'
+TIMEZONE = pytz.timezone('Asia/Kolkata')
+
+DESCRIPTIONS = [
+    'Groceries', 'Coffee', 'Lunch with team', 'Metro card recharge', 'Electricity bill',
+    'Movie tickets', 'Pharmacy', 'Online course', 'Monthly rent', 'Book store',
+    'Fuel', 'Dinner', 'Salary credit', 'Freelance invoice', 'Dividend'
+]
+ACCOUNT_TYPES = ['bank', 'cash', 'credit_card', 'wallet']
+
+def bench_users(prefix=USER_PREFIX):
+    """Return ids of the users whose username starts with ``prefix``.
+    
+    Defaults to the users created by :func:`seed`; pass ``'seed-'`` for the
+    ones written by ``flask seed``.
+    """
+    return [str(u['_id']) for u in mongo.db.users.find(
+        {'username': {'$regex': f'^{re.escape(prefix)}'}}, {'_id': 1}
+    ).sort('username', 1)]
+
+def reset():
+    """Remove every benchmark user and the documents they own."""
+    user_ids = [u['_id'] for u in mongo.db.users.find(
+        {'username': {'$regex': f'^{USER_PREFIX}'}}, {'_id': 1}
+    )]
+    for collection in ('transactions', 'accounts', 'budgets', 'categories', 'tombstones'):
+        mongo.db[collection].delete_many({'user_id': {'$in': user_ids}})
+    mongo.db.users.delete_many({'_id': {'$in': user_ids}})
+    return len(user_ids)
+
+def _random_transaction(rng, accounts, days):
+    type = rng.choices(['expense', 'income', 'transfer'], weights=[70, 20, 10])[0]
+    account_from = account_to = None
+    if type == 'expense':
+        account_from = rng.choice(accounts)
+    elif type == 'income':
+        account_to = rng.choice(accounts)
+    else:
+        account_from, account_to = rng.sample(accounts, 2) if len(accounts) > 1 else (accounts[0], accounts[0])
+    
+    return {
+        'type': type,
+        'amount': round(rng.uniform(10, 5000), 2),
+        'category': rng.choice(Transaction.DEFAULT_CATEGORIES[type]),
+        'description': rng.choice(DESCRIPTIONS),
+        'account_from': account_from,
+        'account_to': account_to,
+        'date': datetime.now(TIMEZONE) - timedelta(days=rng.uniform(0, days))
+    }
+
+def seed(users=10, transactions=1000, accounts=3, budgets=5, days=365, random_seed=42, log=print):
+    """Create ``users`` users, each with the given number of documents.
+    
+    Everything goes through the model layer so documents have exactly the
+    shape the application writes.
+    """
+    rng = random.Random(random_seed)
+    offset = mongo.db.users.count_documents({'username': {'$regex': f'^{USER_PREFIX}'}})
+    
+    for n in range(offset, offset + users):
+        username = f'{USER_PREFIX}{n:05d}'
+        user_id = User.create(username, f'{username}@example.com', PASSWORD)
+        
+        account_ids = [
+            str(Account.create_account(
+                user_id, f'Account {i + 1}', rng.choice(ACCOUNT_TYPES),
+                balance=round(rng.uniform(1000, 100000), 2)
+            ).inserted_id)
+            for i in range(accounts)
+        ]
+        # Balances end up where the ledger says, as if each write went through the API
+        changes = dict.fromkeys(account_ids, 0.0)
+        for _ in range(transactions):
+            transaction = _random_transaction(rng, account_ids, days)
+            Transaction.create_transaction(user_id, **transaction)
+            if transaction['account_from']:
+                changes[transaction['account_from']] -= transaction['amount']
+            if transaction['account_to']:
+                changes[transaction['account_to']] += transaction['amount']
+        for account_id, change in changes.items():
+            Account.update_account_balance(account_id, round(change, 2))
+        
+        # Budgets are created last so they pick up the seeded spend
+        today = datetime.now(TIMEZONE)
+        for i in range(budgets):
+            month = (today.replace(day=1) - timedelta(days=31 * (i // 4))).replace(day=1)
+            Budget.create_budget(
+                user_id,
+                Transaction.DEFAULT_CATEGORIES['expense'][i % len(Transaction.DEFAULT_CATEGORIES['expense'])],
+                round(rng.uniform(2000, 20000), 2),
+                'monthly',
+                month.strftime('%Y-%m-%d')
+            )
+        log(f'seeded {username}')
+    return users
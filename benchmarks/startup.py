@@ -0,0 +1,100 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+# Optional subsystems that must stay unimported when they are switched off
+LAZY_MODULES = (
+    'redis',
+    'prometheus_client',
+    'gevent',
+    'cProfile',
+    'tracemalloc',
+    'app.utils.metrics',
+    'app.utils.monitoring',
+    'app.utils.profiling',
+    'app.utils.memory',
+    'app.routes.diagnostics',
+    'app.seeding',
+)
+
+# Every optional subsystem off, so the audit sees the default boot path
+BASELINE_ENV = {
+    'METRICS_ENABLED': 'false',
+    'QUERY_STATS_HEADER': 'false',
+    'MEMORY_PROFILING_ENABLED': 'false',
+    'PROFILING_SECRET': '',
+    'PROFILING_USER_IDS': '',
+    'FLASK_DEBUG': '0',
+}
+
+BOOT_SCRIPT = (
+    'import time; started = time.perf_counter(); '
+    'from app import create_app; create_app(); '
+    'print(time.perf_counter() - started)'
+)
+
+def _env():
+    return dict(os.environ, **BASELINE_ENV)
+
+def import_audit(target='wsgi'):
+    """Run ``python -X importtime`` on ``target`` in a fresh interpreter.
+    
+    Returns the total import time, the modules imported and the heaviest
+    top-level packages by self time (all times in milliseconds).
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+    )
+    modules = {}
+    packages = defaultdict(int)
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, module = match.groups()
+        modules[module] = {'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000}
+        packages[module.split('.')[0]] += int(self_us)
+    
+    total = modules.get(target, {}).get('cumulative_ms')
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return {
+        'target': target,
+        'total_ms': total,
+        'module_count': len(modules),
+        'packages': [{'package': name, 'self_ms': round(us / 1000, 3)} for name, us in heaviest],
+        'modules': modules,
+    }
+
+def boot_times(runs=5):
+    """Wall-clock time of importing the app and calling ``create_app`` in fresh interpreters."""
+    times = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-c', BOOT_SCRIPT],
+            cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+        )
+        times.append(float(completed.stdout.strip().splitlines()[-1]) * 1000)
+    return {
+        'runs': runs,
+        'min_ms': round(min(times), 3),
+        'median_ms': round(statistics.median(times), 3),
+        'max_ms': round(max(times), 3),
+    }
+
+def check(audit, boot, max_import_ms=None, max_boot_ms=None, lazy_modules=LAZY_MODULES):
+    """Return a list of problems: eagerly imported optional modules and blown budgets."""
+    problems = [
+        f'{module} is imported at startup' for module in lazy_modules if module in audit['modules']
+    ]
+    if max_import_ms is not None and audit['total_ms'] is not None and audit['total_ms'] > max_import_ms:
+        problems.append(f"import time {audit['total_ms']:.1f}ms exceeds {max_import_ms}ms")
+    if max_boot_ms is not None and boot['median_ms'] > max_boot_ms:
+        problems.append(f"median boot {boot['median_ms']:.1f}ms exceeds {max_boot_ms}ms")
+    return problems
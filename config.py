@@ -4,6 +4,10 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def _env_number(name, cast, default=None):
+    value = os.environ.get(name)
+    return cast(value) if value else default
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or '1f2e3d4c5b6a7980a9b8c7d6e5f4a3b2c1d0e9f8a7b6c5d4e3f2a1b0c9d8e7f6'
     MONGODB_URI = os.environ.get('MONGODB_URI') or 'mongodb://localhost:27017/expense_tracker_db'
@@ -16,4 +20,61 @@ class Config:
     JWT_ACCESS_COOKIE_PATH = '/'
     JWT_REFRESH_COOKIE_PATH = '/auth/refresh'
     JWT_COOKIE_CSRF_PROTECT = False
-    JWT_COOKIE_SECURE = True  # Set to True in production with HTTPS
\ No newline at end of file
+    JWT_COOKIE_SECURE = True  # Set to True in production with HTTPS
+    SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 500))
+    SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', 5))
+    BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+    BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 8))
+    QUERY_MAX_WORKERS = int(os.environ.get('QUERY_MAX_WORKERS', 16))
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    QUERY_STATS_HEADER = os.environ.get('QUERY_STATS_HEADER', 'false').lower() == 'true'
+    ADMIN_USER_IDS = [i for i in os.environ.get('ADMIN_USER_IDS', '').split(',') if i]
+    PROFILING_SECRET = os.environ.get('PROFILING_SECRET')
+    PROFILING_USER_IDS = [i for i in os.environ.get('PROFILING_USER_IDS', '').split(',') if i]
+    PROFILING_DIR = os.environ.get('PROFILING_DIR')
+    PROFILING_KEEP = int(os.environ.get('PROFILING_KEEP', 50))
+    MEMORY_PROFILING_ENABLED = os.environ.get('MEMORY_PROFILING_ENABLED', 'false').lower() == 'true'
+    MEMORY_PROFILING_START = os.environ.get('MEMORY_PROFILING_START', 'false').lower() == 'true'
+    MEMORY_PROFILING_FRAMES = int(os.environ.get('MEMORY_PROFILING_FRAMES', 10))
+
+    # Connection pools; unset values keep the driver defaults
+    MONGO_MAX_POOL_SIZE = _env_number('MONGO_MAX_POOL_SIZE', int)
+    MONGO_MIN_POOL_SIZE = _env_number('MONGO_MIN_POOL_SIZE', int)
+    MONGO_MAX_IDLE_TIME_MS = _env_number('MONGO_MAX_IDLE_TIME_MS', int)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = _env_number('MONGO_WAIT_QUEUE_TIMEOUT_MS', int)
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = _env_number('MONGO_SOCKET_TIMEOUT_MS', int)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    REDIS_MAX_CONNECTIONS = _env_number('REDIS_MAX_CONNECTIONS', int)
+    REDIS_SOCKET_TIMEOUT = _env_number('REDIS_SOCKET_TIMEOUT', float)
+    REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get('REDIS_SOCKET_CONNECT_TIMEOUT', 5))
+    REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30))
+    WARMUP_CONNECTIONS = int(os.environ.get('WARMUP_CONNECTIONS', 4))
+
+    # Token buckets keyed by blueprint or endpoint name
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMITS = {
+        'auth.login': {'ip': '10/minute', 'methods': ['POST']},
+        'auth.register': {'ip': '5/minute', 'methods': ['POST']},
+        'charts': {'user': '60/minute', 'ip': '120/minute'},
+        'budgets': {'user': '120/minute', 'ip': '240/minute'},
+        'transactions': {'user': '300/minute', 'ip': '600/minute'},
+        'sync': {'user': '60/minute'},
+        'batch': {'user': '60/minute'},
+    }
+    MAX_IN_FLIGHT_REQUESTS = int(os.environ.get('MAX_IN_FLIGHT_REQUESTS', 64))
+    LOAD_SHED_RETRY_AFTER = int(os.environ.get('LOAD_SHED_RETRY_AFTER', 1))
+
+    # 'sync' runs background jobs inline; 'redis' queues them for `flask worker`
+    JOBS_BACKEND = os.environ.get('JOBS_BACKEND', 'sync')
+    JOBS_QUEUE = os.environ.get('JOBS_QUEUE', 'default')
+    JOBS_WORKER_CONCURRENCY = int(os.environ.get('JOBS_WORKER_CONCURRENCY', 4))
+    JOBS_MAX_RETRIES = int(os.environ.get('JOBS_MAX_RETRIES', 5))
+    JOBS_BACKOFF_BASE = float(os.environ.get('JOBS_BACKOFF_BASE', 2))
+    JOBS_BACKOFF_MAX = float(os.environ.get('JOBS_BACKOFF_MAX', 300))
+    JOBS_DEAD_LETTER_MAX = int(os.environ.get('JOBS_DEAD_LETTER_MAX', 10000))
+    # Buffer budget spend in Redis and flush it in batches (needs JOBS_BACKEND=redis)
+    BUDGET_WRITE_BEHIND = os.environ.get('BUDGET_WRITE_BEHIND', 'false').lower() == 'true'
+    BUDGET_FLUSH_MAX_STALENESS = float(os.environ.get('BUDGET_FLUSH_MAX_STALENESS', 5))
+    BUDGET_FLUSH_MAX_EVENTS = int(os.environ.get('BUDGET_FLUSH_MAX_EVENTS', 50))
@@ -0,0 +1,44 @@
+"""Gunicorn settings for production.
+
+The app is preloaded in the master so workers share its imported code;
+``post_fork`` then gives every worker its own Mongo and Redis clients,
+because neither driver's connection pool may be shared across a fork.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+if worker_class not in ('gthread', 'gevent'):
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS must be 'gthread' or 'gevent', not {worker_class!r}")
+
+if worker_class == 'gevent':
+    # Patch before the preloaded app imports pymongo, redis and threading
+    from gevent import monkey
+    monkey.patch_all()
+
+def post_fork(server, worker):
+    from wsgi import app
+    from app import init_clients, warm_up
+    
+    init_clients(app)
+    # A gthread worker serves up to ``threads`` requests at once
+    warm_up(app, threads if worker_class == 'gthread' else None)
+    server.log.info(f'Worker {worker.pid} initialised its Mongo and Redis clients')
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,77 @@
+"""Shared fixtures.
+
+Unit tests run against mongomock and fakeredis. Tests marked
+``integration`` need a real MongoDB and are skipped unless
+``MONGODB_TEST_URI`` points at a throwaway database.
+"""
+import os
+from datetime import datetime
+import pytest
+import fakeredis
+import mongomock
+from bson import ObjectId
+from flask_jwt_extended import create_access_token
+import app as app_module
+from app import create_app, mongo
+from config import Config
+
+def _drop_sort(method):
+    # pymongo 4.11+ passes ``sort`` for UpdateOne/ReplaceOne, which mongomock predates
+    def wrapper(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+    return wrapper
+
+mongomock.collection.BulkOperationBuilder.add_update = _drop_sort(mongomock.collection.BulkOperationBuilder.add_update)
+mongomock.collection.BulkOperationBuilder.add_replace = _drop_sort(mongomock.collection.BulkOperationBuilder.add_replace)
+
+class TestConfig(Config):
+    TESTING = True
+    RATE_LIMIT_ENABLED = False
+    MAX_IN_FLIGHT_REQUESTS = 0
+    JOBS_BACKEND = 'sync'
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'integration: needs a MongoDB server at MONGODB_TEST_URI')
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    mongo.cx = mongomock.MongoClient()
+    mongo.db = mongo.cx['expense_tracker_test']
+    redis = fakeredis.FakeRedis()
+    app_module.redis_client = redis
+    app_module._redis_factory = lambda: redis
+    with app.app_context():
+        yield app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def user_id(app):
+    return mongo.db.users.insert_one({
+        'username': 'tester',
+        'email': 'tester@example.com',
+        'created_at': datetime.utcnow()
+    }).inserted_id
+
+@pytest.fixture
+def auth_headers(app, user_id):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+@pytest.fixture
+def real_db(app):
+    """A real MongoDB database, dropped after the test."""
+    uri = os.environ.get('MONGODB_TEST_URI')
+    if not uri:
+        pytest.skip('MONGODB_TEST_URI is not set')
+    from pymongo import MongoClient
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    db = client.get_default_database()
+    mongo.cx, mongo.db = client, db
+    try:
+        yield db
+    finally:
+        client.drop_database(db.name)
+        client.close()
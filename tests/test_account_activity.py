@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app import mongo
+from app.models.transaction import Transaction
+
+def test_activity_only_counts_the_sides_a_transaction_moves(app, user_id):
+    now = datetime.utcnow()
+    cash, bank = ObjectId(), ObjectId()
+    mongo.db.transactions.insert_many([
+        {'user_id': user_id, 'type': 'expense', 'amount': 30.0, 'account_from': cash, 'account_to': bank, 'date': now},
+        {'user_id': user_id, 'type': 'income', 'amount': 100.0, 'account_to': bank, 'account_from': cash, 'date': now},
+        {'user_id': user_id, 'type': 'transfer', 'amount': 20.0, 'account_from': bank, 'account_to': cash, 'date': now},
+        {'user_id': user_id, 'type': 'transfer', 'amount': 5.0, 'account_to': bank, 'account_from': None, 'date': now},
+        {'user_id': user_id, 'type': 'income', 'amount': 40.0, 'account_to': bank, 'date': now - timedelta(days=60)},
+    ])
+    activity = Transaction.get_account_activity(user_id, [cash, bank], now - timedelta(days=30))
+    assert activity[str(cash)]['transactions_count'] == 2
+    assert activity[str(cash)]['inflow_30d'] == 20.0
+    assert activity[str(cash)]['outflow_30d'] == 30.0
+    assert activity[str(bank)]['transactions_count'] == 3
+    assert activity[str(bank)]['inflow_30d'] == 100.0
+    assert activity[str(bank)]['outflow_30d'] == 20.0
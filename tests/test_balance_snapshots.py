@@ -0,0 +1,112 @@
+from datetime import date, datetime, timedelta
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app import mongo
+from app.models.balance_snapshot import BalanceSnapshot, IST
+
+MONTH_END = IST.localize(datetime(2026, 3, 1))
+
+@pytest.fixture
+def account(app, user_id):
+    account = {'_id': ObjectId(), 'user_id': user_id, 'name': 'Savings', 'balance': 150.0, 'opening_balance': 100.0}
+    mongo.db.accounts.insert_one(account)
+    _write(account, 'income', 50.0, MONTH_END - timedelta(days=3))
+    return account
+
+def _write(account, type, amount, date):
+    """Store a transaction the way the transactions routes do."""
+    field = 'account_to' if type == 'income' else 'account_from'
+    transaction = {'user_id': account['user_id'], 'type': type, 'amount': amount, field: account['_id'], 'date': date}
+    with BalanceSnapshot.writing(transaction):
+        mongo.db.transactions.insert_one(dict(transaction))
+        mongo.db.accounts.update_one({'_id': account['_id']}, {'$inc': {'balance': amount if type == 'income' else -amount}})
+        BalanceSnapshot.apply_transaction(transaction)
+    return transaction
+
+def _snapshots(account):
+    return [s['balance'] for s in BalanceSnapshot.between(account['_id'])]
+
+def test_back_dated_writes_shift_later_snapshots(account):
+    assert BalanceSnapshot.build(account, now=MONTH_END + timedelta(days=40)) == 2
+    assert _snapshots(account) == [150.0, 150.0]
+    _write(account, 'expense', 30.0, MONTH_END + timedelta(days=5))
+    assert _snapshots(account) == [150.0, 120.0]
+    BalanceSnapshot.apply_transaction({'type': 'expense', 'amount': 30.0, 'account_from': account['_id'],
+                                       'date': MONTH_END + timedelta(days=5)}, reverse=True)
+    assert _snapshots(account) == [150.0, 150.0]
+
+def test_balance_at_and_series(account):
+    _write(account, 'expense', 20.0, MONTH_END + timedelta(days=2))
+    assert BalanceSnapshot.balance_at(account, MONTH_END - timedelta(days=4)) == 100.0
+    assert BalanceSnapshot.balance_at(account, MONTH_END) == 150.0
+    assert BalanceSnapshot.balance_at(account, MONTH_END + timedelta(days=10)) == 130.0
+    
+    days = BalanceSnapshot.series(account, date(2026, 2, 25), date(2026, 3, 4), interval='day')
+    assert days[0] == (date(2026, 2, 25), 100.0)
+    assert dict(days)[date(2026, 2, 26)] == 150.0
+    assert days[-1] == (date(2026, 3, 4), 130.0)
+    months = BalanceSnapshot.series(account, date(2026, 1, 1), date(2026, 3, 31), interval='month')
+    assert months[-1] == (date(2026, 3, 31), 130.0)
+    assert (date(2026, 2, 28), 150.0) in months
+
+def test_no_build_while_a_write_is_in_flight(account):
+    with BalanceSnapshot.writing({'type': 'income', 'amount': 5.0, 'account_to': account['_id']}):
+        assert BalanceSnapshot.build(account, now=MONTH_END + timedelta(days=1)) == 0
+    assert BalanceSnapshot.build(account, now=MONTH_END + timedelta(days=1)) == 1
+
+def test_a_stale_write_does_not_block_builds(account):
+    mongo.db.accounts.update_one({'_id': account['_id']}, {'$set': {'ledger_writes': {
+        'in_flight': 1, 'count': 3, 'started_at': datetime.utcnow() - BalanceSnapshot.STALE_WRITE * 2
+    }}})
+    assert BalanceSnapshot.build(account, now=MONTH_END + timedelta(days=1)) == 1
+
+@pytest.mark.parametrize('shift_first', [True, False])
+def test_a_write_during_the_build_discards_its_snapshots(account, monkeypatch, shift_first):
+    """A back-dated write lands between the build's aggregate and its upsert.
+
+    Its ``$inc`` either runs before the snapshot exists (which would miss
+    the write) or after the upsert (which would count it twice).
+    """
+    transaction = {'type': 'expense', 'amount': 40.0, 'account_from': account['_id'],
+                   'user_id': account['user_id'], 'date': MONTH_END - timedelta(days=10)}
+    bulk_write = mongo.db.balance_snapshots.bulk_write
+    def racing_bulk_write(requests, ordered=True):
+        with BalanceSnapshot.writing(transaction):
+            mongo.db.transactions.insert_one(dict(transaction))
+            if shift_first:
+                BalanceSnapshot.apply_transaction(transaction)
+            bulk_write(requests, ordered=ordered)
+            if not shift_first:
+                BalanceSnapshot.apply_transaction(transaction)
+    monkeypatch.setattr(mongo.db.balance_snapshots, 'bulk_write', racing_bulk_write)
+    
+    assert BalanceSnapshot.build(account, now=MONTH_END + timedelta(days=1)) == 0
+    assert _snapshots(account) == []
+    monkeypatch.setattr(mongo.db.balance_snapshots, 'bulk_write', bulk_write)
+    assert BalanceSnapshot.build(account, now=MONTH_END + timedelta(days=1)) == 1
+    assert _snapshots(account) == [110.0]
+
+def test_losing_a_concurrent_build_is_not_an_error(account, monkeypatch):
+    def bulk_write(requests, ordered=True):
+        raise BulkWriteError({'writeErrors': [{'index': 0, 'code': 11000, 'errmsg': 'duplicate key'}]})
+    monkeypatch.setattr(mongo.db.balance_snapshots, 'bulk_write', bulk_write)
+    assert BalanceSnapshot.build(account, now=MONTH_END + timedelta(days=1)) == 0
+
+def test_other_write_errors_are_raised(account, monkeypatch):
+    def bulk_write(requests, ordered=True):
+        raise BulkWriteError({'writeErrors': [{'index': 0, 'code': 121, 'errmsg': 'validation failed'}]})
+    monkeypatch.setattr(mongo.db.balance_snapshots, 'bulk_write', bulk_write)
+    with pytest.raises(BulkWriteError):
+        BalanceSnapshot.build(account, now=MONTH_END + timedelta(days=1))
+
+def test_transaction_routes_mark_their_writes(client, auth_headers, account):
+    payload = {'type': 'expense', 'amount': 12.0, 'category': 'Food', 'description': 'Lunch',
+               'account_from': str(account['_id']), 'date': '2026-02-10', 'time': '12:00'}
+    created = client.post('/api/transactions/', json=payload, headers=auth_headers)
+    assert created.status_code == 201
+    transaction_id = created.get_json()['id']
+    assert client.put(f'/api/transactions/{transaction_id}', json={'amount': 15.0}, headers=auth_headers).status_code == 200
+    assert client.delete(f'/api/transactions/{transaction_id}', headers=auth_headers).status_code == 200
+    writes = mongo.db.accounts.find_one({'_id': account['_id']})['ledger_writes']
+    assert writes['in_flight'] == 0 and writes['count'] == 4
@@ -0,0 +1,42 @@
+import pytest
+import flask_jwt_extended.view_decorators as view_decorators
+from tests.conftest import TestConfig
+
+class RateLimitedConfig(TestConfig):
+    RATE_LIMIT_ENABLED = True
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    decode_token = view_decorators.decode_token
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return decode_token(*args, **kwargs)
+    monkeypatch.setattr(view_decorators, 'decode_token', counting)
+    return calls
+
+BATCH = {'requests': [
+    {'id': 'accounts', 'path': '/api/accounts/'},
+    {'id': 'budgets', 'path': '/api/budgets/'},
+    {'id': 'transactions', 'path': '/api/transactions/'},
+]}
+
+def _assert_one_decode(client, auth_headers, decodes):
+    response = client.post('/api/batch', json=BATCH, headers=auth_headers)
+    assert response.status_code == 200
+    assert [r['status'] for r in response.get_json()['responses']] == [200, 200, 200]
+    assert len(decodes) == 1
+
+def test_batch_verifies_the_token_once(client, auth_headers, decodes):
+    _assert_one_decode(client, auth_headers, decodes)
+
+def test_batch_verifies_the_token_once_with_rate_limiting(app, auth_headers, decodes):
+    app.config.from_object(RateLimitedConfig)
+    from app.utils.ratelimit import init_rate_limiting
+    init_rate_limiting(app)
+    _assert_one_decode(app.test_client(), auth_headers, decodes)
+
+def test_batch_without_a_token_runs_nothing(client, decodes):
+    response = client.post('/api/batch', json=BATCH)
+    assert response.status_code != 200
+    assert 'responses' not in (response.get_json(silent=True) or {})
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from app import mongo
+from app.budget_spend import recalculate_user
+from app.models.budget import Budget
+from app.tasks import update_budgets
+
+NOW = datetime.utcnow().replace(microsecond=0)
+
+def _budget(user_id, category, start_days, end_days, amount=100.0):
+    return mongo.db.budgets.insert_one({
+        'user_id': user_id, 'category': category, 'amount': amount, 'period': 'custom',
+        'start_date': NOW + timedelta(days=start_days), 'end_date': NOW + timedelta(days=end_days),
+        'spent': 0.0, 'remaining': amount, 'transactions': []
+    }).inserted_id
+
+def _expense(user_id, category, days, amount):
+    expense = {
+        '_id': ObjectId(), 'user_id': user_id, 'type': 'expense', 'amount': amount,
+        'category': category, 'description': '', 'date': NOW + timedelta(days=days)
+    }
+    mongo.db.transactions.insert_one(expense)
+    return expense
+
+def _spent(*budget_ids):
+    return [mongo.db.budgets.find_one({'_id': b})['spent'] for b in budget_ids]
+
+@pytest.fixture
+def overlapping(app, user_id):
+    older = _budget(user_id, 'Food', -20, 10)
+    newer = _budget(user_id, 'Food', -5, 10, amount=20.0)
+    general = _budget(user_id, None, -20, 10)
+    expenses = [
+        _expense(user_id, 'Food', -10, 7.0),   # only the older Food budget covers it
+        _expense(user_id, 'Food', -1, 15.0),   # both Food budgets cover it
+        _expense(user_id, 'Food', -2, 10.0),
+        _expense(user_id, 'Travel', -3, 4.0),  # no Travel budget, so the general one
+    ]
+    return (older, newer, general), expenses
+
+def test_live_job_and_recalculation_charge_the_same_single_budget(user_id, overlapping):
+    budget_ids, expenses = overlapping
+    for expense in expenses:
+        update_budgets(str(user_id), new_transaction=expense)
+    live = _spent(*budget_ids)
+    assert live == [7.0, 25.0, 4.0]
+    
+    mongo.db.budgets.update_many({}, {'$set': {'spent': 0.0, 'transactions': []}})
+    result = recalculate_user(mongo.db, user_id)
+    assert _spent(*budget_ids) == live
+    assert result['transactions'] == len(expenses)
+
+def test_remaining_is_not_clamped_in_either_path(user_id, overlapping):
+    (older, newer, general), expenses = overlapping
+    for expense in expenses:
+        update_budgets(str(user_id), new_transaction=expense)
+    assert mongo.db.budgets.find_one({'_id': newer})['remaining'] == -5.0
+    recalculate_user(mongo.db, user_id, [newer])
+    assert mongo.db.budgets.find_one({'_id': newer})['remaining'] == -5.0
+
+def test_new_budget_takes_over_expenses_from_an_overlapping_one(user_id, app):
+    older = _budget(user_id, 'Food', -20, 10)
+    _expense(user_id, 'Food', -10, 7.0)
+    _expense(user_id, 'Food', -1, 15.0)
+    recalculate_user(mongo.db, user_id)
+    assert _spent(older) == [22.0]
+    
+    with app.test_request_context():
+        newer = ObjectId(Budget.create_budget(
+            user_id, 'Food', 50.0, 'custom', NOW - timedelta(days=5), (NOW + timedelta(days=10)).strftime('%Y-%m-%d')
+        ))
+    assert _spent(older, newer) == [7.0, 15.0]
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+import pytest
+import pytz
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from app import mongo
+from app.models.budget import Budget
+from app.tasks import update_budgets
+
+IST = pytz.timezone('Asia/Kolkata')
+
+@pytest.fixture
+def budget_id(app, user_id):
+    now = datetime.now(IST)
+    return mongo.db.budgets.insert_one({
+        'user_id': user_id, 'category': 'Food', 'amount': 100.0, 'period': 'monthly',
+        'start_date': now - timedelta(days=10), 'end_date': now + timedelta(days=10),
+        'spent': 0.0, 'remaining': 100.0, 'transactions': []
+    }).inserted_id
+
+def _expense(user_id, amount):
+    return {
+        '_id': ObjectId(), 'user_id': user_id, 'type': 'expense', 'amount': amount,
+        'category': 'Food', 'description': 'Lunch', 'date': datetime.now(IST)
+    }
+
+def _budget(budget_id):
+    return mongo.db.budgets.find_one({'_id': budget_id})
+
+def test_replayed_job_counts_a_transaction_once(user_id, budget_id):
+    expense = _expense(user_id, 12.5)
+    update_budgets(str(user_id), new_transaction=expense)
+    update_budgets(str(user_id), new_transaction=expense)
+    budget = _budget(budget_id)
+    assert budget['spent'] == 12.5 and budget['remaining'] == 87.5
+    assert len(budget['transactions']) == 1
+
+def test_edit_and_delete_move_spend(user_id, budget_id):
+    expense = _expense(user_id, 10.0)
+    update_budgets(str(user_id), new_transaction=expense)
+    edited = dict(expense, amount=25.0)
+    update_budgets(str(user_id), old_transaction=expense, new_transaction=edited)
+    assert _budget(budget_id)['spent'] == 25.0
+    update_budgets(str(user_id), old_transaction=edited)
+    update_budgets(str(user_id), old_transaction=edited)
+    budget = _budget(budget_id)
+    assert budget['spent'] == 0.0 and budget['remaining'] == 100.0 and budget['transactions'] == []
+
+def test_entries_from_budget_creation_are_matched(user_id, budget_id):
+    expense = _expense(user_id, 8.0)
+    mongo.db.budgets.update_one({'_id': budget_id}, {
+        '$set': {'spent': 8.0, 'remaining': 92.0},
+        '$push': {'transactions': {'transaction_id': str(expense['_id']), 'amount': 8.0, 'date': expense['date']}}
+    })
+    update_budgets(str(user_id), new_transaction=expense)
+    assert _budget(budget_id)['spent'] == 8.0
+    update_budgets(str(user_id), old_transaction=expense)
+    assert _budget(budget_id)['spent'] == 0.0
+
+def test_write_failure_reaches_the_job_runner(user_id, budget_id, monkeypatch):
+    def fail(*args, **kwargs):
+        raise PyMongoError('connection reset')
+    monkeypatch.setattr(type(mongo.db.budgets), 'update_one', fail)
+    with pytest.raises(PyMongoError):
+        update_budgets(str(user_id), new_transaction=_expense(user_id, 5.0))
+
+def test_missing_budget_is_not_an_error(app, user_id):
+    assert Budget.update_budget_with_transaction(str(ObjectId()), {'_id': ObjectId(), 'amount': 1.0}) is False
@@ -0,0 +1,35 @@
+from datetime import datetime
+from app import mongo
+from app.models.category import Category
+from app.models.transaction import Transaction
+
+def _counts(user_id):
+    return {(r['type'], r['name']): r['count'] for r in mongo.db.categories.find({'user_id': user_id})}
+
+def test_backfill_runs_even_after_a_write_recorded_usage(app, user_id):
+    mongo.db.transactions.insert_many([
+        {'user_id': user_id, 'type': 'expense', 'category': 'Food', 'date': datetime.utcnow()}
+        for _ in range(3)
+    ])
+    # A new transaction's usage is recorded before the first catalogue read
+    mongo.db.transactions.insert_one({'user_id': user_id, 'type': 'expense', 'category': 'Rent', 'date': datetime.utcnow()})
+    Category.record_usage(user_id, 'expense', 'Rent')
+
+    catalogue = Category.get_catalogue(user_id, Transaction.DEFAULT_CATEGORIES)
+    assert catalogue['usage']['expense']['Food']['count'] == 3
+    assert catalogue['usage']['expense']['Rent']['count'] == 1
+    assert Category.is_backfilled(user_id)
+
+def test_decrement_never_creates_or_goes_negative(app, user_id):
+    Category.record_usage(user_id, 'expense', 'Travel', delta=-1)
+    assert _counts(user_id) == {}
+    Category.record_usage(user_id, 'expense', 'Food')
+    Category.record_usage(user_id, 'expense', 'Food', delta=-1)
+    Category.record_usage(user_id, 'expense', 'Food', delta=-1)
+    assert _counts(user_id) == {('expense', 'Food'): 0}
+
+def test_rebuild_resets_unused_categories(app, user_id):
+    Category.record_usage(user_id, 'expense', 'Gone')
+    mongo.db.transactions.insert_one({'user_id': user_id, 'type': 'income', 'category': 'Salary', 'date': datetime.utcnow()})
+    Category.rebuild_user_catalogue(user_id)
+    assert _counts(user_id) == {('expense', 'Gone'): 0, ('income', 'Salary'): 1}
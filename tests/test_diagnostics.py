@@ -0,0 +1,34 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app
+from tests.conftest import TestConfig
+
+PROFILE = '1700000000-accounts.get_accounts-0123456789ab.prof'
+
+@pytest.fixture
+def app(app, tmp_path):
+    class DiagnosticsConfig(TestConfig):
+        PROFILING_SECRET = 'secret'
+        PROFILING_DIR = str(tmp_path)
+        MEMORY_PROFILING_ENABLED = True
+        ADMIN_USER_IDS = ['admin']
+    # The blueprint is only registered when diagnostics are configured at startup
+    app = create_app(DiagnosticsConfig)
+    (tmp_path / PROFILE).write_bytes(b'')
+    with app.app_context():
+        yield app
+
+@pytest.fixture
+def admin_headers(app):
+    return {'Authorization': f"Bearer {create_access_token(identity='admin')}"}
+
+def test_profile_limit_must_be_an_integer(client, admin_headers):
+    response = client.get(f'/api/diagnostics/profiles/{PROFILE}?format=text&limit=ten', headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json() == {'message': 'limit must be an integer'}
+
+@pytest.mark.parametrize('path', ['/memory/top', '/memory/diff', '/memory/endpoints'])
+def test_memory_limit_must_be_an_integer(client, admin_headers, path):
+    response = client.get(f'/api/diagnostics{path}?limit=ten', headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json() == {'message': 'limit must be an integer'}
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from app import mongo
+
+BASE = datetime(2026, 3, 15, 6, 30)
+
+@pytest.fixture
+def ledger(app, user_id):
+    cash, bank = ObjectId(), ObjectId()
+    mongo.db.accounts.insert_many([
+        {'_id': cash, 'user_id': user_id, 'name': 'Cash', 'balance': 0.0, 'opening_balance': 100.0},
+        {'_id': bank, 'user_id': user_id, 'name': 'Bank', 'balance': 0.0, 'opening_balance': 0.0},
+    ])
+    rows = [
+        ('income', 50.0, None, cash, BASE - timedelta(days=40)),
+        ('expense', 10.0, cash, None, BASE),
+        ('expense', 20.0, cash, None, BASE),   # same timestamp, ordered by _id
+        ('transfer', 30.0, cash, bank, BASE),
+        ('transfer', 5.0, bank, cash, BASE + timedelta(days=1)),
+        ('expense', 7.0, bank, None, BASE + timedelta(days=1)),  # another account
+        ('expense', 1.5, cash, None, BASE + timedelta(days=20)),
+    ]
+    mongo.db.transactions.insert_many([
+        {'user_id': user_id, 'type': type, 'amount': amount, 'category': 'Misc', 'description': '',
+         'account_from': account_from, 'account_to': account_to, 'date': date}
+        for type, amount, account_from, account_to, date in rows
+    ])
+    # 100 + 50 - 10 - 20 - 30 + 5 - 1.5
+    mongo.db.accounts.update_one({'_id': cash}, {'$set': {'balance': 93.5}})
+    return cash
+
+def _pages(client, auth_headers, account, **params):
+    entries, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=2, **({'cursor': cursor} if cursor else {}))
+        response = client.get(f'/api/accounts/{account}/ledger', query_string=query, headers=auth_headers)
+        assert response.status_code == 200
+        body = response.get_json()
+        entries += body['entries']
+        pages += 1
+        cursor = body['next_cursor']
+        if not cursor:
+            return entries, pages
+
+def _assert_chained(entries, opening, descending):
+    ordered = list(reversed(entries)) if descending else entries
+    balance = opening
+    for entry in ordered:
+        balance = round(balance + entry['change'], 2)
+        assert entry['balance'] == balance
+
+def test_descending_pages_chain_down_to_the_opening_balance(client, auth_headers, ledger):
+    entries, pages = _pages(client, auth_headers, ledger)
+    assert pages == 3 and len(entries) == 6
+    assert entries[0]['balance'] == 93.5
+    assert [e['change'] for e in entries] == [-1.5, 5.0, -30.0, -20.0, -10.0, 50.0]
+    _assert_chained(entries, 100.0, descending=True)
+
+def test_ascending_pages_match_descending_ones(client, auth_headers, ledger):
+    ascending, _ = _pages(client, auth_headers, ledger, order='asc')
+    descending, _ = _pages(client, auth_headers, ledger)
+    assert ascending == list(reversed(descending))
+    _assert_chained(ascending, 100.0, descending=False)
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_bounds_anchor_on_the_balance_at_the_start(client, auth_headers, ledger, order):
+    entries, _ = _pages(client, auth_headers, ledger, order=order, start='2026-03-15', end='2026-03-16')
+    assert sorted(e['change'] for e in entries) == [-30.0, -20.0, -10.0, 5.0]
+    # 150 before the 15th, 95 after the 16th
+    _assert_chained(entries, 150.0, descending=order == 'desc')
+    assert max(entries, key=lambda e: (e['date'], e['id']))['balance'] == 95.0
+
+def test_invalid_cursor_is_rejected(client, auth_headers, ledger):
+    response = client.get(f'/api/accounts/{ledger}/ledger?cursor=nope', headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,83 @@
+"""Per-endpoint query budgets (see ``app.testing``).
+
+The budgets count real commands, so they run against ``MONGODB_TEST_URI``
+with an instrumented fakeredis; mongomock issues no commands to count.
+"""
+from datetime import datetime, timedelta
+import pytest
+import fakeredis
+import app as app_module
+from app import mongo
+from app.testing import assert_request_budget, query_budget
+from app.utils import monitoring
+
+@pytest.fixture
+def instrumented_redis(app):
+    redis_class = type('InstrumentedFakeRedis', (monitoring.instrumented_redis_class(), fakeredis.FakeRedis), {})
+    redis = redis_class()
+    app_module.redis_client = redis
+    app_module._redis_factory = lambda: redis
+    return redis
+
+@pytest.fixture
+def data(real_db, user_id, instrumented_redis):
+    # ``user_id`` was inserted into mongomock before ``real_db`` switched databases
+    mongo.db.users.insert_one({'_id': user_id, 'username': 'tester', 'email': 'tester@example.com'})
+    now = datetime.utcnow()
+    account = mongo.db.accounts.insert_one({
+        'user_id': user_id, 'name': 'Cash', 'type': 'cash', 'balance': 95.0, 'opening_balance': 100.0
+    }).inserted_id
+    mongo.db.budgets.insert_one({
+        'user_id': user_id, 'category': 'Food', 'amount': 100.0, 'period': 'monthly',
+        'start_date': now - timedelta(days=3), 'end_date': now + timedelta(days=3),
+        'spent': 0.0, 'remaining': 100.0, 'transactions': []
+    })
+    transaction = mongo.db.transactions.insert_one({
+        'user_id': user_id, 'type': 'expense', 'amount': 5.0, 'category': 'Food', 'description': 'Lunch',
+        'account_from': account, 'date': now - timedelta(days=1), 'updated_at': now
+    }).inserted_id
+    return {'account': account, 'transaction': transaction}
+
+def test_budget_refuses_unmonitored_mongo(app):
+    with pytest.raises(RuntimeError, match='Mongo client is not monitored'):
+        with query_budget(mongo=1):
+            pass
+
+def test_budget_refuses_uninstrumented_redis(app):
+    with pytest.raises(RuntimeError, match='Redis client is not instrumented'):
+        with query_budget(redis=1):
+            pass
+
+def test_budget_counts_instrumented_redis(client, auth_headers, instrumented_redis):
+    with pytest.raises(AssertionError, match='at most 0 Redis calls'):
+        with query_budget(redis=0):
+            client.get('/api/transactions/categories', headers=auth_headers)
+
+@pytest.mark.integration
+def test_budget_list(client, auth_headers, data):
+    client.get('/api/budgets/', headers=auth_headers)  # seeds the version counters
+    response = assert_request_budget(client, 'GET', '/api/budgets/', mongo=1, redis=1, headers=auth_headers)
+    assert response.status_code == 200
+
+@pytest.mark.integration
+def test_transaction_get(client, auth_headers, data):
+    path = f"/api/transactions/{data['transaction']}"
+    client.get(path, headers=auth_headers)
+    response = assert_request_budget(client, 'GET', path, mongo=1, redis=1, headers=auth_headers)
+    assert response.status_code == 200
+
+@pytest.mark.integration
+def test_transaction_put(client, auth_headers, data):
+    # Read, the in-flight marker around two balance shifts each way and
+    # the write, two budget lookups, then the budget entry's read and update
+    response = assert_request_budget(
+        client, 'PUT', f"/api/transactions/{data['transaction']}", mongo=12, redis=3,
+        json={'amount': 7.5, 'description': 'Dinner'}, headers=auth_headers
+    )
+    assert response.status_code == 200
+
+@pytest.mark.integration
+def test_dashboard(client, auth_headers, data):
+    # Recent transactions, accounts, budgets, and income and expense totals
+    response = assert_request_budget(client, 'GET', '/', mongo=5, redis=0, headers=auth_headers)
+    assert response.status_code == 200
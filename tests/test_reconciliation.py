@@ -0,0 +1,50 @@
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from app import mongo
+from app.reconciliation import check_users
+
+@pytest.fixture
+def accounts(app, user_id):
+    ids = {}
+    for name, fields in (
+        ('checked', {'balance': 80.0, 'opening_balance': 0.0}),
+        ('legacy', {'balance': 100.0}),
+    ):
+        ids[name] = mongo.db.accounts.insert_one(dict(fields, user_id=user_id, name=name)).inserted_id
+    now = datetime.utcnow()
+    mongo.db.transactions.insert_many([
+        {'user_id': user_id, 'type': 'income', 'amount': 100.0, 'account_to': ids['checked'], 'account_from': None, 'date': now},
+        {'user_id': user_id, 'type': 'income', 'amount': 50.0, 'account_to': ids['legacy'], 'account_from': None, 'date': now},
+    ])
+    return ids
+
+def _account(_id):
+    return mongo.db.accounts.find_one({'_id': _id})
+
+def test_legacy_accounts_are_reported_not_baselined(user_id, accounts):
+    result = check_users(mongo.db, [user_id])
+    assert [d['account_id'] for d in result['drift']] == [str(accounts['checked'])]
+    assert result['unverified_accounts'] == [{
+        'account_id': str(accounts['legacy']), 'user_id': str(user_id), 'name': 'legacy',
+        'balance': 100.0, 'ledger': 50.0, 'expected_from_creation': 150.0
+    }]
+
+    result = check_users(mongo.db, [user_id], repair=True)
+    assert _account(accounts['checked'])['balance'] == 100.0
+    assert 'opening_balance' not in _account(accounts['legacy'])
+    assert result['baselined'] == [] and result['repaired_users'] == [str(user_id)]
+
+def test_baseline_takes_the_stored_balance_as_opening(user_id, accounts):
+    result = check_users(mongo.db, [user_id], repair=True, baseline=True)
+    legacy = _account(accounts['legacy'])
+    assert (legacy['opening_balance'], legacy['balance']) == (100.0, 150.0)
+    assert result['baselined'] == [str(accounts['legacy'])]
+    assert check_users(mongo.db, [user_id])['drifted'] == 0
+    assert check_users(mongo.db, [user_id])['unverified'] == 0
+
+def test_reconcile_endpoint_bumps_the_accounts_version(client, auth_headers, user_id, accounts):
+    first = client.get(f'/api/accounts/{accounts["checked"]}', headers=auth_headers)
+    assert client.post('/api/accounts/reconcile', headers=auth_headers).status_code == 200
+    again = client.get(f'/api/accounts/{accounts["checked"]}', headers=dict(auth_headers, **{'If-None-Match': first.headers['ETag']}))
+    assert again.status_code == 200 and again.get_json()['balance'] == 100.0
@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+from benchmarks.startup import BASELINE_ENV, LAZY_MODULES, ROOT
+
+AUDIT_SCRIPT = (
+    'import json, sys; from app import create_app; create_app(); '
+    'print(json.dumps(sorted(m for m in {modules!r} if m in sys.modules)))'
+)
+
+def _loaded_after_create_app(**env):
+    completed = subprocess.run(
+        [sys.executable, '-c', AUDIT_SCRIPT.format(modules=list(LAZY_MODULES))],
+        cwd=ROOT, env={**os.environ, **BASELINE_ENV, **env},
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def test_create_app_defers_optional_modules():
+    assert _loaded_after_create_app() == []
+
+def test_query_stats_do_not_load_redis_at_startup():
+    loaded = _loaded_after_create_app(QUERY_STATS_HEADER='true')
+    assert 'app.utils.monitoring' in loaded
+    assert 'redis' not in loaded
+
+def test_instrumented_client_is_built_on_first_use(app):
+    from app.utils.monitoring import instrumented_redis_class
+    client = instrumented_redis_class().from_url('redis://localhost:6379/0')
+    assert type(client.pipeline()).__name__ == 'InstrumentedPipeline'
@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta
+from unittest import mock
+from pymongo.errors import OperationFailure
+from app import mongo
+from app.utils import suggestions
+from app.utils.suggestions import SUGGEST_READY_KEY, get_suggestions
+
+def test_backfill_keeps_most_recent_values(app, user_id, monkeypatch):
+    now = datetime.utcnow()
+    mongo.db.transactions.insert_many([
+        {'user_id': user_id, 'description': f'Coffee {i}', 'category': 'Food', 'date': now - timedelta(days=i)}
+        for i in range(5)
+    ])
+    monkeypatch.setattr(suggestions, 'BACKFILL_LIMIT', 3)
+    assert get_suggestions(user_id, 'cof') == ['Coffee 0', 'Coffee 1', 'Coffee 2']
+    assert 'Food' in get_suggestions(user_id, 'f', field='category')
+
+def test_backfill_failure_is_soft_and_retried(app, user_id):
+    mongo.db.transactions.insert_one({'user_id': user_id, 'description': 'Rent', 'date': datetime.utcnow()})
+    with mock.patch.object(suggestions, '_recent_values', side_effect=OperationFailure('too large')):
+        assert get_suggestions(user_id, 're') == []
+    assert not suggestions.get_redis().exists(SUGGEST_READY_KEY.format(user_id=user_id))
+    assert get_suggestions(user_id, 're') == ['Rent']
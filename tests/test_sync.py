@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+import pytz
+from app import mongo
+from app.routes.sync import SYNC_STREAMS, _encode_token
+
+def _seed(user_id, days=45, per_day=2):
+    now = datetime.utcnow()
+    mongo.db.accounts.insert_one({
+        'user_id': user_id, 'name': 'Savings', 'type': 'bank', 'balance': 0.0,
+        'created_at': now - timedelta(days=days), 'updated_at': now - timedelta(days=days)
+    })
+    mongo.db.transactions.insert_many([
+        {
+            'user_id': user_id, 'type': 'expense', 'amount': 1.0, 'category': 'Food',
+            'description': f'day {day} #{n}', 'account_from': None, 'account_to': None,
+            'date': now - timedelta(days=day), 'created_at': now - timedelta(days=day),
+            'updated_at': now - timedelta(days=day, minutes=n)
+        }
+        for day in range(1, days + 1) for n in range(per_day)
+    ])
+
+def _page_through(client, headers, token=None, limit=7, max_pages=50):
+    pages = []
+    while len(pages) < max_pages:
+        url = f'/api/sync?limit={limit}' + (f'&since={token}' if token else '')
+        body = client.get(url, headers=headers).get_json()
+        pages.append(body)
+        token = body['next']
+        if not body['has_more']:
+            return pages, token
+    raise AssertionError('sync did not finish paging')
+
+def test_first_sync_pages_through_more_than_retention(client, user_id, auth_headers):
+    _seed(user_id)
+    pages, token = _page_through(client, auth_headers)
+
+    assert [p['reset'] for p in pages] == [True] + [False] * (len(pages) - 1)
+    ids = [t['id'] for p in pages for t in p['transactions']['updated']]
+    assert len(ids) == len(set(ids)) == 90
+    assert sum(len(p['accounts']['updated']) for p in pages) == 1
+
+    # Quiet streams advance, so an account untouched for 45 days does not force a reset
+    body = client.get(f'/api/sync?since={token}', headers=auth_headers).get_json()
+    assert body['reset'] is False
+    assert body['transactions']['updated'] == [] and body['accounts']['updated'] == []
+
+def test_token_behind_tombstone_retention_resets(client, user_id, auth_headers):
+    _seed(user_id, days=2)
+    recent = datetime.now(pytz.UTC)
+    cursors = {name: (recent, None) for name in SYNC_STREAMS}
+    cursors['tombstones'] = (recent - timedelta(days=31), ObjectId())
+    body = client.get(f'/api/sync?since={_encode_token(cursors)}', headers=auth_headers).get_json()
+    assert body['reset'] is True
+    assert len(body['transactions']['updated']) == 4
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from app import mongo
+from app.models.transaction import Transaction, TransactionQuery
+
+INDEX_KEYS = {index.document['name']: list(index.document['key']) for index in Transaction.INDEXES}
+
+def _insert(user_id, count=300):
+    accounts = [ObjectId() for _ in range(3)]
+    categories = ['Food', 'Rent', 'Transport', 'Salary', 'Gift']
+    now = datetime.utcnow()
+    mongo.db.transactions.insert_many([
+        {
+            'user_id': user_id,
+            'type': ('expense', 'income', 'transfer')[i % 3],
+            'amount': float(i % 50 + 1),
+            'category': categories[i % len(categories)],
+            'description': f'item {i}',
+            'account_from': accounts[i % 3],
+            'account_to': accounts[(i + 1) % 3] if i % 3 == 2 else None,
+            'date': now - timedelta(hours=i)
+        }
+        for i in range(count)
+    ])
+    return accounts
+
+@pytest.mark.parametrize('build, index', [
+    (lambda q: q, 'user_date'),
+    (lambda q: q.types('expense'), 'user_type_date'),
+    (lambda q: q.categories(['Food', 'Rent']), 'user_category_date'),
+    (lambda q: q.types('expense').categories('Food'), 'user_category_date'),
+    (lambda q: q.accounts(ObjectId(), fields=('account_from',)), 'user_account_from_date_id'),
+    (lambda q: q.accounts(ObjectId(), fields=('account_to',)), 'user_account_to_date_id'),
+    (lambda q: q.text('rent'), 'user_description_text'),
+])
+def test_index_name_matches_filter_prefix(app, build, index):
+    query = build(TransactionQuery(ObjectId()))
+    assert query.index_name == index
+    keys = INDEX_KEYS[index]
+    filter_doc = query.build()
+    # Every key ahead of the sort field is an equality (or $in) predicate
+    for key in keys[:keys.index('date')] if 'date' in keys else keys[:1]:
+        assert key in filter_doc
+
+def test_account_filter_repeats_predicate_per_branch(app):
+    account = ObjectId()
+    query = TransactionQuery(ObjectId()).types('expense').accounts(account)
+    branches = query.build()['$or']
+    assert query.index_name is None
+    assert [set(b) for b in branches] == [
+        {'user_id', 'type', 'account_from'}, {'user_id', 'type', 'account_to'}
+    ]
+
+def test_queries_do_not_hint_by_default(app, user_id):
+    _insert(user_id, count=10)
+    assert mongo.db.transactions.index_information().keys() == {'_id_'}
+    assert len(list(TransactionQuery(user_id).find())) == 10
+    assert len(Transaction.get_user_transactions(user_id, filters={'type': 'expense'})) == 4
+
+def test_list_works_without_created_indexes(client, user_id, auth_headers):
+    _insert(user_id, count=5)
+    response = client.get('/api/transactions/search?type=expense', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+
+@pytest.mark.integration
+@pytest.mark.parametrize('build, expected', [
+    (lambda q, a: q, {'user_date'}),
+    (lambda q, a: q.types('income'), {'user_type_date'}),
+    (lambda q, a: q.categories('Food'), {'user_category_date'}),
+    (lambda q, a: q.accounts(a[0], fields=('account_from',)), {'user_account_from_date_id'}),
+    (lambda q, a: q.accounts(a[0]), {'user_account_from_date_id', 'user_account_to_date_id'}),
+    (lambda q, a: q.types('expense').amount_range(10, 20).date_range(
+        datetime.utcnow() - timedelta(days=5), datetime.utcnow()), {'user_type_date'}),
+])
+def test_winning_plan_uses_expected_index(real_db, user_id, build, expected):
+    Transaction.create_indexes()
+    accounts = _insert(user_id)
+    query = build(TransactionQuery(user_id), accounts)
+    assert query.explain() == expected
+    assert query.explain(use_hint=query.hint is not None) == expected
+
+def test_create_indexes_drops_retired_account_indexes(app):
+    mongo.db.transactions.create_index([('user_id', 1), ('account_from', 1), ('date', -1)], name='user_account_from_date')
+    Transaction.create_indexes()
+    names = mongo.db.transactions.index_information().keys()
+    assert 'user_account_from_date' not in names
+    assert {'user_account_from_date_id', 'user_account_to_date_id'} <= set(names)
+
+@pytest.mark.integration
+@pytest.mark.parametrize('descending', [True, False])
+def test_account_ledger_sorts_on_the_index(real_db, user_id, descending):
+    Transaction.create_indexes()
+    accounts = _insert(user_id)
+    plan = Transaction.get_account_ledger(user_id, accounts[0], descending=descending, limit=20).explain()
+    winning = str(plan['queryPlanner']['winningPlan'])
+    assert "'SORT'" not in winning
+    assert 'user_account_from_date_id' in winning and 'user_account_to_date_id' in winning
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+import pytest
+import pytz
+from bson import ObjectId
+from app import mongo
+from app.utils import write_behind
+from app.utils.cache import get_redis
+
+IST = pytz.timezone('Asia/Kolkata')
+
+@pytest.fixture
+def budgets(app, user_id):
+    now = datetime.now(IST)
+    return [
+        mongo.db.budgets.insert_one({
+            'user_id': user_id, 'category': category, 'amount': 100.0,
+            'start_date': now - timedelta(days=5), 'end_date': now + timedelta(days=5),
+            'spent': 0.0, 'remaining': 100.0, 'transactions': []
+        }).inserted_id
+        for category in ('Food', 'Rent')
+    ]
+
+def _expense(amount, _id=None):
+    return {'_id': _id or ObjectId(), 'amount': amount, 'date': datetime.now(IST)}
+
+def _spent(budget_id):
+    budget = mongo.db.budgets.find_one({'_id': budget_id})
+    return budget['spent'], budget['remaining'], sorted(t['amount'] for t in budget['transactions'])
+
+def test_replayed_changes_are_counted_once(user_id, budgets):
+    expense = _expense(10.0)
+    write_behind.buffer_changes(budgets[0], user_id, added=[expense])
+    write_behind.buffer_changes(budgets[0], user_id, added=[expense])
+    assert write_behind.flush(force=True) == 1
+    # The same job replayed after the first flush
+    write_behind.buffer_changes(budgets[0], user_id, added=[expense])
+    write_behind.flush(force=True)
+    assert _spent(budgets[0]) == (10.0, 90.0, [10.0])
+
+    write_behind.buffer_changes(budgets[0], user_id, removed=[expense])
+    write_behind.flush(force=True)
+    write_behind.buffer_changes(budgets[0], user_id, removed=[expense])
+    write_behind.flush(force=True)
+    assert _spent(budgets[0]) == (0.0, 100.0, [])
+
+def test_edit_inside_the_window_keeps_one_entry(user_id, budgets):
+    expense = _expense(10.0)
+    write_behind.buffer_changes(budgets[0], user_id, added=[expense])
+    write_behind.flush(force=True)
+    write_behind.buffer_changes(budgets[0], user_id, removed=[expense], added=[dict(expense, amount=4.0)])
+    write_behind.buffer_changes(budgets[0], user_id, added=[_expense(1.0)])
+    write_behind.flush(force=True)
+    assert _spent(budgets[0]) == (5.0, 95.0, [1.0, 4.0])
+
+def test_replaying_an_applied_in_flight_list_is_a_no_op(user_id, budgets):
+    write_behind.buffer_changes(budgets[0], user_id, added=[_expense(7.0)])
+    client = get_redis()
+    ops = client.lrange(write_behind.OPS_KEY + str(budgets[0]), 0, -1)
+    write_behind.flush(force=True)
+
+    # A worker that died after the Mongo write but before clearing Redis
+    token = mongo.db.budgets.find_one({'_id': budgets[0]})[write_behind.APPLIED_FIELD][-1]
+    client.rpush(write_behind.INFLIGHT_KEY + str(budgets[0]), *ops)
+    client.set(write_behind.INFLIGHT_KEY + str(budgets[0]) + ':token', token)
+    client.sadd(write_behind.INFLIGHT_SET_KEY, str(budgets[0]))
+    write_behind.flush()
+    assert _spent(budgets[0]) == (7.0, 93.0, [7.0])
+    assert not client.exists(write_behind.INFLIGHT_KEY + str(budgets[0]))
+
+def test_scoped_flush_leaves_other_budgets_buffered(user_id, budgets):
+    write_behind.buffer_changes(budgets[0], user_id, added=[_expense(3.0)])
+    write_behind.buffer_changes(budgets[1], user_id, added=[_expense(6.0)])
+    assert write_behind.flush(budget_ids=[]) == 0
+    assert write_behind.flush(budget_ids=[budgets[1]]) == 1
+    assert _spent(budgets[0])[0] == 0.0 and _spent(budgets[1])[0] == 6.0
+    assert write_behind.pending() == 1
+
+def test_entries_changed_during_the_flush_are_retried(user_id, budgets, monkeypatch):
+    expense = _expense(10.0)
+    write_behind.buffer_changes(budgets[0], user_id, added=[expense])
+    read = write_behind._current_entries
+
+    def stale_read(budget_ids, touched):
+        entries = read(budget_ids, touched)
+        # Another writer adds the same entry after the read
+        mongo.db.budgets.update_one({'_id': budgets[0]}, {
+            '$push': {'transactions': {'id': expense['_id'], 'amount': 10.0}},
+            '$inc': {'spent': 10.0, 'remaining': -10.0}
+        })
+        return entries
+
+    monkeypatch.setattr(write_behind, '_current_entries', stale_read)
+    assert write_behind.flush(force=True) == 0
+    monkeypatch.setattr(write_behind, '_current_entries', read)
+    assert write_behind.flush() == 1
+    assert _spent(budgets[0]) == (10.0, 90.0, [10.0])